@@ -25,7 +25,8 @@ config.set_main_option('sqlalchemy.url', f'sqlite:///{DB_PATH}')
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
-    fileConfig(config.config_file_name)
+    # Keep the application's loggers working when migrations run at startup
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
 
 # add your model's MetaData object here
 # for 'autogenerate' support
@@ -0,0 +1,53 @@
+"""Add unique index on miner.endpoint
+
+Revision ID: 002_unique_miner_endpoint
+Revises: 001_add_error_percentage
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '002_unique_miner_endpoint'
+down_revision = '001_add_error_percentage'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    if 'miner' not in inspector.get_table_names():
+        return
+
+    indexes = [index['name'] for index in inspector.get_indexes('miner')]
+    if 'ix_miner_endpoint' in indexes:
+        return
+
+    # Older versions could register the same endpoint twice. Keep the oldest
+    # miner for each endpoint and move the duplicates' readings onto it.
+    op.execute("""
+        UPDATE reading SET miner_id = (
+            SELECT MIN(keep.id) FROM miner AS dup
+            JOIN miner AS keep ON keep.endpoint = dup.endpoint
+            WHERE dup.id = reading.miner_id
+        )
+        WHERE miner_id IN (SELECT id FROM miner)
+          AND miner_id NOT IN (SELECT MIN(id) FROM miner GROUP BY endpoint)
+    """)
+    op.execute("DELETE FROM miner WHERE id NOT IN (SELECT MIN(id) FROM miner GROUP BY endpoint)")
+
+    op.create_index('ix_miner_endpoint', 'miner', ['endpoint'], unique=True)
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    if 'miner' in inspector.get_table_names():
+        indexes = [index['name'] for index in inspector.get_indexes('miner')]
+        if 'ix_miner_endpoint' in indexes:
+            op.drop_index('ix_miner_endpoint', table_name='miner')
@@ -0,0 +1,96 @@
+"""Add integer best_diff_value column to reading table
+
+Revision ID: 003_add_best_diff_value
+Revises: 002_unique_miner_endpoint
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import re
+
+
+# revision identifiers, used by Alembic.
+revision = '003_add_best_diff_value'
+down_revision = '002_unique_miner_endpoint'
+branch_labels = None
+depends_on = None
+
+# SQLite integers are signed 64-bit; larger difficulties are clamped
+MAX_SQLITE_INT = 2**63 - 1
+
+BATCH_SIZE = 10000
+
+MULTIPLIERS = {
+    'K': 1_000,
+    'M': 1_000_000,
+    'G': 1_000_000_000,
+    'T': 1_000_000_000_000,
+    'P': 1_000_000_000_000_000,
+    'E': 1_000_000_000_000_000_000,
+    '': 1
+}
+
+
+def _parse(value):
+    # Frozen copy of poller.parse_difficulty as of this revision
+    if value is None:
+        return 0
+    text = str(value).strip()
+    try:
+        return min(int(text), MAX_SQLITE_INT)
+    except ValueError:
+        pass
+    try:
+        return min(int(float(text)), MAX_SQLITE_INT)
+    except (ValueError, OverflowError):
+        pass
+    match = re.match(r'^([\d.]+)\s*([KMGTPEkmgtpe]?)$', text, re.IGNORECASE)
+    if match:
+        try:
+            number = int(float(match.group(1)) * MULTIPLIERS[match.group(2).upper()])
+            return min(number, MAX_SQLITE_INT)
+        except (ValueError, OverflowError):
+            return None
+    return None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    if 'reading' not in inspector.get_table_names():
+        return
+
+    columns = [col['name'] for col in inspector.get_columns('reading')]
+    if 'best_diff_value' not in columns:
+        op.add_column('reading', sa.Column('best_diff_value', sa.BigInteger(), nullable=True))
+
+    # Backfill in batches, walking the primary key so memory stays flat on large tables
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.text(
+                "SELECT id, best_diff FROM reading "
+                "WHERE id > :last_id AND best_diff_value IS NULL ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BATCH_SIZE},
+        ).fetchall()
+        if not rows:
+            break
+        conn.execute(
+            sa.text("UPDATE reading SET best_diff_value = :value WHERE id = :id"),
+            [{"id": row[0], "value": _parse(row[1])} for row in rows],
+        )
+        last_id = rows[-1][0]
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    if 'reading' in inspector.get_table_names():
+        columns = [col['name'] for col in inspector.get_columns('reading')]
+
+        if 'best_diff_value' in columns:
+            op.drop_column('reading', 'best_diff_value')
@@ -0,0 +1,51 @@
+"""Add (miner_id, timestamp) and timestamp indexes to reading table
+
+Revision ID: 004_reading_indexes
+Revises: 003_add_best_diff_value
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004_reading_indexes'
+down_revision = '003_add_best_diff_value'
+branch_labels = None
+depends_on = None
+
+# name -> columns
+INDEXES = {
+    # Per-miner latest reading and history range queries
+    'ix_reading_miner_id_timestamp': ['miner_id', 'timestamp'],
+    # Range queries across all miners and the retention cleanup
+    'ix_reading_timestamp': ['timestamp'],
+}
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    if 'reading' not in inspector.get_table_names():
+        return
+
+    existing = [index['name'] for index in inspector.get_indexes('reading')]
+    for name, columns in INDEXES.items():
+        if name not in existing:
+            op.create_index(name, 'reading', columns)
+
+    # Give the query planner row counts for the new indexes
+    op.execute("ANALYZE reading")
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    if 'reading' in inspector.get_table_names():
+        existing = [index['name'] for index in inspector.get_indexes('reading')]
+        for name in INDEXES:
+            if name in existing:
+                op.drop_index(name, table_name='reading')
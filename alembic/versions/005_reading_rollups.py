@@ -0,0 +1,143 @@
+"""Add reading_rollup table and backfill it from existing readings
+
+Revision ID: 005_reading_rollups
+Revises: 004_reading_indexes
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005_reading_rollups'
+down_revision = '004_reading_indexes'
+branch_labels = None
+depends_on = None
+
+# Bucket sizes in seconds: 1 minute, 1 hour, 1 day
+RESOLUTIONS = (60, 3600, 86400)
+METRICS = ('hash_rate', 'temperature', 'voltage', 'error_percentage')
+BATCH_SIZE = 10000
+
+reading = sa.table(
+    'reading',
+    sa.column('id', sa.Integer),
+    sa.column('miner_id', sa.Integer),
+    sa.column('timestamp', sa.DateTime),
+    *[sa.column(metric, sa.Float) for metric in METRICS],
+)
+
+
+def _rollup_columns():
+    columns = [
+        sa.Column('miner_id', sa.Integer(), sa.ForeignKey('miner.id'), primary_key=True),
+        sa.Column('resolution', sa.Integer(), primary_key=True),
+        sa.Column('bucket', sa.DateTime(), primary_key=True),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('last_timestamp', sa.DateTime(), nullable=False),
+    ]
+    for metric in METRICS:
+        for suffix in ('min', 'max', 'sum', 'last'):
+            columns.append(sa.Column(f'{metric}_{suffix}', sa.Float(), nullable=False))
+    return columns
+
+
+def _bucket_start(timestamp, resolution):
+    epoch = int(timestamp.replace(tzinfo=datetime.timezone.utc).timestamp())
+    return datetime.datetime.utcfromtimestamp(epoch - epoch % resolution)
+
+
+def _upsert(rollup):
+    """INSERT ... ON CONFLICT merging a pre-aggregated row into an existing bucket."""
+    from sqlalchemy.dialects.sqlite import insert
+
+    statement = insert(rollup)
+    excluded = statement.excluded
+    newer = excluded.last_timestamp >= rollup.c.last_timestamp
+    updates = {
+        'count': rollup.c.count + excluded.count,
+        'last_timestamp': sa.case((newer, excluded.last_timestamp), else_=rollup.c.last_timestamp),
+    }
+    for metric in METRICS:
+        updates[f'{metric}_min'] = sa.func.min(rollup.c[f'{metric}_min'], excluded[f'{metric}_min'])
+        updates[f'{metric}_max'] = sa.func.max(rollup.c[f'{metric}_max'], excluded[f'{metric}_max'])
+        updates[f'{metric}_sum'] = rollup.c[f'{metric}_sum'] + excluded[f'{metric}_sum']
+        updates[f'{metric}_last'] = sa.case((newer, excluded[f'{metric}_last']), else_=rollup.c[f'{metric}_last'])
+    return statement.on_conflict_do_update(index_elements=['miner_id', 'resolution', 'bucket'], set_=updates)
+
+
+def _aggregate(rows):
+    """Fold a batch of readings into one row per (miner, resolution, bucket)."""
+    buckets = {}
+    for row in rows:
+        values = {metric: row._mapping[metric] or 0.0 for metric in METRICS}
+        for resolution in RESOLUTIONS:
+            key = (row.miner_id, resolution, _bucket_start(row.timestamp, resolution))
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = {
+                    'miner_id': row.miner_id,
+                    'resolution': resolution,
+                    'bucket': key[2],
+                    'count': 0,
+                    'last_timestamp': row.timestamp,
+                }
+                for metric, value in values.items():
+                    bucket[f'{metric}_min'] = bucket[f'{metric}_max'] = bucket[f'{metric}_last'] = value
+                    bucket[f'{metric}_sum'] = 0.0
+            bucket['count'] += 1
+            newer = row.timestamp >= bucket['last_timestamp']
+            if newer:
+                bucket['last_timestamp'] = row.timestamp
+            for metric, value in values.items():
+                bucket[f'{metric}_min'] = min(bucket[f'{metric}_min'], value)
+                bucket[f'{metric}_max'] = max(bucket[f'{metric}_max'], value)
+                bucket[f'{metric}_sum'] += value
+                if newer:
+                    bucket[f'{metric}_last'] = value
+    return list(buckets.values())
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+
+    if 'reading_rollup' not in tables:
+        op.create_table('reading_rollup', *_rollup_columns())
+    existing = [index['name'] for index in inspector.get_indexes('reading_rollup')] if 'reading_rollup' in tables else []
+    if 'ix_reading_rollup_resolution_bucket' not in existing:
+        op.create_index('ix_reading_rollup_resolution_bucket', 'reading_rollup', ['resolution', 'bucket'])
+
+    if 'reading' not in tables:
+        return
+
+    # Only backfill an empty table, so re-running the migration can't double count
+    if conn.execute(sa.text('SELECT 1 FROM reading_rollup LIMIT 1')).first():
+        return
+
+    rollup = sa.table('reading_rollup', *[sa.column(c.name, c.type) for c in _rollup_columns()])
+    upsert = _upsert(rollup)
+
+    # Walk the readings in id order a batch at a time to keep memory flat on large databases
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(reading).where(reading.c.id > last_id).order_by(reading.c.id).limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        conn.execute(upsert, _aggregate(rows))
+        last_id = rows[-1].id
+
+    op.execute("ANALYZE reading_rollup")
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    if 'reading_rollup' in inspector.get_table_names():
+        op.drop_table('reading_rollup')
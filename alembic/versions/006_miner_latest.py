@@ -0,0 +1,63 @@
+"""Add miner_latest table holding each miner's newest reading
+
+Revision ID: 006_miner_latest
+Revises: 005_reading_rollups
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006_miner_latest'
+down_revision = '005_reading_rollups'
+branch_labels = None
+depends_on = None
+
+COLUMNS = ['timestamp', 'hash_rate', 'temperature', 'best_diff', 'best_diff_value', 'voltage', 'error_percentage']
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+
+    if 'miner_latest' not in tables:
+        op.create_table(
+            'miner_latest',
+            sa.Column('miner_id', sa.Integer(), sa.ForeignKey('miner.id'), primary_key=True),
+            sa.Column('timestamp', sa.DateTime(), nullable=False),
+            sa.Column('hash_rate', sa.Float(), nullable=False),
+            sa.Column('temperature', sa.Float(), nullable=False),
+            sa.Column('best_diff', sa.String(), nullable=False),
+            sa.Column('best_diff_value', sa.Integer(), nullable=True),
+            sa.Column('voltage', sa.Float(), nullable=False),
+            sa.Column('error_percentage', sa.Float(), nullable=False),
+        )
+
+    if 'reading' not in tables:
+        return
+
+    # Backfill from each miner's newest reading; the (miner_id, timestamp) index makes this one pass
+    columns = ', '.join(COLUMNS)
+    # Rows from before voltage and error_percentage were recorded may hold NULLs
+    selected = ', '.join(
+        f'COALESCE(r.{column}, 0.0)' if column in ('voltage', 'error_percentage') else f'r.{column}'
+        for column in COLUMNS
+    )
+    op.execute(f"""
+        INSERT OR REPLACE INTO miner_latest (miner_id, {columns})
+        SELECT r.miner_id, {selected}
+        FROM reading r
+        JOIN (SELECT miner_id, MAX(timestamp) AS timestamp FROM reading GROUP BY miner_id) newest
+          ON r.miner_id = newest.miner_id AND r.timestamp = newest.timestamp
+    """)
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    if 'miner_latest' in inspector.get_table_names():
+        op.drop_table('miner_latest')
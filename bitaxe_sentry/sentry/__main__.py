@@ -7,12 +7,14 @@ import os
 import pathlib
 import atexit
 from apscheduler.schedulers.background import BackgroundScheduler
+from sqlmodel import Session
 from .poller import poll_once
 from .cleaner import clean_old
-from .config import POLL_INTERVAL, reload_config
-from .db import init_db
+from .config import POLL_INTERVAL_SECONDS, reload_config
+from .db import engine, init_db, checkpoint
 from .notifier import send_startup_notification
 from .settings_manager import load_settings
+from . import coordinator, health, poll_scheduler, registry, state, stream, transport
 
 logger = logging.getLogger(__name__)
 
@@ -20,8 +22,23 @@ logger = logging.getLogger(__name__)
 scheduler = None
 DATA_DIR = pathlib.Path(os.getenv("DB_DATA_DIR", "/app/data"))
 PID_FILE = DATA_DIR / "sentry.pid"
-DB_PATH = pathlib.Path(os.getenv("DB_PATH", DATA_DIR / "bitaxe_sentry.db"))# Track current poll interval to detect changes
-current_poll_interval = POLL_INTERVAL
+DB_PATH = pathlib.Path(os.getenv("DB_PATH", DATA_DIR / "bitaxe_sentry.db"))
+
+# How often the sentry service checkpoints the SQLite WAL into the database file
+WAL_CHECKPOINT_MINUTES = 5
+
+# How often the sentry service publishes its in-memory stats for the web UI
+SERVICE_STATUS_SECONDS = 15
+
+# Track current poll interval to detect changes
+current_poll_interval = POLL_INTERVAL_SECONDS
+
+# Set by the SIGHUP handler, acted on by the main loop
+reload_requested = False
+
+# How often the main loop checks for a SIGHUP, and for config file changes
+SIGHUP_CHECK_SECONDS = 1
+CONFIG_CHECK_SECONDS = 60
 
 def cleanup():
     """Remove PID file on exit"""
@@ -33,40 +50,54 @@ def cleanup():
         logger.warning(f"Could not remove PID file: {e}")
 
 def handle_sighup(signum, frame):
-    """Handle SIGHUP signal to reload configuration"""
+    """
+    Handle SIGHUP signal to reload configuration.
+
+    Only sets a flag: the handler runs on the main thread between any two
+    bytecodes, possibly while that thread holds the registry or state cache
+    lock (e.g. during the startup poll), so taking those locks here could
+    deadlock. The main loop does the reload within SIGHUP_CHECK_SECONDS.
+    """
+    global reload_requested
+    reload_requested = True
+
+def reload_after_sighup():
+    """Apply a SIGHUP: drop the caches and reload the configuration."""
     logger.info("Received SIGHUP signal, reloading configuration...")
     
+    # Miners may have been deleted or renamed in the web UI
+    registry.invalidate()
+    state.invalidate()
+    
     # Reload config from file
-    global scheduler, current_poll_interval
     reload_config()
     
     # Update the scheduler if poll interval changed
     update_scheduler_if_needed()
 
+def publish_service_status():
+    """Publish this process's in-memory stats, which the web UI can't see otherwise."""
+    coordinator.publish_service_status({
+        "transport": transport.get_pool_stats(),
+        "schedule": poll_scheduler.get_schedule(),
+        "health": health.get_health(),
+        "stream": stream.get_status(),
+    })
+
 def update_scheduler_if_needed():
-    """Update the scheduler if poll interval has changed"""
-    global scheduler, current_poll_interval
+    """Update the per-miner poll schedule if the poll interval has changed"""
+    global current_poll_interval
     
     # Get the current poll interval from config
-    from .config import POLL_INTERVAL
+    from .config import POLL_INTERVAL_SECONDS
     
     # Check if poll interval has changed
-    if current_poll_interval != POLL_INTERVAL:
-        logger.info(f"Poll interval changed from {current_poll_interval} to {POLL_INTERVAL} minutes")
-        
-        if scheduler:
-            try:
-                # Reschedule the polling job with the new interval
-                scheduler.reschedule_job('poller', trigger='interval', minutes=POLL_INTERVAL)
-                logger.info(f"Scheduler updated with new poll interval: {POLL_INTERVAL} minutes")
-                
-                # Update the current poll interval
-                current_poll_interval = POLL_INTERVAL
-            except Exception as e:
-                logger.exception(f"Error updating scheduler: {e}")
-        else:
-            logger.warning("Scheduler not initialized, cannot update")
-            current_poll_interval = POLL_INTERVAL
+    if current_poll_interval != POLL_INTERVAL_SECONDS:
+        logger.info(f"Poll interval changed from {current_poll_interval} to {POLL_INTERVAL_SECONDS} seconds")
+        current_poll_interval = POLL_INTERVAL_SECONDS
+    
+    # The scheduler picks up the new settings itself; wake it so it does so now
+    poll_scheduler.wake()
 
 def main():
     """Main entry point for the Bitaxe Sentry application."""
@@ -85,26 +116,29 @@ def main():
     # Initialize database
     init_db()
     
+    # Warm the per-miner state cache so the first cycle doesn't need to look up previous readings
+    try:
+        with Session(engine) as session:
+            state.warm(session)
+    except Exception as e:
+        logger.warning(f"Could not warm state cache, it will load on the first poll: {e}")
+    
     # Register signal handler for SIGHUP
     signal.signal(signal.SIGHUP, handle_sighup)
     logger.info("Registered SIGHUP handler for configuration reload")
     
     # Create scheduler
-    global scheduler, current_poll_interval
+    global scheduler, current_poll_interval, reload_requested
     scheduler = BackgroundScheduler()
     
-    # Add jobs
-    scheduler.add_job(
-        poll_once, 
-        'interval', 
-        minutes=POLL_INTERVAL, 
-        id='poller'
-    )
+    # Add jobs (polling runs on its own per-miner scheduler, started after the initial poll)
     scheduler.add_job(clean_old, 'cron', hour=0, id='cleaner')
+    scheduler.add_job(checkpoint, 'interval', minutes=WAL_CHECKPOINT_MINUTES, id='wal_checkpoint')
+    scheduler.add_job(publish_service_status, 'interval', seconds=SERVICE_STATUS_SECONDS, id='service_status')
     
     # Start the scheduler
     scheduler.start()
-    logger.info(f"Scheduler started. Polling every {POLL_INTERVAL} minutes")
+    logger.info(f"Scheduler started. Polling every {POLL_INTERVAL_SECONDS} seconds")
     
     # Send startup notification to Discord
     notification_status = send_startup_notification()
@@ -116,32 +150,53 @@ def main():
     try:
         # Run initial poll immediately
         logger.info("Running initial poll now")
-        poll_once()
+        poll_once(trigger="startup")
         logger.info("Initial poll completed")
         
+        # Poll each miner on its own schedule from here on
+        poll_scheduler.start()
+        
+        # Stream readings from miners that support it when INGEST_MODE is "stream"
+        stream.start()
+        
         # Keep the main thread running
+        next_config_check = time.monotonic() + CONFIG_CHECK_SECONDS
         while True:
-            time.sleep(60)  # Check every minute
+            time.sleep(SIGHUP_CHECK_SECONDS)
             
-            # Check if config has changed
             try:
-                if reload_config():
-                    # Config has changed, update scheduler if needed
-                    update_scheduler_if_needed()
+                if reload_requested:
+                    reload_requested = False
+                    reload_after_sighup()
+                elif time.monotonic() >= next_config_check:
+                    # Check if config has changed
+                    next_config_check = time.monotonic() + CONFIG_CHECK_SECONDS
+                    if reload_config():
+                        # Config has changed, update scheduler if needed
+                        update_scheduler_if_needed()
             except Exception as e:
                 logger.exception(f"Error checking config: {e}")
                 
     except KeyboardInterrupt:
         logger.info("Shutting down Bitaxe Sentry")
+        stream.stop()
+        poll_scheduler.stop()
         scheduler.shutdown()
         cleanup()  # Explicit cleanup
         sys.exit(0)
     except Exception as e:
         logger.exception(f"Fatal error: {e}")
+        stream.stop()
+        poll_scheduler.stop()
         scheduler.shutdown()
         cleanup()  # Explicit cleanup
         sys.exit(1)
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == "import":
+        # python -m bitaxe_sentry.sentry import <file>: bulk import readings instead of running the service
+        from .importer import main as import_main
+        import_main(sys.argv[2:])
+    else:
+        main() 
\ No newline at end of file
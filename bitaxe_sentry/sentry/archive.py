@@ -0,0 +1,284 @@
+"""
+Parquet archive of readings past retention.
+
+With ARCHIVE_FORMAT set to "parquet", the cleaner copies readings into
+compressed Parquet files before deleting them:
+
+    <data dir>/archive/miner_id=<id>/month=<YYYY-MM>/part-<start>.parquet
+
+Each run archives the readings between the previous run's cutoff and its own,
+recorded in archive/_state.json. A run that fails part way is repeated from
+the same start and overwrites its own files, so nothing is archived twice.
+Readings imported later with timestamps before that mark are recorded as a
+backfill range (see record_backfill()), which the next run archives first.
+The cleaner and the importer hold locked() while they run, so imported
+readings can't be deleted before they are archived.
+
+The miner_id=/month= directories are Hive-style partitions, so reads that
+filter on a miner or time range only open the matching files, and Parquet's
+row group statistics skip the rest. Needs the optional pyarrow package.
+"""
+import contextlib
+import datetime
+import json
+import logging
+from sqlmodel import Session
+from .db import engine
+from .settings_manager import DATA_DIR
+from . import storage
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; imports and cleanups are then not coordinated
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = DATA_DIR / "archive"
+STATE_FILE = ARCHIVE_DIR / "_state.json"
+LOCK_FILE = DATA_DIR / "archive.lock"
+
+# Columns stored in each file; miner_id and month come from the directory names
+COLUMNS = ("timestamp", "hash_rate", "temperature", "best_diff", "best_diff_value", "voltage", "error_percentage")
+
+# Rows fetched from SQLite at a time, and rows buffered per file before writing a row group
+READ_BATCH_SIZE = 20000
+ROW_GROUP_SIZE = 50000
+
+COMPRESSION = "zstd"
+
+def available():
+    """Check whether pyarrow is installed."""
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("timestamp", pa.timestamp("us")),
+        ("hash_rate", pa.float64()),
+        ("temperature", pa.float64()),
+        ("best_diff", pa.string()),
+        ("best_diff_value", pa.int64()),
+        ("voltage", pa.float64()),
+        ("error_percentage", pa.float64()),
+    ])
+
+def _partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    return ds.partitioning(pa.schema([("miner_id", pa.int64()), ("month", pa.string())]), flavor="hive")
+
+def _read_state():
+    try:
+        with open(STATE_FILE) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None, None
+    archived_through, backfill_since = state.get("archived_through"), state.get("backfill_since")
+    return (
+        datetime.datetime.fromisoformat(archived_through) if archived_through else None,
+        datetime.datetime.fromisoformat(backfill_since) if backfill_since else None,
+    )
+
+def _save_state(archived_through, backfill_since=None):
+    state = {"archived_through": archived_through.isoformat()}
+    if backfill_since is not None:
+        state["backfill_since"] = backfill_since.isoformat()
+    tmp_path = STATE_FILE.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    tmp_path.replace(STATE_FILE)
+
+@contextlib.contextmanager
+def locked():
+    """Hold the archive lock: taken by the cleaner to archive and delete, and by the importer for a whole import."""
+    if fcntl is None:
+        yield
+        return
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    with open(LOCK_FILE, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def record_backfill(oldest):
+    """
+    Note that readings were stored before the archived-through mark.
+
+    archive_before() only archives forward from the mark, so without this the
+    cleaner would delete them unarchived. Call while holding locked().
+
+    Args:
+        oldest: Timestamp of the oldest reading stored
+
+    Returns:
+        bool: True if a backfill range was recorded or extended
+    """
+    archived_through, backfill_since = _read_state()
+    if archived_through is None or oldest >= archived_through:
+        return False
+    if backfill_since is not None and backfill_since <= oldest:
+        return False
+    _save_state(archived_through, oldest)
+    logger.info(f"Readings from {oldest:%Y-%m-%d %H:%M} on were stored after being archived through {archived_through:%Y-%m-%d %H:%M}, they will be archived on the next run")
+    return True
+
+class _Writers:
+    """One open ParquetWriter per (miner, month), each fed in ROW_GROUP_SIZE chunks."""
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.buffers = {}
+        self.writers = {}
+        self.rows = 0
+        self.files = 0
+
+    def add(self, miner_id, row):
+        key = (miner_id, row["timestamp"].strftime("%Y-%m"))
+        buffer = self.buffers.setdefault(key, [])
+        buffer.append(row)
+        if len(buffer) >= ROW_GROUP_SIZE:
+            self._flush(key)
+
+    def _flush(self, key):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        buffer = self.buffers.pop(key, None)
+        if not buffer:
+            return
+        writer = self.writers.get(key)
+        if writer is None:
+            miner_id, month = key
+            directory = ARCHIVE_DIR / f"miner_id={miner_id}" / f"month={month}"
+            directory.mkdir(parents=True, exist_ok=True)
+            writer = pq.ParquetWriter(str(directory / self.file_name), _schema(), compression=COMPRESSION)
+            self.writers[key] = writer
+            self.files += 1
+        writer.write_table(pa.Table.from_pylist(buffer, schema=_schema()))
+        self.rows += len(buffer)
+
+    def close(self):
+        for key in list(self.buffers):
+            self._flush(key)
+        for writer in self.writers.values():
+            writer.close()
+
+def archive_before(cutoff):
+    """
+    Copy readings older than the cutoff that aren't archived yet into Parquet files.
+
+    Args:
+        cutoff: Archive readings older than this (the cleaner's retention cutoff)
+
+    Returns:
+        dict: {"rows": readings archived, "files": files written}
+
+    Raises:
+        ImportError: If pyarrow isn't installed
+    """
+    import pyarrow  # noqa: F401 - fail before touching anything
+
+    start, backfill_since = _read_state()
+    rows = files = 0
+    if backfill_since is not None:
+        # Named after the range, so a repeated run replaces its own files
+        backfill = _copy(f"part-backfill-{backfill_since:%Y%m%dT%H%M%S}-{start:%Y%m%dT%H%M%S}.parquet", backfill_since, start)
+        rows, files = rows + backfill.rows, files + backfill.files
+        _save_state(start)
+    if start is not None and start >= cutoff:
+        return {"rows": rows, "files": files}
+
+    # Named after the range start, so a repeated run replaces its own files
+    writers = _copy(f"part-{start:%Y%m%dT%H%M%S}.parquet" if start else "part-initial.parquet", start, cutoff)
+    rows, files = rows + writers.rows, files + writers.files
+
+    _save_state(cutoff)
+    logger.info(f"Archived {rows} readings older than {cutoff:%Y-%m-%d %H:%M} to {files} Parquet files")
+    return {"rows": rows, "files": files}
+
+def _copy(file_name, start, cutoff):
+    """Write the readings from start (inclusive, or the beginning) to cutoff to one set of files."""
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    writers = _Writers(file_name)
+    try:
+        with Session(engine) as session:
+            for table in storage.tables_for(session, start=start, end=cutoff):
+                # One streamed query per table, fetched READ_BATCH_SIZE rows at a time
+                result = session.exec(storage.select_before(table, cutoff, since=start))
+                for rows in result.partitions(READ_BATCH_SIZE):
+                    for row in rows:
+                        values = storage.to_row(row)
+                        writers.add(values["miner_id"], {column: values[column] for column in COLUMNS})
+    finally:
+        writers.close()
+    return writers
+
+def read(start=None, end=None, miner_id=None, columns=None):
+    """
+    Read archived readings.
+
+    Only the files for the matching miner and months are opened, and only the
+    requested columns are decoded.
+
+    Args:
+        start: Only readings at or after this time
+        end: Only readings before this time
+        miner_id: Only this miner (all miners if None)
+        columns: Columns to return (all if None); miner_id is always included
+
+    Returns:
+        pyarrow.Table: Matching readings sorted by timestamp (empty if nothing is archived)
+
+    Raises:
+        ImportError: If pyarrow isn't installed
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    wanted = ["miner_id"] + [column for column in (columns or COLUMNS) if column != "miner_id"]
+    if "timestamp" not in wanted:
+        wanted.append("timestamp")
+    if not ARCHIVE_DIR.exists():
+        return pa.table({column: [] for column in wanted})
+
+    dataset = ds.dataset(str(ARCHIVE_DIR), format="parquet", partitioning=_partitioning(), exclude_invalid_files=True)
+    conditions = []
+    if miner_id is not None:
+        conditions.append(ds.field("miner_id") == miner_id)
+    if start is not None:
+        conditions.append(ds.field("month") >= start.strftime("%Y-%m"))
+        conditions.append(ds.field("timestamp") >= pa.scalar(start, pa.timestamp("us")))
+    if end is not None:
+        conditions.append(ds.field("month") <= end.strftime("%Y-%m"))
+        conditions.append(ds.field("timestamp") < pa.scalar(end, pa.timestamp("us")))
+
+    condition = None
+    for expression in conditions:
+        condition = expression if condition is None else condition & expression
+
+    table = dataset.to_table(columns=wanted, filter=condition)
+    return table.sort_by("timestamp")
+
+def get_status():
+    """
+    Describe the archive.
+
+    Returns:
+        dict: Whether pyarrow is available, the archived-through time, and file count and size
+    """
+    files = list(ARCHIVE_DIR.glob("miner_id=*/month=*/*.parquet")) if ARCHIVE_DIR.exists() else []
+    archived_through, backfill_since = _read_state()
+    return {
+        "available": available(),
+        "archived_through": archived_through.isoformat() + "Z" if archived_through else None,
+        "backfill_since": backfill_since.isoformat() + "Z" if backfill_since else None,
+        "files": len(files),
+        "size_mb": round(sum(path.stat().st_size for path in files) / 1_000_000, 2),
+    }
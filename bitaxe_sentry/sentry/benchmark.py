@@ -0,0 +1,660 @@
+"""
+Poller load benchmark.
+
+Starts a simulated fleet (see simulator.py), points a throwaway data directory
+at it and drives the real poller against it, reporting cycle time, database
+write time and alert throughput. Runs entirely on localhost.
+
+    python -m bitaxe_sentry.sentry.benchmark poll --miners 1000 --cycles 5
+    python -m bitaxe_sentry.sentry.benchmark scheduler --miners 500 --duration 60
+
+The "plans" command instead seeds a large synthetic history and checks that
+the hot reading queries are planned against their indexes:
+
+    python -m bitaxe_sentry.sentry.benchmark plans --rows 1000000
+
+"schema" writes the same history under the "single" and "compact" storage
+layouts and compares their size on disk, insert rate and range scan speed:
+
+    python -m bitaxe_sentry.sentry.benchmark schema --rows 1000000
+
+"startup" times database initialization in fresh processes, as on a restart:
+
+    python -m bitaxe_sentry.sentry.benchmark startup --rows 1000000
+"""
+import argparse
+import functools
+import json
+import logging
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from . import simulator
+
+# Same as settings_manager.STORAGE_LAYOUTS, which can't be imported before the data directory is set up
+STORAGE_LAYOUTS = ("single", "daily", "compact")
+
+def _prepare_data_dir(data_dir, settings):
+    """
+    Create the benchmark's data directory and config.
+
+    Must run before any module that reads the config or opens the database is
+    imported, since those pick up DB_DATA_DIR and DB_PATH at import time.
+
+    Args:
+        data_dir: Directory to use, or None for a new temporary one
+        settings: Settings to write to its config.json
+
+    Returns:
+        str: The data directory
+    """
+    data_dir = data_dir or tempfile.mkdtemp(prefix="bitaxe-sentry-bench-")
+    os.makedirs(data_dir, exist_ok=True)
+    os.environ["DB_DATA_DIR"] = data_dir
+    os.environ["DB_PATH"] = os.path.join(data_dir, "benchmark.db")
+
+    with open(os.path.join(data_dir, "config.json"), "w") as f:
+        json.dump(settings, f, indent=2)
+    return data_dir
+
+def _create_miners(session, miners):
+    from .db import Miner
+
+    miner_ids = []
+    for index in range(miners):
+        miner = Miner(name=f"seed-{index}", endpoint=f"http://seed-{index}")
+        session.add(miner)
+        session.flush()
+        miner_ids.append(miner.id)
+    return miner_ids
+
+def _synthetic_batches(miner_ids, rows, interval_seconds=60, batch_size=50000):
+    """
+    Generate synthetic reading rows, oldest first, newest reading now.
+
+    Yields:
+        list: Up to about batch_size row dicts, whole poll cycles at a time
+    """
+    import datetime
+
+    now = datetime.datetime.utcnow().replace(microsecond=0)
+    per_miner = max(1, rows // len(miner_ids))
+    batch = []
+    for step in range(per_miner):
+        timestamp = now - datetime.timedelta(seconds=interval_seconds * (per_miner - step))
+        for miner_id in miner_ids:
+            batch.append({
+                "miner_id": miner_id,
+                "timestamp": timestamp,
+                "hash_rate": 500.0 + step % 50,
+                "temperature": 55.0 + miner_id % 10,
+                "best_diff": "1000000",
+                "best_diff_value": 1000000,
+                "voltage": 5.1,
+                "error_percentage": 0.1,
+            })
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def seed_readings(miners, rows, interval_seconds=60):
+    """
+    Fill the database with synthetic history, newest reading now.
+
+    Args:
+        miners: Number of miners to create
+        rows: Total readings, spread evenly across the miners
+        interval_seconds: Spacing of each miner's readings
+
+    Returns:
+        float: Seconds taken
+    """
+    from sqlmodel import Session
+    from .db import engine
+    from . import storage
+
+    start = time.perf_counter()
+    with Session(engine) as session:
+        miner_ids = _create_miners(session, miners)
+        for batch in _synthetic_batches(miner_ids, rows, interval_seconds):
+            storage.insert_rows(session, batch)
+        session.commit()
+    return time.perf_counter() - start
+
+def _timed(durations, func):
+    """Wrap func so each call's duration is appended to durations."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            durations.append(time.perf_counter() - start)
+    return wrapper
+
+def _instrument():
+    """
+    Time database writes and webhook calls.
+
+    Returns:
+        dict: {"db_write": [...], "alert": [...]} lists of durations, filled in as the poller runs
+    """
+    from . import poller, stream, transport
+
+    timings = {"db_write": [], "alert": []}
+    poller.ingest_readings = _timed(timings["db_write"], poller.ingest_readings)
+    stream.ingest_readings = poller.ingest_readings
+    # Only the notifier POSTs; polling uses GET
+    transport.post = _timed(timings["alert"], transport.post)
+    return timings
+
+def _summary(values, scale=1.0):
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        "min": round(values[0] * scale, 2),
+        "median": round(statistics.median(values) * scale, 2),
+        "p95": round(values[min(len(values) - 1, int(len(values) * 0.95))] * scale, 2),
+        "max": round(values[-1] * scale, 2),
+    }
+
+def _database_stats():
+    from sqlmodel import Session
+    from .db import engine, DB_PATH
+    from . import storage
+
+    with Session(engine) as session:
+        readings = storage.count_readings(session)
+    size = os.path.getsize(DB_PATH) if os.path.exists(DB_PATH) else 0
+    return {"readings": readings, "size_mb": round(size / 1_000_000, 2)}
+
+def run_poll(args, fleet):
+    """Run back-to-back poll cycles over the whole fleet."""
+    from .config import ENDPOINTS
+    from .poller import poll_endpoints
+
+    timings = _instrument()
+    cycles = []
+    statuses = {}
+    for _ in range(args.cycles):
+        start = time.perf_counter()
+        outcomes = poll_endpoints(ENDPOINTS, trigger="benchmark")
+        cycles.append(time.perf_counter() - start)
+        for outcome in outcomes.values():
+            statuses[outcome["status"]] = statuses.get(outcome["status"], 0) + 1
+
+    return {
+        "cycle_seconds": _summary(cycles),
+        "miners_per_second": round(len(ENDPOINTS) * len(cycles) / sum(cycles), 1),
+        "outcomes": statuses,
+        **_write_and_alert_stats(timings, fleet, sum(cycles)),
+    }
+
+def run_scheduler(args, fleet):
+    """Run the per-miner scheduler for a fixed time."""
+    from . import poll_scheduler
+
+    timings = _instrument()
+    # The stats file sums scheduled cycles per poll interval, so time each one here
+    cycles = []
+    poll_scheduler.poll_endpoints = _timed(cycles, poll_scheduler.poll_endpoints)
+    start = time.perf_counter()
+    poll_scheduler.start()
+    time.sleep(args.duration)
+    poll_scheduler.stop()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "elapsed_seconds": round(elapsed, 1),
+        "cycles": len(cycles),
+        "cycle_seconds": _summary(cycles),
+        "miner_requests_per_second": round(fleet.stats()["requests"] / elapsed, 1),
+        **_write_and_alert_stats(timings, fleet, elapsed),
+    }
+
+def _write_and_alert_stats(timings, fleet, elapsed):
+    alert_time = sum(timings["alert"])
+    return {
+        "db_write_ms": _summary(timings["db_write"], 1000),
+        "alerts_sent": len(timings["alert"]),
+        "alert_ms": _summary(timings["alert"], 1000),
+        "alerts_per_second": round(len(timings["alert"]) / alert_time, 1) if alert_time else None,
+        "alerts_per_cycle_second": round(len(timings["alert"]) / elapsed, 2) if elapsed else None,
+        "webhooks_received": fleet.stats()["webhooks"],
+    }
+
+def hot_queries(table):
+    """
+    The queries that run on every page load, poll cycle or cleanup.
+
+    Args:
+        table: Reading table (day table, or reading_compact) the reading queries run against
+
+    Returns:
+        list: (name, statement, index the plan must use)
+    """
+    import datetime
+    from sqlmodel import select
+    from .cleaner import CLEAN_BATCH_SIZE
+    from .db import Miner, MinerLatest, ReadingRollup
+    from . import storage
+
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+    if storage.is_compact(table):
+        # (miner_id, epoch) is the primary key itself
+        miner_index, time_index = "PRIMARY KEY", "ix_reading_compact_epoch"
+    else:
+        miner_index, time_index = f"ix_{table.name}_miner_id_timestamp", f"ix_{table.name}_timestamp"
+    return [
+        ("dashboard latest readings",
+         select(Miner, MinerLatest).join(MinerLatest, MinerLatest.miner_id == Miner.id),
+         "INTEGER PRIMARY KEY"),
+        ("history chart rollups",
+         select(ReadingRollup).where(ReadingRollup.resolution == 3600).where(ReadingRollup.bucket > cutoff).order_by(ReadingRollup.bucket),
+         "ix_reading_rollup_resolution_bucket"),
+        ("history for one miner",
+         storage.select_readings(table, start=cutoff, miner_id=1),
+         miner_index),
+        ("history for all miners",
+         storage.select_readings(table, start=cutoff),
+         time_index),
+        ("latest reading rebuild",
+         storage.select_newest(table),
+         miner_index),
+        ("retention cleanup batch",
+         storage.delete_before(table, cutoff, CLEAN_BATCH_SIZE),
+         time_index),
+    ]
+
+def explain(statement):
+    """
+    Get SQLite's query plan for a statement.
+
+    Returns:
+        list: The plan's detail lines
+    """
+    from .db import engine
+
+    compiled = statement.compile(dialect=engine.dialect)
+    params = [compiled.params[name] for name in compiled.positiontup]
+    # Values don't affect the plan; plain strings avoid sqlite3's datetime adapter
+    params = [value.isoformat(" ") if hasattr(value, "isoformat") else value for value in params]
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"EXPLAIN QUERY PLAN {compiled}", params)
+        return [row[-1] for row in cursor.fetchall()]
+    finally:
+        connection.close()
+
+def plan_uses_index(plan, index):
+    """
+    Check a query plan for the index it should use.
+
+    Args:
+        plan: Detail lines from explain()
+        index: Index name (or "PRIMARY KEY" / "INTEGER PRIMARY KEY")
+
+    Returns:
+        bool: True if the plan uses the index and doesn't scan a reading table
+    """
+    uses_index = any(index in line for line in plan)
+    full_scan = any(line.startswith("SCAN reading") and "INDEX" not in line for line in plan)
+    return uses_index and not full_scan
+
+def run_plans(args):
+    """
+    Check that every hot query's plan uses its index instead of scanning a reading table.
+
+    Returns:
+        dict: Results, with "passed": False if any plan regressed
+    """
+    import datetime
+    from sqlalchemy import text
+    from sqlmodel import Session
+    from .db import engine
+    from . import storage
+
+    seconds = seed_readings(args.miners, args.rows)
+    with engine.begin() as connection:
+        connection.execute(text("ANALYZE"))
+
+    with Session(engine) as session:
+        # The table today's readings go to: the reading table, today's day table, or reading_compact
+        table = storage.write_table(session, datetime.datetime.utcnow())
+        session.commit()
+
+    queries = {}
+    for name, statement, index in hot_queries(table):
+        plan = explain(statement)
+        queries[name] = {"ok": plan_uses_index(plan, index), "expected_index": index, "plan": plan}
+
+    return {
+        "rows": args.rows,
+        "table": table.name,
+        "seed_seconds": round(seconds, 1),
+        "passed": all(query["ok"] for query in queries.values()),
+        "queries": queries,
+    }
+
+def _print_plans(results):
+    print(f"\nQuery plans over {results['rows']} readings in {results['table']} (seeded in {results['seed_seconds']}s)")
+    for name, query in results["queries"].items():
+        print(f"\n{'OK  ' if query['ok'] else 'FAIL'} {name} (expects {query['expected_index']})")
+        for line in query["plan"]:
+            print(f"       {line}")
+    print(f"\n{'All plans use their indexes' if results['passed'] else 'Query plan regression detected'}")
+
+def _table_sizes():
+    """
+    Get the on-disk size of each table including its indexes, from SQLite's dbstat.
+
+    Returns:
+        dict: Table name -> bytes
+    """
+    from sqlalchemy import text
+    from .db import engine
+
+    with engine.connect() as connection:
+        owners = dict(connection.execute(text("SELECT name, tbl_name FROM sqlite_master WHERE type IN ('table', 'index')")).all())
+        sizes = {}
+        for name, size in connection.execute(text("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name")).all():
+            table = owners.get(name, name)
+            sizes[table] = sizes.get(table, 0) + size
+    return sizes
+
+def _time_scans(session, table, start, repeats):
+    """Median seconds to load a range of readings into dicts, for one miner and for all miners."""
+    from . import storage
+
+    timings = {}
+    for name, miner_id in (("one_miner", 1), ("all_miners", None)):
+        durations = []
+        for _ in range(repeats):
+            began = time.perf_counter()
+            rows = [storage.to_row(row) for row in session.exec(storage.select_readings(table, start=start, miner_id=miner_id))]
+            durations.append(time.perf_counter() - began)
+        timings[name] = {"rows": len(rows), "ms": round(statistics.median(durations) * 1000, 2)}
+    return timings
+
+def run_schema(args):
+    """
+    Write the same synthetic history under the "single" and "compact" layouts and compare them.
+
+    Returns:
+        dict: Per layout: table, insert rate, size on disk and range scan times
+    """
+    import datetime
+    from sqlalchemy import text
+    from sqlmodel import Session
+    from .db import engine
+    from . import config, storage
+
+    with Session(engine) as session:
+        miner_ids = _create_miners(session, args.miners)
+        session.commit()
+
+    layouts = {}
+    for layout in ("single", "compact"):
+        config.STORAGE_LAYOUT = layout
+        began = time.perf_counter()
+        # Committed in poll-cycle sized transactions, like the sentry writes them
+        for batch in _synthetic_batches(miner_ids, args.rows, batch_size=args.batch_size):
+            with Session(engine) as session:
+                storage.insert_rows(session, batch)
+                session.commit()
+        elapsed = time.perf_counter() - began
+        with Session(engine) as session:
+            table = storage.write_table(session, datetime.datetime.utcnow())
+            session.commit()
+        layouts[layout] = {"table": table, "rows_per_second": round(args.rows / elapsed) if elapsed else None}
+
+    with engine.begin() as connection:
+        connection.execute(text("ANALYZE"))
+
+    sizes = _table_sizes()
+    start = datetime.datetime.utcnow() - datetime.timedelta(hours=args.scan_hours)
+    results = {"rows": args.rows, "miners": args.miners, "scan_hours": args.scan_hours, "layouts": {}}
+    with Session(engine) as session:
+        for layout, info in layouts.items():
+            table = info["table"]
+            results["layouts"][layout] = {
+                "table": table.name,
+                "rows_per_second": info["rows_per_second"],
+                "size_mb": round(sizes.get(table.name, 0) / 1_000_000, 2),
+                "bytes_per_row": round(sizes.get(table.name, 0) / args.rows, 1),
+                "scan": _time_scans(session, table, start, args.repeats),
+            }
+    return results
+
+def _print_schema(results):
+    print(f"\nReading schemas with {results['rows']} readings from {results['miners']} miners, scanning the last {results['scan_hours']}h")
+    print(f"{'layout':10} {'table':16} {'inserts/s':>10} {'size MB':>9} {'bytes/row':>10} {'1 miner ms':>11} {'all ms':>9}")
+    for layout, result in results["layouts"].items():
+        print(
+            f"{layout:10} {result['table']:16} {result['rows_per_second']:>10} {result['size_mb']:>9} {result['bytes_per_row']:>10} "
+            f"{result['scan']['one_miner']['ms']:>11} {result['scan']['all_miners']['ms']:>9}"
+        )
+
+# Run in a fresh interpreter for each start, so every run pays its own imports like a service restart
+_STARTUP_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+from bitaxe_sentry.sentry import db
+imported = time.perf_counter()
+if sys.argv[1] == "full":
+    # What every start did before init_db() checked the stored revision
+    db.SQLModel.metadata.create_all(db.engine)
+    db.run_migrations()
+else:
+    db.init_db()
+print(imported - start, time.perf_counter() - imported, "alembic" in sys.modules)
+"""
+
+def run_startup(args):
+    """
+    Time database initialization at startup on an up-to-date database.
+
+    Compares init_db() with the schema check against the full create_all and
+    Alembic upgrade every start used to run.
+
+    Returns:
+        dict: Per mode: module import, schema initialization and whole process times
+    """
+    import pathlib
+    import subprocess
+
+    seed_readings(args.miners, args.rows)
+
+    env = dict(os.environ)
+    package_root = str(pathlib.Path(__file__).resolve().parent.parent.parent)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [package_root, env.get("PYTHONPATH")]))
+
+    results = {"rows": args.rows, "repeats": args.repeats, "modes": {}}
+    for mode in ("fast", "full"):
+        import_times, init_times, process_times = [], [], []
+        loads_alembic = False
+        for _ in range(args.repeats):
+            began = time.perf_counter()
+            output = subprocess.run(
+                [sys.executable, "-c", _STARTUP_SCRIPT, mode],
+                env=env, capture_output=True, text=True, check=True,
+            ).stdout
+            process_times.append(time.perf_counter() - began)
+            imported, initialized, alembic_loaded = output.split()[-3:]
+            import_times.append(float(imported))
+            init_times.append(float(initialized))
+            loads_alembic = alembic_loaded == "True"
+        results["modes"][mode] = {
+            "import_ms": _summary(import_times, 1000),
+            "init_db_ms": _summary(init_times, 1000),
+            "process_ms": _summary(process_times, 1000),
+            "loads_alembic": loads_alembic,
+        }
+    return results
+
+def _print_startup(results):
+    print(f"\nStartup with {results['rows']} readings, median of {results['repeats']} runs (ms)")
+    print(f"{'mode':6} {'import':>8} {'init_db':>9} {'process':>9}  alembic")
+    for mode, result in results["modes"].items():
+        print(
+            f"{mode:6} {result['import_ms']['median']:>8} {result['init_db_ms']['median']:>9} "
+            f"{result['process_ms']['median']:>9}  {'loaded' if result['loads_alembic'] else 'not loaded'}"
+        )
+
+def _print_report(title, results):
+    print(f"\n{title}")
+    print("-" * len(title))
+    for key, value in results.items():
+        if isinstance(value, dict):
+            value = "  ".join(f"{k}={v}" for k, v in value.items())
+        print(f"{key:28} {value}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the poller against a simulated fleet")
+    subparsers = parser.add_subparsers(dest="command")
+
+    def add_common(subparser):
+        simulator.add_fleet_arguments(subparser)
+        subparser.add_argument("--concurrency", type=int, default=32, help="POLL_CONCURRENCY for the run")
+        subparser.add_argument("--interval", type=int, default=30, help="POLL_INTERVAL_SECONDS for the run")
+        subparser.add_argument("--deadline", type=int, default=60, help="CYCLE_DEADLINE_SECONDS for the run")
+        subparser.add_argument("--storage-layout", choices=STORAGE_LAYOUTS, default="single", help="STORAGE_LAYOUT for the run")
+        subparser.add_argument("--data-dir", help="Data directory to use (default: a temporary one, removed afterwards)")
+        subparser.add_argument("--json", action="store_true", help="Print results as JSON")
+        subparser.add_argument("--verbose", action="store_true", help="Show the sentry's own logging")
+
+    poll_parser = subparsers.add_parser("poll", help="Back-to-back poll cycles over the whole fleet")
+    add_common(poll_parser)
+    poll_parser.add_argument("--cycles", type=int, default=5, help="Number of poll cycles")
+
+    scheduler_parser = subparsers.add_parser("scheduler", help="Run the per-miner scheduler for a while")
+    add_common(scheduler_parser)
+    scheduler_parser.add_argument("--duration", type=float, default=60, help="Seconds to run for")
+
+    plans_parser = subparsers.add_parser("plans", help="Check that the hot reading queries use their indexes (exits 1 if not)")
+    plans_parser.add_argument("--miners", type=int, default=20, help="Miners to seed")
+    plans_parser.add_argument("--rows", type=int, default=200000, help="Readings to seed")
+    plans_parser.add_argument("--storage-layout", choices=STORAGE_LAYOUTS, default="single", help="STORAGE_LAYOUT for the run")
+    plans_parser.add_argument("--data-dir", help="Data directory to use (default: a temporary one, removed afterwards)")
+    plans_parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    plans_parser.add_argument("--verbose", action="store_true", help="Show the sentry's own logging")
+
+    schema_parser = subparsers.add_parser("schema", help="Compare the single and compact reading schemas: size, insert rate and range scans")
+    schema_parser.add_argument("--miners", type=int, default=20, help="Miners to seed")
+    schema_parser.add_argument("--rows", type=int, default=200000, help="Readings written under each layout")
+    schema_parser.add_argument("--batch-size", type=int, default=1000, help="Readings per insert transaction")
+    schema_parser.add_argument("--scan-hours", type=float, default=24, help="Range scanned by the read timings")
+    schema_parser.add_argument("--repeats", type=int, default=5, help="Runs of each range scan (the median is reported)")
+    schema_parser.add_argument("--data-dir", help="Data directory to use (default: a temporary one, removed afterwards)")
+    schema_parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    schema_parser.add_argument("--verbose", action="store_true", help="Show the sentry's own logging")
+
+    startup_parser = subparsers.add_parser("startup", help="Time database initialization at startup, with and without the schema version check")
+    startup_parser.add_argument("--miners", type=int, default=20, help="Miners to seed")
+    startup_parser.add_argument("--rows", type=int, default=200000, help="Readings to seed")
+    startup_parser.add_argument("--repeats", type=int, default=5, help="Starts timed per mode (the median is reported)")
+    startup_parser.add_argument("--data-dir", help="Data directory to use (default: a temporary one, removed afterwards)")
+    startup_parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    startup_parser.add_argument("--verbose", action="store_true", help="Show the sentry's own logging")
+
+    # "poll" is the default command
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or (argv[0] not in subparsers.choices and argv[0] not in ("-h", "--help")):
+        argv = ["poll"] + argv
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        # Failing and overheating miners are expected here; keep their log lines out of the report
+        logging.getLogger("bitaxe_sentry").setLevel(logging.CRITICAL)
+        logging.getLogger("alembic").setLevel(logging.WARNING)
+
+    if args.command == "plans":
+        data_dir = _prepare_data_dir(args.data_dir, {"STORAGE_LAYOUT": args.storage_layout})
+        try:
+            from .db import init_db
+            init_db()
+            results = run_plans(args)
+            if args.json:
+                print(json.dumps(results, indent=2))
+            else:
+                _print_plans(results)
+        finally:
+            if not args.data_dir:
+                shutil.rmtree(data_dir, ignore_errors=True)
+        sys.exit(0 if results["passed"] else 1)
+
+    if args.command == "startup":
+        data_dir = _prepare_data_dir(args.data_dir, {})
+        try:
+            from .db import init_db
+            init_db()
+            results = run_startup(args)
+            if args.json:
+                print(json.dumps(results, indent=2))
+            else:
+                _print_startup(results)
+        finally:
+            if not args.data_dir:
+                shutil.rmtree(data_dir, ignore_errors=True)
+        return
+
+    if args.command == "schema":
+        data_dir = _prepare_data_dir(args.data_dir, {})
+        try:
+            from .db import init_db
+            init_db()
+            results = run_schema(args)
+            if args.json:
+                print(json.dumps(results, indent=2))
+            else:
+                _print_schema(results)
+        finally:
+            if not args.data_dir:
+                shutil.rmtree(data_dir, ignore_errors=True)
+        return
+
+    fleet = simulator.fleet_from_args(args)
+    server = simulator.serve(fleet, port=0)
+    data_dir = _prepare_data_dir(args.data_dir, {
+        "BITAXE_ENDPOINTS": simulator.endpoints(server, args.miners),
+        "DISCORD_WEBHOOK_URL": simulator.webhook_url(server),
+        "POLL_CONCURRENCY": args.concurrency,
+        # Every simulated miner shares the simulator's host:port, so the
+        # per-host connection limit would otherwise cap the whole fleet
+        "HTTP_POOL_MAXSIZE": args.concurrency,
+        "POLL_INTERVAL_SECONDS": args.interval,
+        "CYCLE_DEADLINE_SECONDS": args.deadline,
+        "STORAGE_LAYOUT": args.storage_layout,
+    })
+
+    try:
+        from .db import init_db
+        init_db()
+
+        if args.command == "scheduler":
+            results = run_scheduler(args, fleet)
+        else:
+            results = run_poll(args, fleet)
+        results["database"] = _database_stats()
+        results["miners"] = args.miners
+
+        if args.json:
+            print(json.dumps(results, indent=2))
+        else:
+            _print_report(f"{args.command}: {args.miners} simulated miners", results)
+    finally:
+        server.shutdown()
+        from . import transport
+        transport.close_session()
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,170 @@
+import argparse
 import datetime
 import logging
-from sqlmodel import Session, delete
-from .config import RETENTION_DAYS
-from .db import engine, Reading
+import time
+from sqlmodel import Session
+from .config import reload_config
+from .db import engine, enable_incremental_vacuum, incremental_vacuum, incremental_vacuum_enabled
+from . import archive, rollups, storage
 
 logger = logging.getLogger(__name__)
 
+# Rows deleted per transaction; each batch holds the write lock only briefly
+CLEAN_BATCH_SIZE = 5000
+
+# Pause between batches so poll cycles and the web UI can get the lock in between
+CLEAN_PAUSE_SECONDS = 0.05
+
+def delete_batch(table, cutoff, batch_size=CLEAN_BATCH_SIZE):
+    """
+    Delete a table's oldest readings before the cutoff, at most one batch.
+
+    Args:
+        table: Reading table or day table
+        cutoff: Delete readings older than this
+        batch_size: Maximum rows to delete
+
+    Returns:
+        tuple: (rows deleted, seconds the write transaction was held)
+    """
+    with Session(engine) as session:
+        start = time.monotonic()
+        result = session.exec(storage.delete_before(table, cutoff, batch_size))
+        session.commit()
+        return result.rowcount, time.monotonic() - start
+
+def drop_partition(name):
+    """
+    Drop an expired day table.
+
+    Returns:
+        tuple: (rows dropped, seconds the write transaction was held)
+    """
+    with Session(engine) as session:
+        rows = storage.count_rows(session, name)
+        start = time.monotonic()
+        storage.drop_partition(session, name)
+        session.commit()
+        return rows, time.monotonic() - start
+
 def clean_old():
-    """Delete readings older than the retention period."""
+    """
+    Delete readings older than the retention period, then reclaim the space.
+
+    Day tables (see storage.py) that are wholly past retention are dropped.
+    Other readings are deleted in batches of CLEAN_BATCH_SIZE, each in its own
+    short transaction, so the sentry service can keep storing poll cycles while
+    a large backlog is cleaned. The retention setting is re-read on every run.
+
+    With ARCHIVE_FORMAT "parquet" the readings are archived first (see
+    archive.py), and nothing is deleted if archiving fails.
+
+    Returns:
+        dict: Rows deleted, rollup buckets deleted, partitions dropped, rows per
+        second, longest and total write lock hold in seconds, database pages
+        released and readings archived; None if archiving failed
+    """
+    reload_config()
+    from .config import RETENTION_DAYS, ARCHIVE_FORMAT
+
     cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=RETENTION_DAYS)
-    
+
+    # Held from archiving through the last delete, so a concurrent import can't
+    # add readings below the cutoff that get deleted without being archived
+    with archive.locked():
+        archived = 0
+        if ARCHIVE_FORMAT == "parquet":
+            try:
+                archived = archive.archive_before(cutoff)["rows"]
+            except Exception as e:
+                # Keep the readings until they can be archived
+                logger.error(f"Archiving readings failed, skipping cleanup: {e}")
+                return None
+
+        start = time.monotonic()
+        deleted_count = 0
+        batches = 0
+        lock_total = 0.0
+        lock_max = 0.0
+
+        with Session(engine) as session:
+            expired = storage.expired_partitions(session, cutoff)
+            tables = [table for table in storage.tables_for(session, end=cutoff) if table.name not in expired]
+
+        # Day tables that are entirely past retention go in one cheap DROP each
+        for name in expired:
+            dropped, held = drop_partition(name)
+            deleted_count += dropped
+            lock_total += held
+            lock_max = max(lock_max, held)
+            time.sleep(CLEAN_PAUSE_SECONDS)
+
+        # Everything else (the reading table and the day straddling the cutoff) row by row
+        for table in tables:
+            while True:
+                deleted, held = delete_batch(table, cutoff)
+                deleted_count += deleted
+                batches += 1
+                lock_total += held
+                lock_max = max(lock_max, held)
+                if deleted < CLEAN_BATCH_SIZE:
+                    break
+                time.sleep(CLEAN_PAUSE_SECONDS)
+
+    elapsed = time.monotonic() - start
+    rows_per_second = deleted_count / elapsed if elapsed > 0 else 0.0
+
+    # Expire rollup buckets on their own, longer schedule
     with Session(engine) as session:
-        # Count records to be deleted
-        stmt = delete(Reading).where(Reading.timestamp < cutoff)
-        result = session.exec(stmt)
-        deleted_count = result.rowcount
-        
-        # Commit the transaction
+        rollups_deleted = rollups.clean_old(session)
         session.commit()
-        
-        logger.info(f"Cleaned {deleted_count} readings older than {RETENTION_DAYS} days")
-        
-    return deleted_count 
\ No newline at end of file
+
+    logger.info(
+        f"Cleaned {deleted_count} readings older than {RETENTION_DAYS} days and {rollups_deleted} expired rollup buckets "
+        f"in {len(expired)} dropped partitions and {batches} batches: {rows_per_second:.0f} rows/s, write lock held {lock_max * 1000:.0f}ms max, {lock_total:.2f}s total"
+    )
+
+    # Give the freed pages back to the filesystem. Converting a database that
+    # isn't in incremental mode yet takes a full VACUUM, so that is left to main()
+    pages_released = 0
+    try:
+        if incremental_vacuum_enabled():
+            pages_released = incremental_vacuum()
+            if pages_released:
+                logger.info(f"Released {pages_released} free database pages")
+        else:
+            logger.info("Database is not in incremental auto-vacuum mode, freed pages are reused but not released; "
+                        "run `python -m bitaxe_sentry.sentry.cleaner vacuum` during downtime to convert it")
+    except Exception as e:
+        logger.warning(f"Could not vacuum database: {e}")
+
+    return {
+        "deleted": deleted_count,
+        "rollups_deleted": rollups_deleted,
+        "partitions_dropped": len(expired),
+        "batches": batches,
+        "rows_per_second": round(rows_per_second, 1),
+        "lock_max_seconds": round(lock_max, 4),
+        "lock_total_seconds": round(lock_total, 4),
+        "pages_released": pages_released,
+        "archived": archived,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Database maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("vacuum", help="Convert the database to incremental auto-vacuum (one full VACUUM; stop the services first)")
+    args = parser.parse_args()
+
+    from .db import init_db
+    init_db()
+
+    if args.command == "vacuum":
+        start = time.monotonic()
+        if enable_incremental_vacuum():
+            print(f"Converted the database to incremental auto-vacuum in {time.monotonic() - start:.1f}s")
+        else:
+            print("The database already uses incremental auto-vacuum")
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,41 @@ RETENTION_DAYS = settings["RETENTION_DAYS"]
 TEMP_MIN = settings["TEMP_MIN"]
 TEMP_MAX = settings["TEMP_MAX"]
 VOLT_MIN = settings["VOLT_MIN"]
+POLL_CONCURRENCY = settings["POLL_CONCURRENCY"]
+HTTP_POOL_MAXSIZE = settings["HTTP_POOL_MAXSIZE"]
+
+# Per-miner scheduling. POLL_INTERVAL_SECONDS overrides the minutes setting when non-zero.
+POLL_INTERVAL_SECONDS = settings["POLL_INTERVAL_SECONDS"] or POLL_INTERVAL * 60
+ALERT_POLL_INTERVAL_SECONDS = settings["ALERT_POLL_INTERVAL_SECONDS"]
+STABLE_INTERVAL_MULTIPLIER = settings["STABLE_INTERVAL_MULTIPLIER"]
+POLL_JITTER = settings["POLL_JITTER"]
+
+# Circuit breaker for miners that stop responding
+BREAKER_FAILURE_THRESHOLD = settings["BREAKER_FAILURE_THRESHOLD"]
+BREAKER_PROBE_TIMEOUT_SECONDS = settings["BREAKER_PROBE_TIMEOUT_SECONDS"]
+BREAKER_MAX_BACKOFF_SECONDS = settings["BREAKER_MAX_BACKOFF_SECONDS"]
+
+# Hard limit on how long one poll cycle may spend fetching
+CYCLE_DEADLINE_SECONDS = settings["CYCLE_DEADLINE_SECONDS"]
+
+# LAN discovery scans
+DISCOVERY_CONCURRENCY = settings["DISCOVERY_CONCURRENCY"]
+DISCOVERY_TIMEOUT_SECONDS = settings["DISCOVERY_TIMEOUT_SECONDS"]
+
+# Streaming ingestion
+INGEST_MODE = settings["INGEST_MODE"]
+STREAM_PATH = settings["STREAM_PATH"]
+STREAM_RESOLUTION_SECONDS = settings["STREAM_RESOLUTION_SECONDS"]
+STREAM_RETRY_SECONDS = settings["STREAM_RETRY_SECONDS"]
+
+# Hourly and daily rollups are kept this long (0 = same as RETENTION_DAYS)
+ROLLUP_RETENTION_DAYS = settings["ROLLUP_RETENTION_DAYS"]
+
+# "single" reading table or "daily" partitions
+STORAGE_LAYOUT = settings["STORAGE_LAYOUT"]
+
+# "none" or "parquet" archiving of readings past retention
+ARCHIVE_FORMAT = settings["ARCHIVE_FORMAT"]
 
 # Process endpoints
 ENDPOINTS = []
@@ -55,7 +90,11 @@ last_modified_time = get_config_mtime()
 
 def reload_config():
     """Reload configuration from JSON config file if it has been modified"""
-    global POLL_INTERVAL, RETENTION_DAYS, TEMP_MIN, TEMP_MAX, VOLT_MIN, ENDPOINTS, DISCORD_WEBHOOK, last_modified_time
+    global POLL_INTERVAL_SECONDS, ALERT_POLL_INTERVAL_SECONDS, STABLE_INTERVAL_MULTIPLIER, POLL_JITTER
+    global BREAKER_FAILURE_THRESHOLD, BREAKER_PROBE_TIMEOUT_SECONDS, BREAKER_MAX_BACKOFF_SECONDS, CYCLE_DEADLINE_SECONDS
+    global DISCOVERY_CONCURRENCY, DISCOVERY_TIMEOUT_SECONDS
+    global INGEST_MODE, STREAM_PATH, STREAM_RESOLUTION_SECONDS, STREAM_RETRY_SECONDS, ROLLUP_RETENTION_DAYS, STORAGE_LAYOUT, ARCHIVE_FORMAT
+    global POLL_INTERVAL, RETENTION_DAYS, TEMP_MIN, TEMP_MAX, VOLT_MIN, POLL_CONCURRENCY, HTTP_POOL_MAXSIZE, ENDPOINTS, DISCORD_WEBHOOK, last_modified_time
     
     # Check if the config file has been modified
     current_mtime = get_config_mtime()
@@ -74,6 +113,25 @@ def reload_config():
     TEMP_MIN = settings["TEMP_MIN"]
     TEMP_MAX = settings["TEMP_MAX"]
     VOLT_MIN = settings["VOLT_MIN"]
+    POLL_CONCURRENCY = settings["POLL_CONCURRENCY"]
+    HTTP_POOL_MAXSIZE = settings["HTTP_POOL_MAXSIZE"]
+    POLL_INTERVAL_SECONDS = settings["POLL_INTERVAL_SECONDS"] or POLL_INTERVAL * 60
+    ALERT_POLL_INTERVAL_SECONDS = settings["ALERT_POLL_INTERVAL_SECONDS"]
+    STABLE_INTERVAL_MULTIPLIER = settings["STABLE_INTERVAL_MULTIPLIER"]
+    POLL_JITTER = settings["POLL_JITTER"]
+    BREAKER_FAILURE_THRESHOLD = settings["BREAKER_FAILURE_THRESHOLD"]
+    BREAKER_PROBE_TIMEOUT_SECONDS = settings["BREAKER_PROBE_TIMEOUT_SECONDS"]
+    BREAKER_MAX_BACKOFF_SECONDS = settings["BREAKER_MAX_BACKOFF_SECONDS"]
+    CYCLE_DEADLINE_SECONDS = settings["CYCLE_DEADLINE_SECONDS"]
+    DISCOVERY_CONCURRENCY = settings["DISCOVERY_CONCURRENCY"]
+    DISCOVERY_TIMEOUT_SECONDS = settings["DISCOVERY_TIMEOUT_SECONDS"]
+    INGEST_MODE = settings["INGEST_MODE"]
+    STREAM_PATH = settings["STREAM_PATH"]
+    STREAM_RESOLUTION_SECONDS = settings["STREAM_RESOLUTION_SECONDS"]
+    STREAM_RETRY_SECONDS = settings["STREAM_RETRY_SECONDS"]
+    ROLLUP_RETENTION_DAYS = settings["ROLLUP_RETENTION_DAYS"]
+    STORAGE_LAYOUT = settings["STORAGE_LAYOUT"]
+    ARCHIVE_FORMAT = settings["ARCHIVE_FORMAT"]
     DISCORD_WEBHOOK = settings["DISCORD_WEBHOOK_URL"]
     
     # Process endpoints
@@ -90,10 +148,12 @@ def reload_config():
     last_modified_time = current_mtime
     
     logger.info(f"Updated configuration:")
-    logger.info(f"- Poll interval: {POLL_INTERVAL} minutes")
+    logger.info(f"- Poll interval: {POLL_INTERVAL_SECONDS} seconds (alerting miners: {ALERT_POLL_INTERVAL_SECONDS} seconds)")
     logger.info(f"- Retention days: {RETENTION_DAYS}")
     logger.info(f"- Temperature range: {TEMP_MIN}°C - {TEMP_MAX}°C")
     logger.info(f"- Minimum voltage: {VOLT_MIN}V")
+    logger.info(f"- Poll concurrency: {POLL_CONCURRENCY}")
+    logger.info(f"- HTTP connections per miner: {HTTP_POOL_MAXSIZE}")
     logger.info(f"- Endpoints: {ENDPOINTS}")
     
     # Log Discord webhook status
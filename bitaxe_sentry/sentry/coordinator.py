@@ -0,0 +1,324 @@
+import contextlib
+import datetime
+import json
+import logging
+import os
+import pathlib
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; cycles are then only coordinated within a process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Shared with the other process (sentry service and web UI use the same data directory)
+DATA_DIR = pathlib.Path(os.getenv("DB_DATA_DIR", "/app/data"))
+LOCK_FILE = DATA_DIR / "poll_cycle.lock"
+STATUS_FILE = DATA_DIR / "poll_cycle_status.json"
+STATS_FILE = DATA_DIR / "poll_cycle_stats.json"
+# The sentry service's in-memory stats, published for the web UI to serve
+SERVICE_STATUS_FILE = DATA_DIR / "sentry_status.json"
+
+# Number of recent cycles kept in the stats file
+RECENT_CYCLES = 50
+
+# Extra time allowed past the cycle deadline (for storing results) before a
+# waiting process assumes the lock holder is stuck and runs anyway
+LOCK_GRACE_SECONDS = 30
+
+_cycle_lock = threading.Lock()
+_inflight_lock = threading.Lock()
+
+# The cycle currently running in this process: {"endpoints": set, "done": Event, "outcomes": dict or None}
+_inflight = None
+
+# Scheduled cycles (one per due miner or handful of miners) are summed here and
+# recorded as one stats entry per poll interval, so they don't crowd out the
+# recent list or rewrite the stats file on every wakeup
+_sweep_lock = threading.Lock()
+_sweep = None
+
+def _read_json(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+def _write_json(path, data):
+    try:
+        DATA_DIR.mkdir(exist_ok=True)
+        temp_file = path.with_suffix('.tmp')
+        with open(temp_file, 'w') as f:
+            json.dump(data, f)
+        temp_file.replace(path)
+    except Exception as e:
+        logger.warning(f"Could not write {path}: {e}")
+
+def _update_stats(update):
+    """Apply update(stats) to the shared stats file while holding its lock."""
+    try:
+        DATA_DIR.mkdir(exist_ok=True)
+        with open(STATS_FILE.with_suffix('.lock'), 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            stats = _read_json(STATS_FILE) or {}
+            for key in ("cycles", "coalesced", "truncated_cycles", "truncated_miners"):
+                stats.setdefault(key, 0)
+            stats.setdefault("recent", [])
+            update(stats)
+            stats["recent"] = stats["recent"][-RECENT_CYCLES:]
+            _write_json(STATS_FILE, stats)
+    except Exception as e:
+        logger.warning(f"Could not update poll cycle stats: {e}")
+
+def _record_coalesced(trigger):
+    logger.info(f"{trigger.capitalize()} poll coalesced into the cycle already in flight")
+
+    def update(stats):
+        stats["coalesced"] += 1
+        stats["last_coalesced_at"] = datetime.datetime.utcnow().isoformat() + "Z"
+    _update_stats(update)
+
+def _record_entry(entry, truncated_cycles):
+    def update(stats):
+        stats["cycles"] += entry["cycles"]
+        if entry["truncated"]:
+            stats["truncated_cycles"] += truncated_cycles
+            stats["truncated_miners"] += entry["truncated"]
+        stats["recent"].append(entry)
+    _update_stats(update)
+
+def _add_to_sweep(started_at, duration, outcomes, successful, truncated):
+    """
+    Add a scheduled cycle to the current sweep.
+
+    Returns:
+        tuple: (stats entry, truncated cycles) once the sweep has run for a
+        poll interval, otherwise None
+    """
+    global _sweep
+    from .config import POLL_INTERVAL_SECONDS
+
+    with _sweep_lock:
+        if _sweep is None:
+            _sweep = {"started_at": started_at, "began": time.monotonic(), "cycles": 0, "duration": 0.0,
+                      "miners": set(), "polls": 0, "successful": 0, "truncated": 0, "truncated_cycles": 0}
+        _sweep["cycles"] += 1
+        _sweep["duration"] += duration
+        _sweep["miners"].update(outcomes)
+        _sweep["polls"] += len(outcomes)
+        _sweep["successful"] += successful
+        _sweep["truncated"] += truncated
+        _sweep["truncated_cycles"] += 1 if truncated else 0
+        if time.monotonic() - _sweep["began"] < POLL_INTERVAL_SECONDS:
+            return None
+        sweep, _sweep = _sweep, None
+
+    return {
+        "started_at": sweep["started_at"],
+        "duration": round(sweep["duration"], 3),
+        "trigger": "scheduled",
+        "pid": os.getpid(),
+        "cycles": sweep["cycles"],
+        "miners": len(sweep["miners"]),
+        "polls": sweep["polls"],
+        "successful": sweep["successful"],
+        "truncated": sweep["truncated"],
+    }, sweep["truncated_cycles"]
+
+def _record_cycle(trigger, started_at, duration, outcomes):
+    truncated = sum(1 for outcome in outcomes.values() if outcome["status"] == "truncated")
+    success = sum(1 for outcome in outcomes.values() if outcome["status"] in ("ok", "alert"))
+
+    if trigger == "scheduled":
+        swept = _add_to_sweep(started_at, duration, outcomes, success, truncated)
+        if swept is not None:
+            _record_entry(*swept)
+        return
+
+    _record_entry({
+        "started_at": started_at,
+        "duration": round(duration, 3),
+        "trigger": trigger,
+        "pid": os.getpid(),
+        "cycles": 1,
+        "miners": len(outcomes),
+        "polls": len(outcomes),
+        "successful": success,
+        "truncated": truncated,
+    }, 1 if truncated else 0)
+
+def _joined(endpoints, outcomes):
+    """Build the result for a trigger that was coalesced into another cycle."""
+    return {
+        endpoint_url: dict(outcomes.get(endpoint_url, {"status": "coalesced", "reading": None}), coalesced=True)
+        for endpoint_url in endpoints
+    }
+
+def _finished_since(status, since):
+    """Check whether a status file entry is a finished cycle that ended after the given time."""
+    finished_at = status.get("finished_at")
+    if finished_at is None or status.get("outcomes") is None:
+        return False
+    return datetime.datetime.fromisoformat(finished_at.rstrip("Z")) >= since
+
+@contextlib.contextmanager
+def _process_lock(requested, trigger):
+    """
+    Hold the cross-process cycle lock.
+
+    Yields None once the lock is held, or the outcomes of another process's
+    cycle if that cycle covered every requested endpoint and we waited for it instead.
+    """
+    if fcntl is None:
+        yield None
+        return
+
+    from .config import CYCLE_DEADLINE_SECONDS
+
+    DATA_DIR.mkdir(exist_ok=True)
+    with open(LOCK_FILE, 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            acquired = True
+        except OSError:
+            acquired = False
+
+        joined = None
+        if not acquired:
+            status = _read_json(STATUS_FILE) or {}
+            logger.info(f"Poll cycle in progress in process {status.get('pid')}, waiting for it to finish")
+            waiting_since = datetime.datetime.utcnow()
+
+            give_up_at = time.monotonic() + CYCLE_DEADLINE_SECONDS + LOCK_GRACE_SECONDS
+            while not acquired and time.monotonic() < give_up_at:
+                time.sleep(0.2)
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    acquired = True
+                except OSError:
+                    pass
+
+            if not acquired:
+                logger.warning("Poll cycle lock holder appears stuck, running without the lock")
+            else:
+                # Decide from the status as it is now the lock is held: the one read
+                # before waiting may have been left by an earlier cycle
+                status = _read_json(STATUS_FILE) or {}
+                if _finished_since(status, waiting_since) and requested <= set(status.get("endpoints", [])):
+                    joined = {
+                        endpoint_url: {"status": outcome_status, "reading": None}
+                        for endpoint_url, outcome_status in status["outcomes"].items()
+                    }
+                    _record_coalesced(trigger)
+
+        try:
+            yield joined
+        finally:
+            if acquired:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def run_cycle(endpoints, runner, trigger="scheduled"):
+    """
+    Run a poll cycle with at most one cycle in flight across both processes.
+
+    A trigger that arrives while another cycle is running (in this process or
+    the other one) waits for it. If that cycle already covered every endpoint
+    the trigger asked for, its results are reused instead of polling again;
+    otherwise the trigger runs its own cycle once the first one finishes.
+    Each cycle is recorded in the shared stats file, scheduled ones summed
+    into one entry per poll interval.
+
+    Args:
+        endpoints: Endpoints the cycle will poll
+        runner: Callable that polls the endpoints and returns their outcomes
+        trigger: What started the cycle ("scheduled", "manual", "startup", ...), for stats
+
+    Returns:
+        dict: endpoint -> outcome. Outcomes reused from another cycle have "coalesced": True
+    """
+    global _inflight
+    requested = set(endpoints)
+
+    with _inflight_lock:
+        inflight = _inflight
+    if inflight and requested <= inflight["endpoints"]:
+        inflight["done"].wait()
+        if inflight["outcomes"] is not None:
+            _record_coalesced(trigger)
+            return _joined(endpoints, inflight["outcomes"])
+
+    with _cycle_lock:
+        with _process_lock(requested, trigger) as joined:
+            if joined is not None:
+                return _joined(endpoints, joined)
+
+            inflight = {"endpoints": requested, "done": threading.Event(), "outcomes": None}
+            with _inflight_lock:
+                _inflight = inflight
+
+            started_at = datetime.datetime.utcnow().isoformat() + "Z"
+            _write_json(STATUS_FILE, {"pid": os.getpid(), "trigger": trigger, "started_at": started_at, "endpoints": sorted(requested)})
+
+            start = time.monotonic()
+            try:
+                outcomes = runner()
+                inflight["outcomes"] = outcomes
+            finally:
+                inflight["done"].set()
+                with _inflight_lock:
+                    _inflight = None
+
+            duration = time.monotonic() - start
+            _write_json(STATUS_FILE, {
+                "pid": os.getpid(),
+                "trigger": trigger,
+                "started_at": started_at,
+                "finished_at": datetime.datetime.utcnow().isoformat() + "Z",
+                "duration": round(duration, 3),
+                "endpoints": sorted(requested),
+                "outcomes": {endpoint_url: outcome["status"] for endpoint_url, outcome in outcomes.items()},
+            })
+
+    _record_cycle(trigger, started_at, duration, outcomes)
+    return outcomes
+
+def get_stats():
+    """
+    Get poll cycle stats shared by both processes.
+
+    Returns:
+        dict: Totals for cycles, coalesced triggers and truncated cycles/miners,
+        plus the most recent cycles (scheduled cycles summed per poll interval)
+    """
+    stats = _read_json(STATS_FILE) or {}
+    for key in ("cycles", "coalesced", "truncated_cycles", "truncated_miners"):
+        stats.setdefault(key, 0)
+    stats.setdefault("recent", [])
+    return stats
+
+def publish_service_status(sections):
+    """
+    Publish the sentry service's in-memory stats for the web UI.
+
+    Args:
+        sections: Section name -> JSON-serializable stats
+    """
+    _write_json(SERVICE_STATUS_FILE, {
+        "pid": os.getpid(),
+        "updated_at": datetime.datetime.utcnow().isoformat() + "Z",
+        **sections,
+    })
+
+def get_service_status():
+    """
+    Get the stats last published by the sentry service.
+
+    Returns:
+        dict: "pid", "updated_at" and one entry per section, or {} if nothing has been published
+    """
+    return _read_json(SERVICE_STATUS_FILE) or {}
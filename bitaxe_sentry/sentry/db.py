@@ -1,8 +1,16 @@
 from sqlmodel import SQLModel, Field, create_engine, Session, select
+from sqlalchemy import Index, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import QueuePool
+from typing import Optional
+import configparser
 import datetime
+import re
+import time
 import pathlib
 import os
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -21,56 +29,356 @@ else:
         else:
             DB_PATH = pathlib.Path(__file__).parent.parent / "bitaxe_sentry.db"
 
+# SQLite integers are signed 64-bit; larger difficulties are clamped to this
+MAX_SQLITE_INT = 2**63 - 1
+
 
 class Miner(SQLModel, table=True):
     id: int = Field(default=None, primary_key=True)
     name: str
-    endpoint: str
+    endpoint: str = Field(index=True, unique=True)
     added_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
 
 
 class Reading(SQLModel, table=True):
+    # Per-miner latest reading and history queries; also serves lookups by miner_id alone
+    __table_args__ = (Index("ix_reading_miner_id_timestamp", "miner_id", "timestamp"),)
+
     id: int = Field(default=None, primary_key=True)
     miner_id: int = Field(foreign_key="miner.id")
-    timestamp: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
+    timestamp: datetime.datetime = Field(default_factory=datetime.datetime.utcnow, index=True)
     hash_rate: float
     temperature: float
     best_diff: str
+    best_diff_value: Optional[int] = Field(default=None)  # best_diff parsed to an integer, for comparisons and SQL aggregates
     voltage: float = Field(default=0.0)  # Voltage in millivolts
     error_percentage: float = Field(default=0.0)  # Error percentage
     # Additional fields can be added here as needed
 
 
+class ReadingRollup(SQLModel, table=True):
+    """Per-miner aggregates of readings over fixed time buckets (see rollups.py)."""
+    __tablename__ = "reading_rollup"
+    # Chart queries across all miners; per-miner queries use the primary key
+    __table_args__ = (Index("ix_reading_rollup_resolution_bucket", "resolution", "bucket"),)
+
+    miner_id: int = Field(foreign_key="miner.id", primary_key=True)
+    resolution: int = Field(primary_key=True)  # Bucket size in seconds
+    bucket: datetime.datetime = Field(primary_key=True)  # Bucket start (UTC)
+    count: int
+    last_timestamp: datetime.datetime  # Timestamp of the reading the *_last values come from
+    hash_rate_min: float
+    hash_rate_max: float
+    hash_rate_sum: float
+    hash_rate_last: float
+    temperature_min: float
+    temperature_max: float
+    temperature_sum: float
+    temperature_last: float
+    voltage_min: float
+    voltage_max: float
+    voltage_sum: float
+    voltage_last: float
+    error_percentage_min: float
+    error_percentage_max: float
+    error_percentage_sum: float
+    error_percentage_last: float
+
+
+class MinerLatest(SQLModel, table=True):
+    """Copy of each miner's newest reading, kept current by ingestion (see latest.py)."""
+    __tablename__ = "miner_latest"
+
+    miner_id: int = Field(foreign_key="miner.id", primary_key=True)
+    timestamp: datetime.datetime
+    hash_rate: float
+    temperature: float
+    best_diff: str
+    best_diff_value: Optional[int] = Field(default=None)
+    voltage: float = Field(default=0.0)  # Voltage in millivolts
+    error_percentage: float = Field(default=0.0)  # Error percentage
+
+
+# Connection tuning. The sentry service writes and the web UI reads the same
+# file; in WAL mode readers never wait for a poll cycle's write and vice versa.
+BUSY_TIMEOUT_MS = 30000  # Wait this long for another writer instead of failing with "database is locked"
+MMAP_SIZE_BYTES = 128 * 1024 * 1024
+CACHE_SIZE_KIB = 16 * 1024  # Per connection
+
+# A checkpoint that has copied the whole WAL back into the database also
+# truncates the WAL file once it has grown past this size
+WAL_TRUNCATE_BYTES = 64 * 1024 * 1024
+
+# PRAGMA auto_vacuum value for INCREMENTAL
+AUTO_VACUUM_INCREMENTAL = 2
+
+# Read-only connection pool for the web UI's page and API reads. Sized so each
+# of uvicorn's worker threads (40 by default) can hold a connection; the first
+# READ_POOL_SIZE are opened at startup and kept, the rest are opened on demand
+# and closed when returned.
+READ_POOL_SIZE = 8
+READ_POOL_MAX_OVERFLOW = 32
+READ_POOL_TIMEOUT_SECONDS = 10
+# Prepared statements kept per connection by sqlite3 (its default is 128)
+READ_CACHED_STATEMENTS = 256
+
 # Create SQLite engine
 engine = create_engine(f"sqlite:///{DB_PATH}", echo=False)
 
+# Opened with mode=ro, so nothing served from it can write, and with
+# check_same_thread off so pooled connections can move between worker threads
+read_engine = create_engine(
+    f"sqlite:///file:{DB_PATH}?mode=ro&uri=true",
+    echo=False,
+    poolclass=QueuePool,
+    pool_size=READ_POOL_SIZE,
+    max_overflow=READ_POOL_MAX_OVERFLOW,
+    pool_timeout=READ_POOL_TIMEOUT_SECONDS,
+    connect_args={"check_same_thread": False, "cached_statements": READ_CACHED_STATEMENTS},
+)
 
-def run_migrations():
-    """Run Alembic migrations to update database schema."""
+_read_pool_lock = threading.Lock()
+_read_pool_stats = {"connections_opened": 0, "checkouts": 0, "checkout_wait_seconds": 0.0, "warmed": 0}
+
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # Let SQLAlchemy emit BEGIN itself (see _begin below) instead of the sqlite3
+    # module, which only opens a transaction before an INSERT/UPDATE/DELETE
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    # Only takes effect on a new database; existing ones are converted by enable_incremental_vacuum()
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    # Safe with WAL: a power cut can lose the last commits but never corrupts the database
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={MMAP_SIZE_BYTES}")
+    cursor.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+    cursor.close()
+
+
+@event.listens_for(engine, "begin")
+def _begin(conn):
+    # Every transaction starts with an explicit BEGIN, so a SAVEPOINT issued first
+    # is nested inside it and its RELEASE doesn't commit anything on its own
+    conn.exec_driver_sql("BEGIN")
+
+@event.listens_for(read_engine, "connect")
+def _set_read_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={MMAP_SIZE_BYTES}")
+    cursor.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+    # Parse the schema now rather than in the first request to use this connection
+    cursor.execute("SELECT count(*) FROM sqlite_master").fetchone()
+    cursor.close()
+    with _read_pool_lock:
+        _read_pool_stats["connections_opened"] += 1
+
+
+@event.listens_for(read_engine, "checkout")
+def _count_read_checkout(dbapi_connection, connection_record, connection_proxy):
+    with _read_pool_lock:
+        _read_pool_stats["checkouts"] += 1
+
+
+def checkpoint():
+    """
+    Copy committed WAL pages back into the database file.
+
+    Runs a PASSIVE checkpoint, which never blocks readers or writers. If that
+    got through the whole WAL and the file has grown large, it is truncated.
+
+    Returns:
+        tuple: (busy, WAL pages, pages checkpointed) as reported by SQLite
+    """
+    wal_path = pathlib.Path(f"{DB_PATH}-wal")
+    connection = engine.raw_connection()
     try:
-        from alembic import command
-        from alembic.config import Config
+        cursor = connection.cursor()
+        busy, wal_pages, checkpointed = cursor.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        if not busy and wal_pages == checkpointed and wal_path.exists() and wal_path.stat().st_size > WAL_TRUNCATE_BYTES:
+            logger.info(f"Truncating {wal_path.stat().st_size // (1024 * 1024)} MB WAL file")
+            busy, wal_pages, checkpointed = cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        cursor.close()
+    finally:
+        connection.close()
+    
+    logger.debug(f"WAL checkpoint: {checkpointed}/{wal_pages} pages, busy={busy}")
+    return busy, wal_pages, checkpointed
+
+
+def incremental_vacuum_enabled():
+    """
+    Check whether the database is in incremental auto-vacuum mode.
+
+    Returns:
+        bool: True if free pages can be reclaimed by incremental_vacuum()
+    """
+    with engine.connect() as connection:
+        return connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == AUTO_VACUUM_INCREMENTAL
+
+
+def enable_incremental_vacuum():
+    """
+    Switch the database to incremental auto-vacuum if it isn't already.
+
+    Databases created before auto-vacuum was enabled need one full VACUUM to
+    convert, which rewrites the file and holds the write lock while it runs,
+    so this is only run on request (python -m bitaxe_sentry.sentry.cleaner
+    vacuum), ideally with the services stopped. Afterwards free pages are
+    reclaimed a few at a time by incremental_vacuum().
+
+    Returns:
+        bool: True if the database was converted by this call
+    """
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+            cursor.close()
+            return False
         
-        # Try multiple paths to find alembic.ini (works in both dev and Docker)
-        possible_paths = [
-            pathlib.Path(__file__).parent.parent.parent / "alembic.ini",  # Project root
-            pathlib.Path("/app/alembic.ini"),  # Docker container
-            pathlib.Path.cwd() / "alembic.ini",  # Current working directory
-        ]
+        logger.info("Converting database to incremental auto-vacuum, this rewrites the file once...")
+        start = time.monotonic()
+        cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        cursor.execute("VACUUM")
+        cursor.close()
+        logger.info(f"Database converted to incremental auto-vacuum in {time.monotonic() - start:.1f}s")
+        return True
+    finally:
+        connection.close()
+
+
+def incremental_vacuum(pages_per_step=1000, pause_seconds=0.05, stop_after_seconds=60):
+    """
+    Return free pages to the filesystem a chunk at a time.
+
+    Each step is its own short write, so poll cycles can commit in between.
+
+    Args:
+        pages_per_step: Pages released per step
+        pause_seconds: Sleep between steps
+        stop_after_seconds: Give up after this long; the rest is reclaimed on the next run
+
+    Returns:
+        int: Number of pages released
+    """
+    start = time.monotonic()
+    released = 0
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+            cursor.close()
+            return 0
         
-        alembic_ini_path = None
-        for path in possible_paths:
-            if path.exists():
-                alembic_ini_path = path
+        while time.monotonic() - start < stop_after_seconds:
+            free_pages = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+            if not free_pages:
+                break
+            # The pragma frees one page per step of the statement, and execute()
+            # only steps it once; executescript() runs it to completion
+            cursor.executescript(f"PRAGMA incremental_vacuum({pages_per_step});")
+            step_released = free_pages - cursor.execute("PRAGMA freelist_count").fetchone()[0]
+            if step_released <= 0:
                 break
+            released += step_released
+            time.sleep(pause_seconds)
+        cursor.close()
+    finally:
+        connection.close()
+    
+    return released
+
+
+def find_alembic_ini():
+    """
+    Find alembic.ini (works in both dev and Docker).
+
+    Returns:
+        pathlib.Path: Path to alembic.ini, or None if there isn't one
+    """
+    possible_paths = [
+        pathlib.Path(__file__).parent.parent.parent / "alembic.ini",  # Project root
+        pathlib.Path("/app/alembic.ini"),  # Docker container
+        pathlib.Path.cwd() / "alembic.ini",  # Current working directory
+    ]
+    for path in possible_paths:
+        if path.exists():
+            return path
+    return None
+
+
+def _script_location(alembic_ini_path):
+    """The migrations directory named in alembic.ini, as an absolute path."""
+    parser = configparser.RawConfigParser()
+    parser.read(alembic_ini_path)
+    location = pathlib.Path(parser.get("alembic", "script_location", fallback="alembic"))
+    # Relative to alembic.ini, not the current directory
+    return location if location.is_absolute() else alembic_ini_path.parent / location
+
+
+_REVISION = re.compile(r"^revision\s*=\s*['\"]([^'\"]+)['\"]", re.MULTILINE)
+_DOWN_REVISION = re.compile(r"^down_revision\s*=\s*['\"]([^'\"]+)['\"]", re.MULTILINE)
+
+
+def packaged_head(script_location):
+    """
+    Find the newest packaged migration by reading the migration files, without importing Alembic.
+
+    Args:
+        script_location: Migrations directory (containing versions/)
+
+    Returns:
+        str: The head revision, or None if it can't be determined (e.g. several heads)
+    """
+    revisions = set()
+    parents = set()
+    for path in (pathlib.Path(script_location) / "versions").glob("*.py"):
+        source = path.read_text()
+        revision = _REVISION.search(source)
+        if revision:
+            revisions.add(revision.group(1))
+        down_revision = _DOWN_REVISION.search(source)
+        if down_revision:
+            parents.add(down_revision.group(1))
+    heads = revisions - parents
+    return heads.pop() if len(heads) == 1 else None
+
+
+def stored_revision():
+    """
+    Get the migration revision recorded in the database.
+
+    Returns:
+        str: The revision, or None for a new database or one Alembic has never run on
+    """
+    with engine.connect() as connection:
+        try:
+            return connection.exec_driver_sql("SELECT version_num FROM alembic_version").scalar()
+        except OperationalError:
+            return None
+
+
+def run_migrations(alembic_ini_path=None):
+    """Run Alembic migrations to update database schema."""
+    try:
+        from alembic import command
+        from alembic.config import Config
         
+        alembic_ini_path = alembic_ini_path or find_alembic_ini()
         if not alembic_ini_path:
             logger.warning("Could not find alembic.ini file, skipping migrations")
             return
         
-        # Load config - Alembic resolves script_location relative to alembic.ini location
         alembic_cfg = Config(str(alembic_ini_path))
         
+        # Alembic resolves a relative script_location against the current
+        # directory, so pin it to the one next to alembic.ini
+        alembic_cfg.set_main_option('script_location', str(_script_location(alembic_ini_path)))
+        
         # Override database URL (since it's set dynamically)
         alembic_cfg.set_main_option('sqlalchemy.url', f'sqlite:///{DB_PATH}')
         
@@ -83,15 +391,92 @@ def run_migrations():
 
 
 def init_db():
-    """Initialize the database by creating all tables and running migrations."""
+    """
+    Initialize the database by creating all tables and running migrations.
+
+    If the database is already at the newest packaged migration, both are
+    skipped: startup then costs one query instead of a schema inspection and
+    an Alembic run.
+
+    Returns:
+        bool: True if the schema was already current
+    """
+    alembic_ini_path = find_alembic_ini()
+    head = packaged_head(_script_location(alembic_ini_path)) if alembic_ini_path else None
+    if head is not None and stored_revision() == head:
+        logger.info(f"Database schema is current ({head})")
+        return True
+    
     # First, ensure tables exist (for fresh installs)
     SQLModel.metadata.create_all(engine)
     
     # Then run migrations (for existing databases that need schema updates)
-    run_migrations()
+    run_migrations(alembic_ini_path)
+    return False
 
 
 def get_session():
     """Get a database session."""
     with Session(engine) as session:
-        yield session 
\ No newline at end of file
+        yield session
+
+
+def get_read_session():
+    """Get a read-only database session from the web UI's connection pool."""
+    start = time.monotonic()
+    with Session(read_engine) as session:
+        # Check out the connection up front so time spent waiting for the pool is counted
+        session.connection()
+        with _read_pool_lock:
+            _read_pool_stats["checkout_wait_seconds"] += time.monotonic() - start
+        yield session
+
+
+def warm_read_pool():
+    """
+    Open the read pool's connections ahead of the first requests.
+
+    Returns:
+        int: Number of connections opened (0 if the database doesn't exist yet)
+    """
+    if not DB_PATH.exists():
+        return 0
+    connections = []
+    try:
+        for _ in range(READ_POOL_SIZE):
+            connections.append(read_engine.connect())
+    except Exception as e:
+        logger.warning(f"Could not warm read connection pool: {e}")
+    finally:
+        for connection in connections:
+            connection.close()
+    _read_pool_stats["warmed"] = len(connections)
+    return len(connections)
+
+
+def get_read_pool_stats():
+    """
+    Get the web UI's read connection pool stats.
+
+    Returns:
+        dict: Pool limits, connections currently idle and in use, overflow
+        connections open, plus totals for connections opened, checkouts and
+        time spent waiting for a connection
+    """
+    pool = read_engine.pool
+    with _read_pool_lock:
+        stats = dict(_read_pool_stats)
+    checkouts = stats["checkouts"]
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": READ_POOL_MAX_OVERFLOW,
+        "idle": pool.checkedin(),
+        "in_use": pool.checkedout(),
+        "overflow": max(0, pool.overflow()),
+        "warmed": stats["warmed"],
+        "connections_opened": stats["connections_opened"],
+        "checkouts": checkouts,
+        "reuse_ratio": round(1 - stats["connections_opened"] / checkouts, 3) if checkouts else None,
+        "avg_checkout_wait_ms": round(stats["checkout_wait_seconds"] / checkouts * 1000, 3) if checkouts else None,
+        "cached_statements": READ_CACHED_STATEMENTS,
+    } 
\ No newline at end of file
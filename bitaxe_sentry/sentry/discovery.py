@@ -0,0 +1,189 @@
+import ipaddress
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+INFO_PATH = "/api/system/info"
+
+# Largest range a single scan may cover (a /20)
+MAX_SCAN_HOSTS = 4096
+
+# An AxeOS system info payload carries all of these...
+REQUIRED_KEYS = {"hashRate", "bestDiff", "temp"}
+# ...and at least one of these board/firmware identifiers
+IDENTIFYING_KEYS = {"ASICModel", "boardVersion", "axeOSVersion"}
+
+def fingerprint(data):
+    """
+    Check whether a /api/system/info response came from an AxeOS miner.
+
+    Args:
+        data: Decoded JSON response
+
+    Returns:
+        dict: Identifying details (hostname, model, firmware, mac), or None if it isn't AxeOS
+    """
+    if not isinstance(data, dict):
+        return None
+    if not REQUIRED_KEYS <= data.keys() or not IDENTIFYING_KEYS & data.keys():
+        return None
+    return {
+        "hostname": data.get("hostname"),
+        "model": data.get("ASICModel"),
+        "board": data.get("boardVersion"),
+        "firmware": data.get("axeOSVersion") or data.get("version"),
+        "mac": data.get("macAddr"),
+    }
+
+def _endpoint_for(host, port):
+    return f"http://{host}" if port in (None, 80) else f"http://{host}:{port}"
+
+def _hosts(cidr):
+    network = ipaddress.ip_network(cidr.strip(), strict=False)
+    if network.num_addresses > MAX_SCAN_HOSTS:
+        raise ValueError(f"{cidr} covers {network.num_addresses} addresses, the limit is {MAX_SCAN_HOSTS}")
+    # hosts() skips the network and broadcast addresses; a /32 has just the one
+    return list(network.hosts()) or [network.network_address]
+
+def _probe(session, endpoint_url, timeout):
+    """Fetch system info from one address. Returns (endpoint, details) or None."""
+    try:
+        response = session.get(f"{endpoint_url}{INFO_PATH}", timeout=timeout, allow_redirects=False)
+        if response.status_code != 200:
+            return None
+        details = fingerprint(response.json())
+    except (requests.exceptions.RequestException, ValueError):
+        return None
+    if details is None:
+        return None
+    return endpoint_url, details
+
+def scan(cidr, port=None, concurrency=None, timeout=None):
+    """
+    Probe every address in a CIDR range for AxeOS miners.
+
+    Addresses are probed in parallel with short timeouts, so a /24 finishes in
+    a few seconds even when most addresses don't answer. A throwaway session is
+    used rather than the shared polling session, which would otherwise keep a
+    pool (and its stats) for every address on the network.
+
+    Args:
+        cidr: Network to scan, e.g. "192.168.1.0/24"
+        port: HTTP port of the miners (defaults to 80)
+        concurrency: Maximum probes in flight (defaults to DISCOVERY_CONCURRENCY)
+        timeout: Connect timeout in seconds (defaults to DISCOVERY_TIMEOUT_SECONDS)
+
+    Returns:
+        dict: {"cidr", "scanned", "duration", "found": [{"endpoint", "hostname", "model", ...}]}
+
+    Raises:
+        ValueError: If the CIDR is invalid or too large
+    """
+    from .config import DISCOVERY_CONCURRENCY, DISCOVERY_TIMEOUT_SECONDS
+
+    hosts = _hosts(cidr)
+    concurrency = max(1, min(concurrency or DISCOVERY_CONCURRENCY, len(hosts)))
+    connect_timeout = timeout or DISCOVERY_TIMEOUT_SECONDS
+    # Miners answer quickly once connected; anything slower than this isn't worth waiting for
+    request_timeout = (connect_timeout, connect_timeout * 2)
+
+    start = time.monotonic()
+    endpoints = [_endpoint_for(host, port) for host in hosts]
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=1, max_retries=0)
+    session.mount("http://", adapter)
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="discovery") as executor:
+            results = list(executor.map(lambda ep: _probe(session, ep, request_timeout), endpoints))
+    finally:
+        session.close()
+
+    found = [dict(details, endpoint=endpoint_url) for endpoint_url, details in filter(None, results)]
+    duration = time.monotonic() - start
+    logger.info(f"Discovery scan of {cidr} probed {len(hosts)} addresses in {duration:.2f}s, found {len(found)} miners")
+
+    return {
+        "cidr": str(ipaddress.ip_network(cidr.strip(), strict=False)),
+        "scanned": len(hosts),
+        "duration": round(duration, 3),
+        "found": found,
+    }
+
+def _same_miner(endpoint_a, endpoint_b):
+    a, b = urlsplit(endpoint_a), urlsplit(endpoint_b)
+    return a.hostname == b.hostname and (a.port or 80) == (b.port or 80)
+
+def propose(found, endpoints=None):
+    """
+    Pick the discovered miners that aren't configured yet.
+
+    Args:
+        found: Miners returned by scan()
+        endpoints: Configured endpoints (defaults to ENDPOINTS)
+
+    Returns:
+        list: Discovered miners whose address isn't already in the settings
+    """
+    if endpoints is None:
+        from .config import ENDPOINTS as endpoints
+    return [
+        miner for miner in found
+        if not any(_same_miner(miner["endpoint"], configured) for configured in endpoints)
+    ]
+
+def suggest_cidr(endpoints=None):
+    """
+    Guess a range to scan from the configured endpoints.
+
+    Returns:
+        str: The /24 around the first configured IP address, or None
+    """
+    if endpoints is None:
+        from .config import ENDPOINTS as endpoints
+    for endpoint_url in endpoints:
+        try:
+            address = ipaddress.ip_address(urlsplit(endpoint_url).hostname or "")
+        except ValueError:
+            continue
+        if address.version == 4:
+            return str(ipaddress.ip_network(f"{address}/24", strict=False))
+    return None
+
+def add_endpoints(new_endpoints):
+    """
+    Add endpoints to the saved settings, skipping ones already configured.
+
+    Args:
+        new_endpoints: Endpoint URLs to add
+
+    Returns:
+        list: The endpoints that were actually added, or None if saving failed
+    """
+    from .settings_manager import load_settings, save_settings
+
+    settings = load_settings()
+    current = list(settings["BITAXE_ENDPOINTS"])
+    added = []
+    for endpoint_url in new_endpoints:
+        endpoint_url = endpoint_url.strip().rstrip("/")
+        if not endpoint_url:
+            continue
+        if not endpoint_url.startswith(("http://", "https://")):
+            endpoint_url = f"http://{endpoint_url}"
+        if any(_same_miner(endpoint_url, existing if "://" in existing else f"http://{existing}") for existing in current + added):
+            continue
+        added.append(endpoint_url)
+
+    if not added:
+        return []
+
+    settings["BITAXE_ENDPOINTS"] = current + added
+    if not save_settings(settings):
+        return None
+    logger.info(f"Added {len(added)} discovered miners to settings: {added}")
+    return added
@@ -0,0 +1,142 @@
+"""
+Downsampling of chart series.
+
+lttb() keeps the points that best preserve the shape of a line
+(Largest-Triangle-Three-Buckets); minmax() keeps each time bucket's lowest
+and highest point, so short spikes and dips always survive. Both work on
+NumPy arrays and return at most the requested number of points however many
+rows went in, so a chart's payload stays the same size whatever the retention.
+"""
+import numpy as np
+
+METHODS = ("lttb", "minmax")
+
+def lttb(x, y, threshold):
+    """
+    Pick the points of a line that keep its visual shape.
+
+    The first and last points are always kept. The rest are split into
+    threshold - 2 buckets of equal row count, and from each bucket the point
+    forming the largest triangle with the previously kept point and the next
+    bucket's average is kept.
+
+    Args:
+        x: Ascending x values
+        y: y values
+        threshold: Number of points to keep
+
+    Returns:
+        ndarray: Indices of the kept points, ascending
+    """
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1][:max(threshold, 0)], dtype=np.int64)
+
+    # Relative to the first point, so the products below stay precise
+    x = np.asarray(x, dtype=np.float64) - x[0]
+    y = np.asarray(y, dtype=np.float64)
+
+    # Bucket i covers rows edges[i]:edges[i + 1]; every bucket has at least one row
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    x_sums = np.concatenate(([0.0], np.cumsum(x)))
+    y_sums = np.concatenate(([0.0], np.cumsum(y)))
+    sizes = edges[1:] - edges[:-1]
+    # Each bucket's average, then the last point standing in for the bucket after the last
+    x_averages = np.append((x_sums[edges[1:]] - x_sums[edges[:-1]]) / sizes, x[-1])
+    y_averages = np.append((y_sums[edges[1:]] - y_sums[edges[:-1]]) / sizes, y[-1])
+
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0] = 0
+    kept[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Twice the triangle area for every candidate in the bucket at once
+        areas = np.abs(
+            (x[a] - x_averages[i + 1]) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (y_averages[i + 1] - y[a])
+        )
+        a = lo + int(np.argmax(areas))
+        kept[i + 1] = a
+    return kept
+
+def minmax(x, y, threshold, y_min=None, y_max=None):
+    """
+    Keep the lowest and highest point of each time bucket.
+
+    The range is split into threshold // 2 buckets of equal duration. With
+    rollup rows, y_min and y_max are the buckets' own min/max columns, so the
+    envelope of the underlying readings is kept rather than that of the averages.
+
+    Args:
+        x: Ascending x values
+        y: y values (used for both envelopes unless y_min and y_max are given)
+        threshold: Maximum number of points to return
+        y_min: Per-row minimums
+        y_max: Per-row maximums
+
+    Returns:
+        tuple: (x, y) arrays of the kept points in x order
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n <= threshold or n == 0:
+        return x, y
+    y_min = y if y_min is None else np.asarray(y_min, dtype=np.float64)
+    y_max = y if y_max is None else np.asarray(y_max, dtype=np.float64)
+
+    buckets = max(threshold // 2, 1)
+    span = x[-1] - x[0]
+    if span > 0:
+        bins = np.minimum(((x - x[0]) * (buckets / span)).astype(np.int64), buckets - 1)
+    else:
+        bins = np.zeros(n, dtype=np.int64)
+
+    # x is sorted, so each bucket's rows are contiguous: reduce each run to its
+    # min (max), then take the first row at or after the run's start holding it
+    starts = np.flatnonzero(np.diff(bins, prepend=-1))
+    sizes = np.diff(np.append(starts, n))
+    low_rows = np.flatnonzero(y_min == np.repeat(np.minimum.reduceat(y_min, starts), sizes))
+    high_rows = np.flatnonzero(y_max == np.repeat(np.maximum.reduceat(y_max, starts), sizes))
+    lowest = low_rows[np.searchsorted(low_rows, starts)]
+    highest = high_rows[np.searchsorted(high_rows, starts)]
+
+    indices = np.concatenate((lowest, highest))
+    values = np.concatenate((y_min[lowest], y_max[highest]))
+    order = np.lexsort((values, indices))
+    indices, values = indices[order], values[order]
+    # A bucket whose min and max are the same point only needs it once
+    keep = np.ones(len(indices), dtype=bool)
+    keep[1:] = (indices[1:] != indices[:-1]) | (values[1:] != values[:-1])
+    return x[indices[keep]], values[keep]
+
+def series(rows, points, method="lttb"):
+    """
+    Downsample one series.
+
+    Args:
+        rows: (x, y) tuples, or (x, average, min, max) tuples from the rollups,
+            in any order
+        points: Maximum number of points to return
+        method: "lttb" or "minmax"
+
+    Returns:
+        tuple: (x list, y list) in x order
+    """
+    if not rows:
+        return [], []
+    data = np.array(rows, dtype=np.float64)
+    data = data[np.argsort(data[:, 0], kind="stable")]
+    x, y = data[:, 0], data[:, 1]
+    if method == "minmax":
+        if data.shape[1] >= 4:
+            x, y = minmax(x, y, points, data[:, 2], data[:, 3])
+        else:
+            x, y = minmax(x, y, points)
+    else:
+        kept = lttb(x, y, points)
+        x, y = x[kept], y[kept]
+    return x.tolist(), y.tolist()
@@ -0,0 +1,135 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Timeout for miners that are polling normally, as (connect, read) seconds
+NORMAL_TIMEOUT = (10, 10)
+
+# endpoint -> {"failures": consecutive failures, "open": bool, "retry_at": monotonic time, "opened_at": monotonic time}
+_endpoints = {}
+_lock = threading.Lock()
+
+def _entry(endpoint_url):
+    return _endpoints.setdefault(endpoint_url, {"failures": 0, "open": False, "retry_at": 0.0, "opened_at": None})
+
+def _backoff_seconds(failures):
+    """Exponential retry interval once the breaker is open: 1x, 2x, 4x ... the poll interval, capped."""
+    from .config import POLL_INTERVAL_SECONDS, BREAKER_FAILURE_THRESHOLD, BREAKER_MAX_BACKOFF_SECONDS
+    probes = max(0, failures - BREAKER_FAILURE_THRESHOLD)
+    return min(POLL_INTERVAL_SECONDS * (2 ** min(probes, 20)), BREAKER_MAX_BACKOFF_SECONDS)
+
+def should_poll(endpoint_url, now=None):
+    """
+    Check whether an endpoint should be polled now.
+
+    Args:
+        endpoint_url: Base URL of the miner
+        now: Current time.monotonic() (defaults to now)
+
+    Returns:
+        bool: False while the breaker is open and the next probe isn't due yet
+    """
+    now = time.monotonic() if now is None else now
+    with _lock:
+        entry = _endpoints.get(endpoint_url)
+        return entry is None or not entry["open"] or entry["retry_at"] <= now
+
+def timeout_for(endpoint_url):
+    """
+    Get the request timeout for an endpoint.
+
+    Miners with an open breaker are probed with a short connect timeout so a
+    dead unit doesn't hold up the cycle.
+
+    Returns:
+        tuple: (connect, read) timeout in seconds
+    """
+    from .config import BREAKER_PROBE_TIMEOUT_SECONDS
+    with _lock:
+        entry = _endpoints.get(endpoint_url)
+        if entry and entry["open"]:
+            return (BREAKER_PROBE_TIMEOUT_SECONDS, NORMAL_TIMEOUT[1])
+    return NORMAL_TIMEOUT
+
+def seconds_until_retry(endpoint_url):
+    """
+    Get how long until an open breaker allows the next probe.
+
+    Returns:
+        float: Seconds until the next probe, or 0 if the endpoint can be polled now
+    """
+    with _lock:
+        entry = _endpoints.get(endpoint_url)
+        if not entry or not entry["open"]:
+            return 0.0
+        return max(0.0, entry["retry_at"] - time.monotonic())
+
+def record_success(endpoint_url):
+    """
+    Record a successful poll, closing the breaker.
+
+    Returns:
+        bool: True if the endpoint had been failing and has now recovered
+    """
+    with _lock:
+        entry = _endpoints.get(endpoint_url)
+        if not entry or entry["failures"] == 0:
+            return False
+        was_open = entry["open"]
+        entry.update(failures=0, open=False, retry_at=0.0, opened_at=None)
+
+    if was_open:
+        logger.info(f"Miner at {endpoint_url} is responding again, resuming normal polling")
+    return True
+
+def record_failure(endpoint_url):
+    """
+    Record a failed poll.
+
+    After BREAKER_FAILURE_THRESHOLD consecutive failures the breaker opens and
+    the endpoint is only probed, with a retry interval that doubles after every
+    failed probe.
+
+    Returns:
+        bool: True if this is the first failure of a new outage (the caller should send the offline alert)
+    """
+    from .config import BREAKER_FAILURE_THRESHOLD
+
+    now = time.monotonic()
+    with _lock:
+        entry = _entry(endpoint_url)
+        entry["failures"] += 1
+        failures = entry["failures"]
+
+        if failures >= BREAKER_FAILURE_THRESHOLD:
+            backoff = _backoff_seconds(failures)
+            if not entry["open"]:
+                entry["open"] = True
+                entry["opened_at"] = now
+                logger.warning(f"Miner at {endpoint_url} failed {failures} times in a row, backing off to probes every {backoff:.0f}s")
+            entry["retry_at"] = now + backoff
+
+    return failures == 1
+
+def get_health():
+    """
+    Get breaker state for every endpoint that is currently failing.
+
+    Published by the sentry service for the web UI's /api/status.
+
+    Returns:
+        dict: endpoint -> {"failures": int, "state": "failing" | "backoff", "retry_in": seconds or None}
+    """
+    now = time.monotonic()
+    with _lock:
+        return {
+            endpoint_url: {
+                "failures": entry["failures"],
+                "state": "backoff" if entry["open"] else "failing",
+                "retry_in": round(max(0.0, entry["retry_at"] - now), 1) if entry["open"] else None,
+            }
+            for endpoint_url, entry in _endpoints.items()
+            if entry["failures"]
+        }
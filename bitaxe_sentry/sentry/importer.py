@@ -0,0 +1,329 @@
+"""
+Bulk import of historical readings from CSV or NDJSON.
+
+    python -m bitaxe_sentry.sentry import readings.csv
+    python -m bitaxe_sentry.sentry import backup.ndjson.gz --format ndjson
+
+Each row needs a timestamp (ISO 8601, UTC unless it has an offset, or epoch
+seconds), the miner as either miner_id or endpoint (new endpoints are
+registered), hash_rate and temperature. best_diff, best_diff_value, voltage
+(volts) and error_percentage are optional. Files ending in .gz are
+decompressed on the fly and "-" reads standard input.
+
+Rows are streamed in batches and inserted with executemany, committing every
+TRANSACTION_ROWS rows, so memory use stays flat however large the file is.
+Each batch also updates miner_latest and the chart rollups in the same
+transaction. Once a large import is under way the reading indexes are
+dropped and rebuilt once at the end, which is much faster than maintaining
+them row by row. Readings older than what the Parquet archive already covers
+are recorded for the next archive run (see archive.record_backfill()).
+"""
+import argparse
+import csv
+import datetime
+import functools
+import gzip
+import io
+import json
+import logging
+import sys
+import time
+from types import SimpleNamespace
+from sqlmodel import Session, select
+from .db import engine, init_db, Miner
+from .poller import parse_difficulty, difficulty_column_value
+from . import archive, latest, registry, rollups, storage
+
+logger = logging.getLogger(__name__)
+
+# Rows per executemany, and rows per commit
+BATCH_SIZE = 10000
+TRANSACTION_ROWS = 200000
+
+# Log progress this often
+PROGRESS_ROWS = 500000
+
+# Indexes are only dropped once an import gets this big; rebuilding them
+# costs more than it saves for a small file going into a large database
+DEFER_INDEXES_AFTER_ROWS = 100000
+
+# Rows that can't be parsed are skipped; only the first few are logged
+MAX_LOGGED_ERRORS = 20
+
+FORMATS = ("csv", "ndjson")
+
+# The same few best difficulty strings repeat across millions of rows
+_parse_difficulty = functools.lru_cache(maxsize=4096)(parse_difficulty)
+
+def detect_format(path):
+    """
+    Guess the file format from its name.
+
+    Returns:
+        str: "csv" or "ndjson", or None if the name doesn't say
+    """
+    name = path.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl", ".json")):
+        return "ndjson"
+    return None
+
+def _open(path):
+    if path == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+    if path.lower().endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+def read_records(f, file_format):
+    """
+    Stream raw records from an open file.
+
+    A line that can't be decoded is passed on with its error instead of
+    stopping the stream, so the caller can skip it like any other bad record.
+
+    Yields:
+        tuple: (line number, dict of field values, None), or
+        (line number, None, error) for an NDJSON line that isn't valid JSON
+    """
+    if file_format == "csv":
+        reader = csv.DictReader(f)
+        for record in reader:
+            yield reader.line_num, record, None
+    else:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_number, json.loads(line), None
+            except json.JSONDecodeError as e:
+                yield line_number, None, e
+
+def parse_timestamp(value):
+    """
+    Parse an imported timestamp to a naive UTC datetime.
+
+    Args:
+        value: ISO 8601 string (UTC unless it carries an offset) or epoch seconds
+
+    Returns:
+        datetime: Naive UTC datetime
+    """
+    if isinstance(value, (int, float)) or (isinstance(value, str) and value.replace(".", "", 1).isdigit()):
+        return datetime.datetime.utcfromtimestamp(float(value))
+    text = str(value).strip()
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    timestamp = datetime.datetime.fromisoformat(text)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def _float(record, field, default=None):
+    value = record.get(field)
+    if value is None or value == "":
+        if default is None:
+            raise ValueError(f"missing {field}")
+        return default
+    return float(value)
+
+class _Miners:
+    """Resolves a record's miner_id or endpoint to a miner id."""
+
+    def __init__(self, session):
+        self.session = session
+        self.ids = set(session.exec(select(Miner.id)).all())
+
+    def resolve(self, record):
+        miner_id = record.get("miner_id")
+        if miner_id not in (None, ""):
+            miner_id = int(miner_id)
+            if miner_id not in self.ids:
+                raise ValueError(f"unknown miner_id {miner_id}")
+            return miner_id
+        endpoint = (record.get("endpoint") or "").strip()
+        if not endpoint:
+            raise ValueError("missing miner_id or endpoint")
+        miner = registry.get_or_create(self.session, endpoint)
+        self.ids.add(miner.id)
+        return miner.id
+
+def to_row(record, miners):
+    """
+    Convert an imported record to a reading row.
+
+    Raises:
+        ValueError: If a required field is missing or malformed
+    """
+    timestamp = record.get("timestamp")
+    if timestamp in (None, ""):
+        raise ValueError("missing timestamp")
+
+    best_diff_value = record.get("best_diff_value")
+    raw_best_diff = record.get("best_diff")
+    if best_diff_value in (None, ""):
+        best_diff_value = _parse_difficulty(str(raw_best_diff)) if raw_best_diff not in (None, "") else None
+    else:
+        best_diff_value = int(best_diff_value)
+    if raw_best_diff in (None, ""):
+        best_diff = str(best_diff_value) if best_diff_value is not None else "0"
+    else:
+        best_diff = str(best_diff_value) if best_diff_value is not None else str(raw_best_diff).strip()
+
+    return {
+        "miner_id": miners.resolve(record),
+        "timestamp": parse_timestamp(timestamp),
+        "hash_rate": _float(record, "hash_rate"),
+        "temperature": _float(record, "temperature"),
+        "best_diff": best_diff,
+        "best_diff_value": difficulty_column_value(best_diff_value),
+        "voltage": _float(record, "voltage", 0.0),
+        "error_percentage": _float(record, "error_percentage", 0.0),
+    }
+
+class _DeferredIndexes:
+    """Drops the indexes of each reading table written to, and rebuilds them at the end."""
+
+    def __init__(self):
+        self.dropped = {}  # index name -> Index
+
+    def drop(self, session, rows):
+        for timestamp in {row["timestamp"].date(): row["timestamp"] for row in rows}.values():
+            table = storage.write_table(session, timestamp)
+            for index in table.indexes:
+                if index.name not in self.dropped:
+                    index.drop(session.connection(), checkfirst=True)
+                    self.dropped[index.name] = index
+
+    def rebuild(self):
+        if not self.dropped:
+            return 0.0
+        start = time.monotonic()
+        with engine.begin() as connection:
+            for index in self.dropped.values():
+                index.create(connection, checkfirst=True)
+        logger.info(f"Rebuilt {len(self.dropped)} reading indexes in {time.monotonic() - start:.1f}s")
+        return time.monotonic() - start
+
+def _store(session, rows, indexes):
+    if indexes is not None:
+        # Drops the indexes of each table as the import first writes to it
+        indexes.drop(session, rows)
+    # Only rows actually stored (the compact layout drops same-second duplicates) count towards latest and the rollups
+    readings = [SimpleNamespace(**row) for row in storage.insert_rows(session, rows)]
+    latest.record(session, readings)
+    rollups.record(session, readings)
+    return len(readings)
+
+def _oldest(rows, oldest):
+    batch_oldest = min(row["timestamp"] for row in rows)
+    return batch_oldest if oldest is None or batch_oldest < oldest else oldest
+
+def import_readings(f, file_format, batch_size=BATCH_SIZE, transaction_rows=TRANSACTION_ROWS, defer_indexes=True):
+    """
+    Import readings from an open file.
+
+    Args:
+        f: Text file to read
+        file_format: "csv" or "ndjson"
+        batch_size: Rows per executemany
+        transaction_rows: Rows per commit
+        defer_indexes: Once DEFER_INDEXES_AFTER_ROWS rows are in, drop the
+            reading indexes for the rest of the import and rebuild them at the end
+
+    Returns:
+        dict: Rows imported, skipped and dropped as duplicates (the compact
+        layout keeps one reading per miner and second), seconds taken
+        (including the index rebuild) and rows per second
+    """
+    start = time.monotonic()
+    imported = 0
+    skipped = 0
+    duplicates = 0
+    uncommitted = 0
+    batch = []
+    indexes = _DeferredIndexes() if defer_indexes else None
+    oldest = None
+
+    # Held for the whole import, so the nightly cleanup can't delete readings
+    # older than the archive mark before they are recorded for archiving
+    with archive.locked():
+        try:
+            with Session(engine) as session:
+                miners = _Miners(session)
+                for position, record, error in read_records(f, file_format):
+                    try:
+                        if error is not None:
+                            raise error
+                        batch.append(to_row(record, miners))
+                    except (ValueError, TypeError, AttributeError) as e:
+                        skipped += 1
+                        if skipped <= MAX_LOGGED_ERRORS:
+                            logger.warning(f"Skipping line {position}: {e}")
+                        continue
+
+                    if len(batch) >= batch_size:
+                        oldest = _oldest(batch, oldest)
+                        stored = _store(session, batch, indexes if imported >= DEFER_INDEXES_AFTER_ROWS else None)
+                        imported += stored
+                        duplicates += len(batch) - stored
+                        uncommitted += len(batch)
+                        batch = []
+                        if uncommitted >= transaction_rows:
+                            session.commit()
+                            uncommitted = 0
+                        if imported % PROGRESS_ROWS < batch_size:
+                            elapsed = time.monotonic() - start
+                            logger.info(f"Imported {imported} readings, {imported / elapsed:.0f} rows/s")
+
+                if batch:
+                    oldest = _oldest(batch, oldest)
+                    stored = _store(session, batch, indexes if imported >= DEFER_INDEXES_AFTER_ROWS else None)
+                    imported += stored
+                    duplicates += len(batch) - stored
+                session.commit()
+        finally:
+            # Put the indexes back even if the import failed part way
+            if indexes is not None:
+                indexes.rebuild()
+            if oldest is not None:
+                archive.record_backfill(oldest)
+
+    elapsed = time.monotonic() - start
+    return {
+        "imported": imported,
+        "skipped": skipped,
+        "duplicates": duplicates,
+        "seconds": round(elapsed, 1),
+        "rows_per_second": round(imported / elapsed) if elapsed > 0 else None,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m bitaxe_sentry.sentry import",
+        description="Bulk import historical readings from CSV or NDJSON",
+    )
+    parser.add_argument("path", help="File to import (.csv or .ndjson, optionally .gz), or - for standard input")
+    parser.add_argument("--format", choices=FORMATS, help="File format (default: from the file name)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows per insert")
+    parser.add_argument("--transaction-rows", type=int, default=TRANSACTION_ROWS, help="Rows per commit")
+    parser.add_argument("--keep-indexes", action="store_true",
+                        help="Keep the reading indexes during the import (slower, but queries stay fast meanwhile)")
+    args = parser.parse_args(argv)
+
+    file_format = args.format or detect_format(args.path)
+    if file_format is None:
+        parser.error("can't tell the format from the file name, pass --format")
+
+    init_db()
+    with _open(args.path) as f:
+        result = import_readings(f, file_format, args.batch_size, args.transaction_rows, not args.keep_indexes)
+
+    print(
+        f"Imported {result['imported']} readings ({result['skipped']} skipped, {result['duplicates']} duplicates) "
+        f"in {result['seconds']}s, {result['rows_per_second']} rows/s"
+    )
@@ -0,0 +1,74 @@
+import logging
+import time
+from sqlalchemy.exc import SQLAlchemyError
+from .db import Reading
+from . import latest, rollups, state, storage
+
+logger = logging.getLogger(__name__)
+
+def _reading_row(reading):
+    """Convert a Reading into a column dict for a bulk insert (id is assigned by the DB)."""
+    return {
+        column.name: getattr(reading, column.name)
+        for column in Reading.__table__.columns
+        if column.name != "id"
+    }
+
+def ingest_readings(session, readings):
+    """
+    Write a poll cycle's readings in a single transaction.
+
+    All readings go in as one bulk insert (one per day table in the "daily"
+    storage layout) and one commit, so a cycle costs a single fsync no matter
+    how many miners were polled. If the bulk insert fails, each reading is
+    retried inside its own savepoint so one bad row can't drop the rest of the
+    cycle. Readings the compact layout drops as duplicates (same miner and
+    second as a stored one) aren't returned. Each miner's miner_latest row and the stored readings' rollup
+    buckets are updated in the same transaction; if either fails, the error
+    propagates and the caller's session rolls the whole cycle back. The
+    per-miner state cache is updated once the commit succeeds.
+
+    Args:
+        session: Open database session (may hold other pending changes, e.g.
+            newly registered miners, which are committed together with the readings)
+        readings: List of Reading instances to store
+
+    Returns:
+        list: The readings that were stored
+    """
+    start = time.monotonic()
+    stored = []
+
+    if readings:
+        try:
+            rows = [_reading_row(r) for r in readings]
+            with session.begin_nested():
+                inserted = {id(row) for row in storage.insert_rows(session, rows)}
+            stored = [reading for reading, row in zip(readings, rows) if id(row) in inserted]
+        except SQLAlchemyError as e:
+            logger.warning(f"Bulk insert of {len(readings)} readings failed, retrying per miner: {e}")
+            for reading in readings:
+                try:
+                    with session.begin_nested():
+                        if storage.insert_rows(session, [_reading_row(reading)]):
+                            stored.append(reading)
+                except SQLAlchemyError as e:
+                    logger.error(f"Failed to store reading for miner {reading.miner_id}: {e}")
+
+    if stored:
+        # Not in a savepoint: a failure here propagates, and the caller's
+        # transaction (readings included) is rolled back, so miner_latest
+        # never disagrees with the readings table
+        latest.record(session, stored)
+
+        # Likewise for the chart rollups: nothing rebuilds a bucket from the
+        # readings later, so they must commit (or roll back) together
+        rollups.record(session, stored)
+
+    # Read inside the write transaction so no other writer can slip in before the commit
+    high_water_mark = storage.high_water_mark(session)
+    session.commit()
+    state.record(stored, high_water_mark)
+
+    logger.info(f"Stored {len(stored)}/{len(readings)} readings in {time.monotonic() - start:.3f}s")
+    return stored
@@ -0,0 +1,84 @@
+import logging
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import select, delete
+from .db import Miner, MinerLatest
+from . import storage
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("timestamp", "hash_rate", "temperature", "best_diff", "best_diff_value", "voltage", "error_percentage")
+
+def _upsert_statement():
+    """INSERT ... ON CONFLICT that replaces a miner's row only with a newer reading."""
+    table = MinerLatest.__table__
+    statement = insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=["miner_id"],
+        set_={column: statement.excluded[column] for column in COLUMNS},
+        where=statement.excluded.timestamp >= table.c.timestamp,
+    )
+
+_upsert = _upsert_statement()
+
+def record(session, readings):
+    """
+    Upsert the newest of the given readings for each miner.
+
+    Runs in the caller's transaction so miner_latest commits together with the readings.
+
+    Args:
+        session: Open database session
+        readings: Readings that were just inserted
+    """
+    newest = {}
+    for reading in readings:
+        current = newest.get(reading.miner_id)
+        if current is None or reading.timestamp >= current.timestamp:
+            newest[reading.miner_id] = reading
+    if newest:
+        rows = [
+            {"miner_id": miner_id, **{column: getattr(reading, column) for column in COLUMNS}}
+            for miner_id, reading in newest.items()
+        ]
+        session.exec(_upsert, params=rows)
+
+def fetch_all(session):
+    """
+    Get every miner's current state in one query.
+
+    Args:
+        session: Open database session
+
+    Returns:
+        list: (Miner, MinerLatest) pairs for miners that have reported at least once
+    """
+    return session.exec(select(Miner, MinerLatest).join(MinerLatest, MinerLatest.miner_id == Miner.id)).all()
+
+def get(session, miner_id):
+    """
+    Get a miner's newest reading.
+
+    Returns:
+        MinerLatest: The newest reading, or None if the miner has none
+    """
+    return session.get(MinerLatest, miner_id)
+
+def rebuild(session, miner_id=None):
+    """
+    Recompute miner_latest from the stored readings (the caller commits).
+
+    Args:
+        session: Open database session
+        miner_id: Only this miner (all miners if None)
+
+    Returns:
+        int: Number of miners with a latest reading
+    """
+    clear = delete(MinerLatest)
+    if miner_id is not None:
+        clear = clear.where(MinerLatest.miner_id == miner_id)
+
+    readings = storage.newest_readings(session, miner_id)
+    session.exec(clear)
+    record(session, readings)
+    return len(readings)
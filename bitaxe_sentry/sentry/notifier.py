@@ -1,9 +1,9 @@
-import requests
 import logging
 import json
 import pathlib
 import os
 from .config import DISCORD_WEBHOOK, reload_config
+from . import transport
 import socket
 import datetime
 
@@ -179,7 +179,7 @@ def send_startup_notification(service="main"):
     )
     
     try:
-        response = requests.post(
+        response = transport.post(
             DISCORD_WEBHOOK, 
             json={"content": content},
             timeout=10
@@ -232,7 +232,7 @@ def send_alert(miner, reading, alert_type="temperature"):
     )
     
     try:
-        response = requests.post(
+        response = transport.post(
             DISCORD_WEBHOOK, 
             json={"content": content},
             timeout=10
@@ -299,7 +299,7 @@ def send_diff_alert(miner, reading):
     )
     
     try:
-        response = requests.post(
+        response = transport.post(
             DISCORD_WEBHOOK, 
             json={"content": content},
             timeout=10
@@ -337,7 +337,7 @@ def send_test_notification(webhook_url):
     )
     
     try:
-        response = requests.post(
+        response = transport.post(
             webhook_url, 
             json={"content": content},
             timeout=10
@@ -377,16 +377,12 @@ def send_miner_offline_alert(miner):
     # Get the last reading time if available
     last_reading_time = "Unknown"
     try:
-        from sqlmodel import select
-        from .db import get_session, Reading
+        from sqlmodel import Session
+        from .db import engine
+        from . import latest
         
-        with get_session() as session:
-            last_reading = session.exec(
-                select(Reading)
-                .where(Reading.miner_id == miner.id)
-                .order_by(Reading.timestamp.desc())
-                .limit(1)
-            ).first()
+        with Session(engine) as session:
+            last_reading = latest.get(session, miner.id)
             
             if last_reading:
                 last_reading_time = last_reading.timestamp.strftime('%Y-%m-%d %H:%M:%S')
@@ -399,7 +395,7 @@ def send_miner_offline_alert(miner):
     )
     
     try:
-        response = requests.post(
+        response = transport.post(
             DISCORD_WEBHOOK, 
             json={"content": content},
             timeout=10
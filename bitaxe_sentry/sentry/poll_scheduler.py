@@ -0,0 +1,207 @@
+import logging
+import random
+import threading
+import time
+from .config import reload_config
+from .poller import poll_endpoints
+from . import health, stream
+
+logger = logging.getLogger(__name__)
+
+# A miner counts as stable after this many consecutive healthy polls in which
+# its temperature stayed this far inside the thresholds and moved less than
+# STABLE_TEMP_DELTA since the previous reading
+STABLE_POLLS_REQUIRED = 3
+STABLE_TEMP_MARGIN = 5.0
+STABLE_TEMP_DELTA = 1.0
+
+# How often a streaming miner is checked to see if it needs polling again
+STREAM_CHECK_SECONDS = 30
+
+# Longest the loop sleeps without re-checking the config for changes
+MAX_SLEEP_SECONDS = 60
+
+# endpoint -> {"next_due": monotonic time, "interval": seconds, "stable_polls": int, "last_temp": float or None}
+_schedule = {}
+_lock = threading.Lock()
+_wake = threading.Event()
+_stop = threading.Event()
+_thread = None
+
+# Base interval the current schedule was built with
+_base_interval = None
+
+def _jittered(interval):
+    from .config import POLL_JITTER
+    return interval * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+
+def _sync_endpoints(now):
+    """Add newly configured endpoints, spread evenly across one interval, and drop removed ones."""
+    from .config import ENDPOINTS, POLL_INTERVAL_SECONDS
+
+    with _lock:
+        for endpoint_url in list(_schedule):
+            if endpoint_url not in ENDPOINTS:
+                del _schedule[endpoint_url]
+
+        new_endpoints = [ep for ep in ENDPOINTS if ep not in _schedule]
+        for index, endpoint_url in enumerate(new_endpoints):
+            offset = POLL_INTERVAL_SECONDS * (index + 1) / len(new_endpoints)
+            _schedule[endpoint_url] = {
+                "next_due": now + offset,
+                "interval": POLL_INTERVAL_SECONDS,
+                "stable_polls": 0,
+                "last_temp": None,
+            }
+        if new_endpoints:
+            logger.info(f"Scheduled {len(new_endpoints)} new miners across {POLL_INTERVAL_SECONDS}s")
+
+def next_interval(entry, outcome):
+    """
+    Work out how long to wait before polling a miner again.
+
+    Alerting miners are polled every ALERT_POLL_INTERVAL_SECONDS. Miners that
+    have been healthy and steady for a while are polled STABLE_INTERVAL_MULTIPLIER
+    times less often than the base interval. Everything else uses the base interval.
+
+    Args:
+        entry: The miner's schedule entry (updated in place with stability tracking)
+        outcome: The miner's result from poll_endpoints
+
+    Returns:
+        float: Interval in seconds, before jitter
+    """
+    from .config import POLL_INTERVAL_SECONDS, ALERT_POLL_INTERVAL_SECONDS, STABLE_INTERVAL_MULTIPLIER, TEMP_MIN, TEMP_MAX
+
+    # Results reused from another process's cycle carry no reading; keep the current pace
+    if outcome.get("coalesced") and outcome["reading"] is None:
+        return entry["interval"]
+
+    if outcome["status"] == "alert":
+        entry["stable_polls"] = 0
+        entry["last_temp"] = outcome["reading"].temperature
+        return min(ALERT_POLL_INTERVAL_SECONDS, POLL_INTERVAL_SECONDS)
+
+    if outcome["status"] != "ok":
+        entry["stable_polls"] = 0
+        entry["last_temp"] = None
+        return POLL_INTERVAL_SECONDS
+
+    temperature = outcome["reading"].temperature
+    steady = (
+        TEMP_MIN + STABLE_TEMP_MARGIN <= temperature <= TEMP_MAX - STABLE_TEMP_MARGIN
+        and entry["last_temp"] is not None
+        and abs(temperature - entry["last_temp"]) < STABLE_TEMP_DELTA
+    )
+    entry["stable_polls"] = entry["stable_polls"] + 1 if steady else 0
+    entry["last_temp"] = temperature
+
+    if entry["stable_polls"] >= STABLE_POLLS_REQUIRED:
+        return POLL_INTERVAL_SECONDS * STABLE_INTERVAL_MULTIPLIER
+    return POLL_INTERVAL_SECONDS
+
+def _apply_interval_change(now):
+    """If the base interval changed, restart stability tracking and pull in miners that are now due sooner."""
+    global _base_interval
+    from .config import POLL_INTERVAL_SECONDS
+
+    with _lock:
+        if _base_interval is not None and POLL_INTERVAL_SECONDS != _base_interval:
+            logger.info(f"Poll interval changed from {_base_interval}s to {POLL_INTERVAL_SECONDS}s, rescheduling miners")
+            for entry in _schedule.values():
+                entry["interval"] = POLL_INTERVAL_SECONDS
+                entry["next_due"] = min(entry["next_due"], now + _jittered(POLL_INTERVAL_SECONDS))
+                entry["stable_polls"] = 0
+        _base_interval = POLL_INTERVAL_SECONDS
+
+def run_due():
+    """
+    Poll every miner whose next poll time has passed and reschedule it.
+
+    Returns:
+        float: Seconds until the next miner is due
+    """
+    now = time.monotonic()
+    _apply_interval_change(now)
+    _sync_endpoints(now)
+
+    with _lock:
+        due = [ep for ep, entry in _schedule.items() if entry["next_due"] <= now]
+        # Miners delivering readings over a stream don't need polling; polling resumes if the stream drops
+        streaming = [ep for ep in due if stream.is_streaming(ep)]
+        for endpoint_url in streaming:
+            _schedule[endpoint_url]["next_due"] = now + STREAM_CHECK_SECONDS
+        due = [ep for ep in due if ep not in streaming]
+
+    if due:
+        logger.info(f"Polling {len(due)} due miners")
+        outcomes = poll_endpoints(due)
+        finished = time.monotonic()
+
+        with _lock:
+            for endpoint_url, outcome in outcomes.items():
+                entry = _schedule.get(endpoint_url)
+                if entry is None:
+                    continue
+                entry["interval"] = next_interval(entry, outcome)
+                entry["next_due"] = finished + _jittered(entry["interval"])
+                # Miners in backoff wait for their next probe rather than the normal interval
+                if outcome["status"] in ("offline", "backoff"):
+                    entry["next_due"] = max(entry["next_due"], finished + health.seconds_until_retry(endpoint_url))
+
+    with _lock:
+        if not _schedule:
+            return MAX_SLEEP_SECONDS
+        return max(0.0, min(entry["next_due"] for entry in _schedule.values()) - time.monotonic())
+
+def wake():
+    """Wake the polling loop early, e.g. after the configuration changed."""
+    _wake.set()
+
+def get_schedule():
+    """
+    Get the current per-miner schedule for status display.
+
+    Published by the sentry service for the web UI's /api/status.
+
+    Returns:
+        dict: endpoint -> {"interval": seconds, "due_in": seconds, "stable": bool}
+    """
+    now = time.monotonic()
+    with _lock:
+        return {
+            endpoint_url: {
+                "interval": round(entry["interval"], 1),
+                "due_in": round(max(0.0, entry["next_due"] - now), 1),
+                "stable": entry["stable_polls"] >= STABLE_POLLS_REQUIRED,
+            }
+            for endpoint_url, entry in _schedule.items()
+        }
+
+def _run():
+    while not _stop.is_set():
+        try:
+            reload_config()
+            wait = run_due()
+        except Exception as e:
+            logger.exception(f"Error in poll scheduler: {e}")
+            wait = 1.0
+        _wake.wait(timeout=min(wait, MAX_SLEEP_SECONDS))
+        _wake.clear()
+
+def start():
+    """Start the per-miner polling loop in a background thread."""
+    global _thread
+    if _thread and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="poll-scheduler", daemon=True)
+    _thread.start()
+    logger.info("Per-miner poll scheduler started")
+
+def stop():
+    """Stop the polling loop."""
+    _stop.set()
+    _wake.set()
+    if _thread:
+        _thread.join(timeout=30)
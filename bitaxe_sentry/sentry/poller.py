@@ -1,17 +1,34 @@
 import requests
+import asyncio
 import datetime
 import logging
 import re
-from sqlmodel import Session, select
-from .config import ENDPOINTS, TEMP_MAX, TEMP_MIN, VOLT_MIN, reload_config
-from .db import engine, Miner, Reading
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlmodel import Session
+from .config import reload_config
+from .db import engine, Reading, MAX_SQLITE_INT
+from .ingest import ingest_readings
+from . import coordinator, health, registry, state, transport
 from .notifier import send_temperature_alert, send_voltage_alert, send_diff_alert, send_miner_offline_alert
 
 logger = logging.getLogger(__name__)
 
-def normalize_difficulty(diff_value):
+# Multipliers for old firmware difficulty units (e.g. "4.93G")
+DIFFICULTY_MULTIPLIERS = {
+    'K': 1_000,
+    'M': 1_000_000,
+    'G': 1_000_000_000,
+    'T': 1_000_000_000_000,
+    'P': 1_000_000_000_000_000,
+    'E': 1_000_000_000_000_000_000,
+    '': 1
+}
+
+def parse_difficulty(diff_value):
     """
-    Normalize difficulty value to a consistent format (raw number as string).
+    Parse a difficulty value into an integer.
     
     Handles both old firmware format (e.g., "4.93G") and new firmware format (e.g., "1051806384").
     
@@ -19,156 +36,396 @@ def normalize_difficulty(diff_value):
         diff_value: Difficulty value from API (can be string like "4.93G" or "1051806384")
     
     Returns:
-        str: Normalized difficulty as raw number string
+        int: Difficulty as an integer, or None if it can't be parsed
     """
     if diff_value is None:
-        return "0"
+        return 0
     
     # Convert to string if not already
     diff_str = str(diff_value).strip()
     
-    # If it's already a pure number (new firmware format), return as-is
+    # Plain integers (new firmware format) are parsed exactly
     try:
-        # Try to parse as float first to handle numeric strings
-        num = float(diff_str)
-        # If it's a valid number without units, return it as integer string
-        return str(int(num))
-    except (ValueError, TypeError):
+        return int(diff_str)
+    except ValueError:
+        pass
+    
+    # Other numeric strings, e.g. "1051806384.0"
+    try:
+        return int(float(diff_str))
+    except (ValueError, OverflowError):
         pass
     
     # Handle old firmware format with units (e.g., "4.93G", "1.5M", "500K")
-    # Match pattern like "4.93G" or "1.5M" or "500K"
     match = re.match(r'^([\d.]+)\s*([KMGTPEkmgtpe]?)$', diff_str, re.IGNORECASE)
     if match:
-        number_part = float(match.group(1))
+        try:
+            number_part = float(match.group(1))
+        except ValueError:
+            return None
         unit_part = match.group(2).upper() if match.group(2) else ''
+        return int(number_part * DIFFICULTY_MULTIPLIERS.get(unit_part, 1))
+    
+    return None
+
+def normalize_difficulty(diff_value):
+    """
+    Normalize difficulty value to a consistent format (raw number as string).
+    
+    Args:
+        diff_value: Difficulty value from API (can be string like "4.93G" or "1051806384")
+    
+    Returns:
+        str: Normalized difficulty as raw number string
+    """
+    value = parse_difficulty(diff_value)
+    if value is None:
+        # If we can't parse it, log a warning and return as-is
+        logger.warning(f"Could not normalize difficulty value: {diff_value}, storing as-is")
+        return str(diff_value).strip()
+    return str(value)
+
+def difficulty_column_value(value):
+    """
+    Clamp a parsed difficulty so it fits in a SQLite integer column.
+    
+    Args:
+        value: Parsed difficulty (int or None)
+    
+    Returns:
+        int: Value capped at MAX_SQLITE_INT, or None
+    """
+    if value is None:
+        return None
+    return min(value, MAX_SQLITE_INT)
+
+def fetch_system_info(endpoint_url, timeout=10):
+    """
+    Fetch the system info payload from a single miner.
+    
+    Args:
+        endpoint_url: Base URL of the miner (e.g. "http://192.168.1.50")
+        timeout: Request timeout in seconds, or a (connect, read) tuple
+    
+    Returns:
+        dict: Parsed JSON from /api/system/info
+    """
+    resp = transport.get(f"{endpoint_url}/api/system/info", timeout=timeout)
+    resp.raise_for_status()
+    return resp.json()
+
+async def fetch_all(endpoints, concurrency, deadline=None):
+    """
+    Fetch /api/system/info from every endpoint in parallel.
+    
+    At most `concurrency` requests are in flight at once. Errors are returned
+    in place of the payload so one bad miner never fails the whole batch.
+    
+    Args:
+        endpoints: List of miner base URLs
+        concurrency: Maximum number of simultaneous requests
+        deadline: Seconds after which any miner still outstanding is given up on
+    
+    Returns:
+        list: One entry per endpoint, in order - the JSON dict, the exception
+        raised, or asyncio.TimeoutError if the deadline passed first
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="poller")
+    
+    async def fetch(endpoint_url):
+        async with semaphore:
+            logger.info(f"Polling miner at {endpoint_url}")
+            try:
+                return await loop.run_in_executor(executor, fetch_system_info, endpoint_url, health.timeout_for(endpoint_url))
+            except Exception as e:
+                return e
+    
+    tasks = [asyncio.ensure_future(fetch(endpoint_url)) for endpoint_url in endpoints]
+    try:
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+        return [
+            task.result() if task in done else asyncio.TimeoutError(f"Cycle deadline of {deadline}s reached")
+            for task in tasks
+        ]
+    finally:
+        # Requests still running past the deadline end on their own timeout; don't wait for them
+        executor.shutdown(wait=False)
+
+def _run_async(coro):
+    """
+    Run a coroutine to completion from synchronous code.
+    
+    poll_once is called from scheduler threads and FastAPI worker threads.
+    asyncio.run() can't be used while a loop is already running in this
+    thread, so if it is ever called from one the coroutine gets its own loop
+    on a helper thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    
+    outcome = {}
+    
+    def runner():
+        try:
+            outcome["result"] = asyncio.run(coro)
+        except BaseException as e:
+            outcome["error"] = e
+    
+    thread = threading.Thread(target=runner, name="poller-loop")
+    thread.start()
+    thread.join()
+    
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+def build_reading(miner, data):
+    """
+    Build a Reading from a miner's API payload.
+    
+    Args:
+        miner: The miner instance
+        data: Parsed /api/system/info payload
+    
+    Returns:
+        Reading: Unsaved reading
+    """
+    from .config import VOLT_MIN
+    
+    # Log raw voltage data for debugging
+    raw_voltage = data.get("voltage", 0.0)
+    converted_voltage = raw_voltage / 1000.0 if raw_voltage else 0.0
+    logger.info(f"Raw voltage: {raw_voltage}, Converted: {converted_voltage}V, Min threshold: {VOLT_MIN}V")
+    
+    # Parse difficulty once; the string keeps the exact value for display
+    raw_best_diff = data.get("bestDiff", "0")
+    best_diff_value = parse_difficulty(raw_best_diff)
+    normalized_best_diff = str(best_diff_value) if best_diff_value is not None else normalize_difficulty(raw_best_diff)
+    logger.info(f"Raw best diff: {raw_best_diff}, Normalized: {normalized_best_diff}")
+    
+    return Reading(
+        miner_id=miner.id,
+        hash_rate=data["hashRate"],
+        temperature=data["temp"],
+        best_diff=normalized_best_diff,
+        best_diff_value=difficulty_column_value(best_diff_value),
+        voltage=converted_voltage,  # Convert from millivolts to volts
+        error_percentage=data.get("errorPercentage", 0.0)  # Error percentage
+    )
+
+def check_alerts(miner, r, prev_state, send_threshold_alerts=True):
+    """
+    Send any alerts triggered by a newly stored reading.
+    
+    Args:
+        miner: The miner instance
+        r: The stored reading
+        prev_state: Cached state of the miner's previous reading (see state.get_last), or None if this is its first
+        send_threshold_alerts: False to only check the temperature and voltage thresholds
+            without sending their alerts (best diff alerts are always sent)
+    
+    Returns:
+        bool: True if the reading is outside the temperature or voltage thresholds
+    """
+    from .config import TEMP_MAX, TEMP_MIN, VOLT_MIN
+    
+    alerting = False
+    
+    # Temperature alerts
+    if r.temperature > TEMP_MAX or r.temperature < TEMP_MIN:
+        alerting = True
+        logger.warning(f"Temperature out of range for {miner.name}: {r.temperature}°C (range: {TEMP_MIN}-{TEMP_MAX}°C)")
+        if send_threshold_alerts:
+            send_temperature_alert(miner, r)
+    
+    # Voltage alerts
+    if r.voltage < VOLT_MIN:
+        alerting = True
+        logger.warning(f"Voltage below minimum for {miner.name}: {r.voltage}V (min: {VOLT_MIN}V)")
+        if send_threshold_alerts:
+            try:
+                send_voltage_alert(miner, r)
+                logger.info(f"Voltage alert sent for {miner.name}")
+            except Exception as e:
+                logger.exception(f"Failed to send voltage alert for {miner.name}: {e}")
+    else:
+        logger.info(f"Voltage OK for {miner.name}: {r.voltage}V (min: {VOLT_MIN}V)")
+    
+    # New best diff check
+    # Compare parsed integers, which handles mixed old/new format data;
+    # fall back to the normalized strings if either value couldn't be parsed
+    if prev_state is not None:
+        prev_value = prev_state["best_diff"]
+        new_value = r.best_diff_value
+        if prev_value is None or new_value is None:
+            prev_value = normalize_difficulty(prev_state["reading"].best_diff)
+            new_value = normalize_difficulty(r.best_diff)
+        if prev_value != new_value:
+            logger.info(f"New best diff for {miner.name}: {new_value} (was {prev_value})")
+            send_diff_alert(miner, r)
+    
+    return alerting
+
+def _poll_endpoints(endpoints):
+    """
+    Poll a set of miner endpoints once, store the results and send alerts.
+    
+    All miners are fetched concurrently (bounded by POLL_CONCURRENCY), so a
+    cycle takes about as long as the slowest miner. The cycle's readings are
+    then written in a single transaction, and alerts go out after the commit.
+    
+    Args:
+        endpoints: List of miner base URLs
+    
+    Miners whose circuit breaker is open are skipped until their next probe
+    is due (status "backoff"), and the offline alert is only sent on the first
+    failure of an outage rather than on every failed poll. Fetching stops at
+    CYCLE_DEADLINE_SECONDS; miners still outstanding then are "truncated".
+    
+    Returns:
+        dict: endpoint -> {"status": "ok" | "alert" | "offline" | "backoff" | "truncated" | "error", "reading": Reading or None}
+    """
+    from .config import POLL_CONCURRENCY, CYCLE_DEADLINE_SECONDS
+    
+    cycle_start = time.monotonic()
+    outcomes = {endpoint_url: {"status": "error", "reading": None} for endpoint_url in endpoints}
+    
+    endpoints = []
+    for endpoint_url in outcomes:
+        if health.should_poll(endpoint_url, cycle_start):
+            endpoints.append(endpoint_url)
+        else:
+            outcomes[endpoint_url]["status"] = "backoff"
+    
+    skipped = len(outcomes) - len(endpoints)
+    if skipped:
+        logger.info(f"Skipping {skipped} miners in backoff")
+    
+    if not endpoints:
+        return outcomes
+    
+    results = _run_async(fetch_all(endpoints, min(POLL_CONCURRENCY, len(endpoints)), CYCLE_DEADLINE_SECONDS))
+    logger.info(f"Fetched {len(endpoints)} miners in {time.monotonic() - cycle_start:.2f}s")
+    
+    truncated = sum(1 for result in results if isinstance(result, asyncio.TimeoutError))
+    if truncated:
+        logger.warning(f"Cycle deadline of {CYCLE_DEADLINE_SECONDS}s reached, {truncated} miners did not respond in time")
+    
+    # (endpoint, miner, reading, previous reading state) for each miner that responded
+    pending = []
+    offline_miners = []
+    
+    # Objects stay usable after the commit for alerting without being reloaded
+    with Session(engine, expire_on_commit=False) as session:
+        if registry.ensure_current(session):
+            # A deleted miner's id can be reused, so its cached last reading must go too
+            state.invalidate()
+        state.ensure_current(session)
         
-        # Multiplier map
-        multipliers = {
-            'K': 1_000,
-            'M': 1_000_000,
-            'G': 1_000_000_000,
-            'T': 1_000_000_000_000,
-            'P': 1_000_000_000_000_000,
-            'E': 1_000_000_000_000_000_000,
-            '': 1
-        }
+        for endpoint_url, result in zip(endpoints, results):
+            try:
+                miner = registry.get_or_create(session, endpoint_url)
+                
+                if isinstance(result, requests.exceptions.RequestException):
+                    logger.error(f"Failed to poll miner at {endpoint_url}: {result}")
+                    outcomes[endpoint_url]["status"] = "offline"
+                    if health.record_failure(endpoint_url):
+                        offline_miners.append(miner)
+                    continue
+                if isinstance(result, asyncio.TimeoutError):
+                    # Cut off by the cycle deadline, not necessarily down; it is polled again next time
+                    outcomes[endpoint_url]["status"] = "truncated"
+                    continue
+                if isinstance(result, Exception):
+                    raise result
+                
+                # A payload that can't be turned into a reading doesn't count as a successful poll
+                reading = build_reading(miner, result)
+                health.record_success(endpoint_url)
+                pending.append((endpoint_url, miner, reading, state.get_last(miner.id)))
+            except Exception as e:
+                logger.exception(f"Error processing miner at {endpoint_url}: {e}")
         
-        multiplier = multipliers.get(unit_part, 1)
-        normalized = int(number_part * multiplier)
-        return str(normalized)
+        try:
+            stored = ingest_readings(session, [reading for _, _, reading, _ in pending])
+        except Exception as e:
+            logger.exception(f"Failed to store readings for this cycle: {e}")
+            stored = []
+            # Miners registered this cycle were rolled back with the readings
+            registry.invalidate()
+    
+    stored_ids = {id(reading) for reading in stored}
+    for endpoint_url, miner, reading, prev_state in pending:
+        if id(reading) not in stored_ids:
+            continue
+        outcomes[endpoint_url] = {"status": "ok", "reading": reading}
+        try:
+            if check_alerts(miner, reading, prev_state):
+                outcomes[endpoint_url]["status"] = "alert"
+        except Exception as e:
+            logger.exception(f"Error sending alerts for {miner.name}: {e}")
+    
+    # Send offline alert when miner fails to respond
+    for miner in offline_miners:
+        logger.warning(f"Miner {miner.name} appears to be offline, sending alert")
+        try:
+            send_miner_offline_alert(miner)
+        except Exception as alert_error:
+            logger.exception(f"Failed to send offline alert for {miner.name}: {alert_error}")
+    
+    logger.debug(f"HTTP pool stats: {transport.get_pool_stats()}")
+    return outcomes
+
+def poll_endpoints(endpoints, trigger="scheduled"):
+    """
+    Poll a set of miner endpoints once, coordinated with any other cycle in flight.
+    
+    See coordinator.run_cycle: if another cycle (in this process or the other
+    one) is already polling these miners, its results are reused instead.
+    
+    Args:
+        endpoints: List of miner base URLs
+        trigger: What started the cycle, for cycle stats
     
-    # If we can't parse it, log a warning and return as-is
-    logger.warning(f"Could not normalize difficulty value: {diff_value}, storing as-is")
-    return diff_str
+    Returns:
+        dict: endpoint -> outcome, as returned by _poll_endpoints
+    """
+    endpoints = list(endpoints)
+    return coordinator.run_cycle(endpoints, lambda: _poll_endpoints(endpoints), trigger)
 
-def poll_once():
+def poll_once(trigger="manual"):
     """
     Poll all configured miner endpoints once and store results.
     Send alerts if thresholds are exceeded.
+    
+    Args:
+        trigger: What started the cycle, for cycle stats
+    
+    Returns:
+        int: Number of miners polled successfully
     """
     logger.info("Starting polling cycle")
+    cycle_start = time.monotonic()
     
     # Force reload config to ensure we have the latest settings
     reload_config()
     
-    # Get the latest thresholds after reload
-    from .config import ENDPOINTS, TEMP_MAX, TEMP_MIN, VOLT_MIN
+    # Get the latest endpoints after reload
+    from .config import ENDPOINTS
     
     # Check if there are any endpoints configured
     if not ENDPOINTS:
         logger.warning("No miner endpoints configured, skipping poll")
         return 0
-        
-    success_count = 0
     
-    with Session(engine) as session:
-        for endpoint_url in ENDPOINTS:
-            try:
-                # Get or create miner record
-                miner = session.exec(select(Miner).where(Miner.endpoint == endpoint_url)).first()
-                if not miner:
-                    logger.info(f"Registering new miner at {endpoint_url}")
-                    miner = Miner(name=f"bitaxe_{endpoint_url.split('://')[-1]}", endpoint=endpoint_url)
-                    session.add(miner)
-                    session.commit()
-                    # Refresh to get the ID
-                    session.refresh(miner)
-                
-                # Poll miner API
-                logger.info(f"Polling miner at {endpoint_url}")
-                resp = requests.get(f"{endpoint_url}/api/system/info", timeout=10)
-                resp.raise_for_status()
-                data = resp.json()
-                
-                # Log raw voltage data for debugging
-                raw_voltage = data.get("voltage", 0.0)
-                converted_voltage = raw_voltage / 1000.0 if raw_voltage else 0.0
-                logger.info(f"Raw voltage: {raw_voltage}, Converted: {converted_voltage}V, Min threshold: {VOLT_MIN}V")
-                
-                # Normalize difficulty to handle both old and new firmware formats
-                raw_best_diff = data.get("bestDiff", "0")
-                normalized_best_diff = normalize_difficulty(raw_best_diff)
-                logger.info(f"Raw best diff: {raw_best_diff}, Normalized: {normalized_best_diff}")
-                
-                # Create reading
-                r = Reading(
-                    miner_id=miner.id,
-                    hash_rate=data["hashRate"],
-                    temperature=data["temp"],
-                    best_diff=normalized_best_diff,
-                    voltage=converted_voltage,  # Convert from millivolts to volts
-                    error_percentage=data.get("errorPercentage", 0.0)  # Error percentage
-                )
-                session.add(r)
-                session.commit()
-                success_count += 1
-                
-                # Temperature alerts
-                if r.temperature > TEMP_MAX or r.temperature < TEMP_MIN:
-                    logger.warning(f"Temperature out of range for {miner.name}: {r.temperature}°C (range: {TEMP_MIN}-{TEMP_MAX}°C)")
-                    send_temperature_alert(miner, r)
-                
-                # Voltage alerts
-                if r.voltage < VOLT_MIN:
-                    logger.warning(f"Voltage below minimum for {miner.name}: {r.voltage}V (min: {VOLT_MIN}V)")
-                    try:
-                        send_voltage_alert(miner, r)
-                        logger.info(f"Voltage alert sent for {miner.name}")
-                    except Exception as e:
-                        logger.exception(f"Failed to send voltage alert for {miner.name}: {e}")
-                else:
-                    logger.info(f"Voltage OK for {miner.name}: {r.voltage}V (min: {VOLT_MIN}V)")
-                
-                # New best diff check
-                prev_reading = session.exec(
-                    select(Reading)
-                    .where(Reading.miner_id == miner.id, Reading.id != r.id)
-                    .order_by(Reading.timestamp.desc())
-                    .limit(1)
-                ).first()
-                
-                # Normalize both values for comparison to handle mixed old/new format data
-                if prev_reading:
-                    prev_normalized = normalize_difficulty(prev_reading.best_diff)
-                    new_normalized = normalize_difficulty(r.best_diff)
-                    if prev_normalized != new_normalized:
-                        logger.info(f"New best diff for {miner.name}: {new_normalized} (was {prev_normalized})")
-                        send_diff_alert(miner, r)
-                    
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Failed to poll miner at {endpoint_url}: {e}")
-                
-                # Send offline alert when miner fails to respond
-                if miner:
-                    logger.warning(f"Miner {miner.name} appears to be offline, sending alert")
-                    try:
-                        send_miner_offline_alert(miner)
-                    except Exception as alert_error:
-                        logger.exception(f"Failed to send offline alert for {miner.name}: {alert_error}")
-                        
-            except Exception as e:
-                logger.exception(f"Error processing miner at {endpoint_url}: {e}")
+    outcomes = poll_endpoints(ENDPOINTS, trigger)
+    success_count = sum(1 for outcome in outcomes.values() if outcome["status"] in ("ok", "alert"))
     
-    logger.info(f"Completed polling cycle. Successful: {success_count}/{len(ENDPOINTS)}")
-    return success_count 
\ No newline at end of file
+    logger.info(f"Completed polling cycle in {time.monotonic() - cycle_start:.2f}s. Successful: {success_count}/{len(outcomes)}")
+    return success_count
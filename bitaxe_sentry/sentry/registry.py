@@ -0,0 +1,135 @@
+import logging
+import threading
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from .db import Miner
+from . import config
+
+logger = logging.getLogger(__name__)
+
+# endpoint URL -> detached Miner copy
+_miners = {}
+_lock = threading.Lock()
+_loaded = False
+
+# Config file mtime the registry was loaded under; a settings change reloads it
+_loaded_config_mtime = None
+
+# Miner table signature the registry was loaded under; a delete, rename or
+# registration by another process (e.g. the web container) changes it
+_loaded_signature = None
+
+def _detached(miner):
+    return Miner(id=miner.id, name=miner.name, endpoint=miner.endpoint, added_at=miner.added_at)
+
+def _signature(session):
+    """
+    Get a cheap fingerprint of the miner table.
+
+    One aggregate row: the row count and highest id catch deletes and
+    registrations, the concatenated names catch renames.
+
+    Args:
+        session: Open database session
+
+    Returns:
+        tuple: (count, max id, names)
+    """
+    return tuple(session.exec(
+        select(func.count(Miner.id), func.max(Miner.id), func.group_concat(Miner.id.concat(":").concat(Miner.name), "\n"))
+    ).one())
+
+def load(session):
+    """
+    Load every miner into the registry.
+
+    Args:
+        session: Open database session
+    """
+    global _loaded, _loaded_config_mtime, _loaded_signature
+    signature = _signature(session)
+    miners = session.exec(select(Miner)).all()
+    with _lock:
+        _miners.clear()
+        for miner in miners:
+            _miners[miner.endpoint] = _detached(miner)
+        _loaded = True
+        _loaded_config_mtime = config.last_modified_time
+        _loaded_signature = signature
+    logger.info(f"Loaded {len(miners)} miners into endpoint registry")
+
+def ensure_current(session):
+    """
+    Make sure the registry reflects the miner table, reloading it if needed.
+
+    Miners can be deleted or renamed by the web process, which may run in
+    another container where SIGHUP never arrives, so the table itself is
+    checked. Costs one aggregate query when the registry is already current.
+
+    Args:
+        session: Open database session
+
+    Returns:
+        bool: True if a loaded registry was found stale and reloaded
+    """
+    if not _loaded or _loaded_config_mtime != config.last_modified_time:
+        load(session)
+        return False
+    if _signature(session) == _loaded_signature:
+        return False
+    logger.info("Miners changed outside this process, reloading endpoint registry")
+    load(session)
+    return True
+
+def get_or_create(session, endpoint_url):
+    """
+    Get the miner for an endpoint, registering it if it's new.
+
+    Only queries the database the first time, after invalidation, or when
+    the endpoint hasn't been seen before; callers run ensure_current() once
+    per cycle to pick up changes made by other processes. A new miner is
+    flushed but not committed, so it is committed together with the caller's
+    transaction.
+
+    Args:
+        session: Open database session
+        endpoint_url: Base URL of the miner
+
+    Returns:
+        Miner: Detached miner instance (read-only)
+    """
+    global _loaded_signature
+    if not _loaded or _loaded_config_mtime != config.last_modified_time:
+        load(session)
+
+    with _lock:
+        miner = _miners.get(endpoint_url)
+    if miner:
+        return miner
+
+    logger.info(f"Registering new miner at {endpoint_url}")
+    miner = Miner(name=f"bitaxe_{endpoint_url.split('://')[-1]}", endpoint=endpoint_url)
+    try:
+        # Savepoint so a duplicate (another process registered it first) doesn't
+        # roll back the rest of the caller's transaction
+        with session.begin_nested():
+            session.add(miner)
+    except IntegrityError:
+        logger.info(f"Miner at {endpoint_url} was registered by another process, loading it")
+        miner = session.exec(select(Miner).where(Miner.endpoint == endpoint_url)).one()
+
+    miner = _detached(miner)
+    with _lock:
+        _miners[endpoint_url] = miner
+        # The table no longer matches the loaded signature; the next
+        # ensure_current() reloads rather than mistake a later delete for no change
+        _loaded_signature = None
+    return miner
+
+def invalidate():
+    """Drop the registry so it is reloaded on next use (after miners are deleted, renamed or rolled back)."""
+    global _loaded
+    with _lock:
+        _miners.clear()
+        _loaded = False
@@ -0,0 +1,246 @@
+import datetime
+import logging
+import time
+from sqlalchemy import func, case
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import select, delete
+from .db import ReadingRollup
+from .storage import epoch_seconds
+
+logger = logging.getLogger(__name__)
+
+# Bucket sizes in seconds: 1 minute, 1 hour, 1 day
+RESOLUTIONS = (60, 3600, 86400)
+
+METRICS = ("hash_rate", "temperature", "voltage", "error_percentage")
+
+# Minute buckets are only used for windows of a few days at most
+MINUTE_ROLLUP_RETENTION_DAYS = 7
+
+def bucket_start(timestamp, resolution):
+    """
+    Get the start of the bucket a timestamp falls in.
+
+    Args:
+        timestamp: Naive UTC datetime
+        resolution: Bucket size in seconds
+
+    Returns:
+        datetime: Naive UTC bucket start
+    """
+    epoch = int(timestamp.replace(tzinfo=datetime.timezone.utc).timestamp())
+    return datetime.datetime.utcfromtimestamp(epoch - epoch % resolution)
+
+# Column names for each metric: (metric, min, max, sum, last)
+_METRIC_COLUMNS = [(metric, f"{metric}_min", f"{metric}_max", f"{metric}_sum", f"{metric}_last") for metric in METRICS]
+
+def rollup_rows(readings):
+    """
+    Build the rollup rows for a set of readings, one per (miner, resolution, bucket).
+
+    Readings that share a bucket are merged here, so a large batch (e.g. a bulk
+    import) upserts each bucket once instead of once per reading. Minute
+    buckets older than MINUTE_ROLLUP_RETENTION_DAYS are left out, since
+    clean_old() would delete them anyway.
+
+    Args:
+        readings: Readings (or objects with the same attributes)
+
+    Returns:
+        list: Column dicts for the rollup upsert
+    """
+    minute_cutoff = int(time.time()) - MINUTE_ROLLUP_RETENTION_DAYS * 86400
+    rows = {}
+    for reading in readings:
+        timestamp = reading.timestamp
+        epoch = int(timestamp.replace(tzinfo=datetime.timezone.utc).timestamp())
+        values = [(columns, getattr(reading, columns[0]) or 0.0) for columns in _METRIC_COLUMNS]
+        for resolution in RESOLUTIONS:
+            if resolution == RESOLUTIONS[0] and epoch < minute_cutoff:
+                continue
+            key = (reading.miner_id, resolution, epoch - epoch % resolution)
+            row = rows.get(key)
+            if row is None:
+                row = rows[key] = {
+                    "miner_id": reading.miner_id,
+                    "resolution": resolution,
+                    "bucket": datetime.datetime.utcfromtimestamp(key[2]),
+                    "count": 1,
+                    "last_timestamp": timestamp,
+                }
+                for (_, min_column, max_column, sum_column, last_column), value in values:
+                    row[min_column] = row[max_column] = row[sum_column] = row[last_column] = value
+                continue
+
+            row["count"] += 1
+            newer = timestamp >= row["last_timestamp"]
+            if newer:
+                row["last_timestamp"] = timestamp
+            for (_, min_column, max_column, sum_column, last_column), value in values:
+                if value < row[min_column]:
+                    row[min_column] = value
+                if value > row[max_column]:
+                    row[max_column] = value
+                row[sum_column] += value
+                if newer:
+                    row[last_column] = value
+    return list(rows.values())
+
+def _upsert_statement():
+    """INSERT ... ON CONFLICT that merges a row into an existing bucket."""
+    table = ReadingRollup.__table__
+    statement = insert(table)
+    excluded = statement.excluded
+    newer = excluded.last_timestamp >= table.c.last_timestamp
+
+    updates = {
+        "count": table.c.count + excluded.count,
+        "last_timestamp": case((newer, excluded.last_timestamp), else_=table.c.last_timestamp),
+    }
+    for metric in METRICS:
+        updates[f"{metric}_min"] = func.min(table.c[f"{metric}_min"], excluded[f"{metric}_min"])
+        updates[f"{metric}_max"] = func.max(table.c[f"{metric}_max"], excluded[f"{metric}_max"])
+        updates[f"{metric}_sum"] = table.c[f"{metric}_sum"] + excluded[f"{metric}_sum"]
+        updates[f"{metric}_last"] = case((newer, excluded[f"{metric}_last"]), else_=table.c[f"{metric}_last"])
+
+    return statement.on_conflict_do_update(index_elements=["miner_id", "resolution", "bucket"], set_=updates)
+
+_upsert = _upsert_statement()
+
+def record(session, readings):
+    """
+    Fold newly stored readings into their rollup buckets.
+
+    Runs in the caller's transaction so the rollups commit together with the readings.
+
+    Args:
+        session: Open database session
+        readings: Readings that were just inserted
+    """
+    rows = rollup_rows(readings)
+    if rows:
+        session.exec(_upsert, params=rows)
+
+def resolution_for(window_seconds, min_points):
+    """
+    Pick the coarsest rollup resolution that still gives a window enough points.
+
+    Args:
+        window_seconds: Length of the chart window
+        min_points: Points the window needs
+
+    Returns:
+        int: Resolution in seconds, or None if the window is short enough to chart raw readings
+    """
+    for resolution in reversed(RESOLUTIONS):
+        if window_seconds / resolution >= min_points:
+            return resolution
+    return None
+
+def fetch_envelope(session, resolution, metric, start, end=None, miner_id=None):
+    """
+    Load one metric's rollup buckets for downsampling.
+
+    Args:
+        session: Open database session
+        resolution: Bucket size in seconds
+        metric: One of METRICS
+        start: Only buckets starting after this time
+        end: Only buckets starting up to this time
+        miner_id: Only this miner (all miners if None)
+
+    Returns:
+        dict: miner_id -> list of (bucket start in epoch seconds, average, min, max)
+    """
+    table = ReadingRollup.__table__
+    query = (
+        select(
+            table.c.miner_id,
+            epoch_seconds(table.c.bucket),
+            table.c[f"{metric}_sum"] / table.c.count,
+            table.c[f"{metric}_min"],
+            table.c[f"{metric}_max"],
+        )
+        .where(table.c.resolution == resolution)
+        .where(table.c.bucket > start)
+    )
+    if end is not None:
+        query = query.where(table.c.bucket <= end)
+    if miner_id is not None:
+        query = query.where(table.c.miner_id == miner_id)
+
+    series = {}
+    for row_miner_id, epoch, average, low, high in session.exec(query):
+        series.setdefault(row_miner_id, []).append((epoch, average, low, high))
+    return series
+
+def series_resolution(start, end, points, now=None):
+    """
+    Pick where to read a chart series from.
+
+    The coarsest source that still has at least `points` rows over the range,
+    so downsampling has enough to choose from without reading far more rows
+    than it returns. Sources that no longer reach back to the range start
+    (raw readings past RETENTION_DAYS, minute buckets past
+    MINUTE_ROLLUP_RETENTION_DAYS) are skipped, for a finer one if that still
+    covers the range and otherwise the next coarser one.
+
+    Args:
+        start: Range start (naive UTC)
+        end: Range end (naive UTC)
+        points: Points the chart wants
+        now: Current UTC time (defaults to now)
+
+    Returns:
+        int: Rollup resolution in seconds, or None for raw readings
+    """
+    from .config import RETENTION_DAYS
+
+    now = now or datetime.datetime.utcnow()
+    window_seconds = (end - start).total_seconds()
+    kept_since = {
+        None: now - datetime.timedelta(days=RETENTION_DAYS),
+        RESOLUTIONS[0]: now - datetime.timedelta(days=MINUTE_ROLLUP_RETENTION_DAYS),
+    }
+
+    sources = (None,) + RESOLUTIONS
+    covering = [resolution for resolution in sources if resolution not in kept_since or start >= kept_since[resolution]]
+    wanted = sources.index(resolution_for(window_seconds, points))
+    finer = [resolution for resolution in covering if sources.index(resolution) <= wanted]
+    return finer[-1] if finer else covering[0]
+
+def retention_days():
+    """
+    Get how long hourly and daily rollups are kept.
+
+    Returns:
+        int: ROLLUP_RETENTION_DAYS, or RETENTION_DAYS if that is longer or rollup retention is unset
+    """
+    from .config import RETENTION_DAYS, ROLLUP_RETENTION_DAYS
+    return max(RETENTION_DAYS, ROLLUP_RETENTION_DAYS)
+
+def clean_old(session, now=None):
+    """
+    Delete rollup buckets past their retention.
+
+    Minute buckets are kept MINUTE_ROLLUP_RETENTION_DAYS, hourly and daily ones retention_days().
+
+    Args:
+        session: Open database session (the caller commits)
+        now: Current UTC time (defaults to now)
+
+    Returns:
+        int: Number of buckets deleted
+    """
+    now = now or datetime.datetime.utcnow()
+    deleted = 0
+    for resolution in RESOLUTIONS:
+        days = MINUTE_ROLLUP_RETENTION_DAYS if resolution == RESOLUTIONS[0] else retention_days()
+        cutoff = now - datetime.timedelta(days=days)
+        result = session.exec(
+            delete(ReadingRollup)
+            .where(ReadingRollup.resolution == resolution)
+            .where(ReadingRollup.bucket < bucket_start(cutoff, resolution))
+        )
+        deleted += result.rowcount
+    return deleted
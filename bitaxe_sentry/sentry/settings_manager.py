@@ -19,9 +19,38 @@ DEFAULT_SETTINGS = {
     "TEMP_MAX": 70,
     "VOLT_MIN": 5.0,
     "BITAXE_ENDPOINTS": [],
-    "DISCORD_WEBHOOK_URL": ""
+    "DISCORD_WEBHOOK_URL": "",
+    "POLL_CONCURRENCY": 32,
+    "HTTP_POOL_MAXSIZE": 2,
+    "POLL_INTERVAL_SECONDS": 0,
+    "ALERT_POLL_INTERVAL_SECONDS": 30,
+    "STABLE_INTERVAL_MULTIPLIER": 2.0,
+    "POLL_JITTER": 0.1,
+    "BREAKER_FAILURE_THRESHOLD": 3,
+    "BREAKER_PROBE_TIMEOUT_SECONDS": 2,
+    "BREAKER_MAX_BACKOFF_SECONDS": 3600,
+    "CYCLE_DEADLINE_SECONDS": 60,
+    "DISCOVERY_CONCURRENCY": 64,
+    "DISCOVERY_TIMEOUT_SECONDS": 1.0,
+    "INGEST_MODE": "poll",
+    "STREAM_PATH": "/api/system/stream",
+    "STREAM_RESOLUTION_SECONDS": 10,
+    "STREAM_RETRY_SECONDS": 3600,
+    "ROLLUP_RETENTION_DAYS": 0,
+    "STORAGE_LAYOUT": "single",
+    "ARCHIVE_FORMAT": "none"
 }
 
+# "stream" holds a streaming connection per miner and falls back to polling for miners that don't support it
+INGEST_MODES = ("poll", "stream")
+
+# "daily" writes each day's readings to its own table so retention can drop whole days,
+# "compact" writes to a smaller WITHOUT ROWID table keyed by (miner_id, epoch) (see storage.py)
+STORAGE_LAYOUTS = ("single", "daily", "compact")
+
+# "parquet" copies readings into Parquet files before retention deletes them (see archive.py)
+ARCHIVE_FORMATS = ("none", "parquet")
+
 def ensure_data_dir():
     """Ensure the data directory exists"""
     DATA_DIR.mkdir(exist_ok=True)
@@ -54,6 +83,25 @@ def load_settings():
             settings["TEMP_MIN"] = float(settings["TEMP_MIN"])
             settings["TEMP_MAX"] = float(settings["TEMP_MAX"])
             settings["VOLT_MIN"] = float(settings["VOLT_MIN"])
+            settings["POLL_CONCURRENCY"] = max(1, int(settings["POLL_CONCURRENCY"]))
+            settings["HTTP_POOL_MAXSIZE"] = max(1, int(settings["HTTP_POOL_MAXSIZE"]))
+            settings["POLL_INTERVAL_SECONDS"] = max(0, int(settings["POLL_INTERVAL_SECONDS"]))
+            settings["ALERT_POLL_INTERVAL_SECONDS"] = max(1, int(settings["ALERT_POLL_INTERVAL_SECONDS"]))
+            settings["STABLE_INTERVAL_MULTIPLIER"] = max(1.0, float(settings["STABLE_INTERVAL_MULTIPLIER"]))
+            settings["POLL_JITTER"] = min(0.5, max(0.0, float(settings["POLL_JITTER"])))
+            settings["BREAKER_FAILURE_THRESHOLD"] = max(1, int(settings["BREAKER_FAILURE_THRESHOLD"]))
+            settings["BREAKER_PROBE_TIMEOUT_SECONDS"] = max(0.1, float(settings["BREAKER_PROBE_TIMEOUT_SECONDS"]))
+            settings["BREAKER_MAX_BACKOFF_SECONDS"] = max(1, int(settings["BREAKER_MAX_BACKOFF_SECONDS"]))
+            settings["CYCLE_DEADLINE_SECONDS"] = max(1, int(settings["CYCLE_DEADLINE_SECONDS"]))
+            settings["DISCOVERY_CONCURRENCY"] = max(1, int(settings["DISCOVERY_CONCURRENCY"]))
+            settings["DISCOVERY_TIMEOUT_SECONDS"] = max(0.1, float(settings["DISCOVERY_TIMEOUT_SECONDS"]))
+            settings["INGEST_MODE"] = settings["INGEST_MODE"] if settings["INGEST_MODE"] in INGEST_MODES else "poll"
+            settings["STREAM_PATH"] = str(settings["STREAM_PATH"])
+            settings["STREAM_RESOLUTION_SECONDS"] = max(1, int(settings["STREAM_RESOLUTION_SECONDS"]))
+            settings["STREAM_RETRY_SECONDS"] = max(60, int(settings["STREAM_RETRY_SECONDS"]))
+            settings["ROLLUP_RETENTION_DAYS"] = max(0, int(settings["ROLLUP_RETENTION_DAYS"]))
+            settings["STORAGE_LAYOUT"] = settings["STORAGE_LAYOUT"] if settings["STORAGE_LAYOUT"] in STORAGE_LAYOUTS else "single"
+            settings["ARCHIVE_FORMAT"] = settings["ARCHIVE_FORMAT"] if settings["ARCHIVE_FORMAT"] in ARCHIVE_FORMATS else "none"
             
             # Log the converted values for debugging
             logger.info(f"Loaded settings - POLL_INTERVAL_MINUTES: {settings['POLL_INTERVAL_MINUTES']}, "
@@ -66,6 +114,25 @@ def load_settings():
             settings["TEMP_MIN"] = DEFAULT_SETTINGS["TEMP_MIN"]
             settings["TEMP_MAX"] = DEFAULT_SETTINGS["TEMP_MAX"]
             settings["VOLT_MIN"] = DEFAULT_SETTINGS["VOLT_MIN"]
+            settings["POLL_CONCURRENCY"] = DEFAULT_SETTINGS["POLL_CONCURRENCY"]
+            settings["HTTP_POOL_MAXSIZE"] = DEFAULT_SETTINGS["HTTP_POOL_MAXSIZE"]
+            settings["POLL_INTERVAL_SECONDS"] = DEFAULT_SETTINGS["POLL_INTERVAL_SECONDS"]
+            settings["ALERT_POLL_INTERVAL_SECONDS"] = DEFAULT_SETTINGS["ALERT_POLL_INTERVAL_SECONDS"]
+            settings["STABLE_INTERVAL_MULTIPLIER"] = DEFAULT_SETTINGS["STABLE_INTERVAL_MULTIPLIER"]
+            settings["POLL_JITTER"] = DEFAULT_SETTINGS["POLL_JITTER"]
+            settings["BREAKER_FAILURE_THRESHOLD"] = DEFAULT_SETTINGS["BREAKER_FAILURE_THRESHOLD"]
+            settings["BREAKER_PROBE_TIMEOUT_SECONDS"] = DEFAULT_SETTINGS["BREAKER_PROBE_TIMEOUT_SECONDS"]
+            settings["BREAKER_MAX_BACKOFF_SECONDS"] = DEFAULT_SETTINGS["BREAKER_MAX_BACKOFF_SECONDS"]
+            settings["CYCLE_DEADLINE_SECONDS"] = DEFAULT_SETTINGS["CYCLE_DEADLINE_SECONDS"]
+            settings["DISCOVERY_CONCURRENCY"] = DEFAULT_SETTINGS["DISCOVERY_CONCURRENCY"]
+            settings["DISCOVERY_TIMEOUT_SECONDS"] = DEFAULT_SETTINGS["DISCOVERY_TIMEOUT_SECONDS"]
+            settings["INGEST_MODE"] = DEFAULT_SETTINGS["INGEST_MODE"]
+            settings["STREAM_PATH"] = DEFAULT_SETTINGS["STREAM_PATH"]
+            settings["STREAM_RESOLUTION_SECONDS"] = DEFAULT_SETTINGS["STREAM_RESOLUTION_SECONDS"]
+            settings["STREAM_RETRY_SECONDS"] = DEFAULT_SETTINGS["STREAM_RETRY_SECONDS"]
+            settings["ROLLUP_RETENTION_DAYS"] = DEFAULT_SETTINGS["ROLLUP_RETENTION_DAYS"]
+            settings["STORAGE_LAYOUT"] = DEFAULT_SETTINGS["STORAGE_LAYOUT"]
+            settings["ARCHIVE_FORMAT"] = DEFAULT_SETTINGS["ARCHIVE_FORMAT"]
         
         return settings
     except Exception as e:
@@ -76,6 +143,17 @@ def save_settings(settings_dict):
     """Save settings to JSON file in data directory"""
     ensure_data_dir()
     
+    # Keep settings that aren't part of this submission (e.g. advanced keys
+    # edited directly in config.json) instead of dropping them
+    if CONFIG_FILE_PATH.exists():
+        try:
+            with open(CONFIG_FILE_PATH, 'r') as f:
+                stored_settings = json.load(f)
+            for key, value in stored_settings.items():
+                settings_dict.setdefault(key, value)
+        except Exception as e:
+            logger.warning(f"Could not read existing settings to merge: {e}")
+    
     # Convert string endpoints to list if needed
     if isinstance(settings_dict.get("BITAXE_ENDPOINTS"), str):
         endpoints = settings_dict["BITAXE_ENDPOINTS"].split(",")
@@ -88,6 +166,28 @@ def save_settings(settings_dict):
         settings_dict["TEMP_MIN"] = float(settings_dict.get("TEMP_MIN", DEFAULT_SETTINGS["TEMP_MIN"]))
         settings_dict["TEMP_MAX"] = float(settings_dict.get("TEMP_MAX", DEFAULT_SETTINGS["TEMP_MAX"]))
         settings_dict["VOLT_MIN"] = float(settings_dict.get("VOLT_MIN", DEFAULT_SETTINGS["VOLT_MIN"]))
+        settings_dict["POLL_CONCURRENCY"] = max(1, int(settings_dict.get("POLL_CONCURRENCY", DEFAULT_SETTINGS["POLL_CONCURRENCY"])))
+        settings_dict["HTTP_POOL_MAXSIZE"] = max(1, int(settings_dict.get("HTTP_POOL_MAXSIZE", DEFAULT_SETTINGS["HTTP_POOL_MAXSIZE"])))
+        settings_dict["POLL_INTERVAL_SECONDS"] = max(0, int(settings_dict.get("POLL_INTERVAL_SECONDS", DEFAULT_SETTINGS["POLL_INTERVAL_SECONDS"])))
+        settings_dict["ALERT_POLL_INTERVAL_SECONDS"] = max(1, int(settings_dict.get("ALERT_POLL_INTERVAL_SECONDS", DEFAULT_SETTINGS["ALERT_POLL_INTERVAL_SECONDS"])))
+        settings_dict["STABLE_INTERVAL_MULTIPLIER"] = max(1.0, float(settings_dict.get("STABLE_INTERVAL_MULTIPLIER", DEFAULT_SETTINGS["STABLE_INTERVAL_MULTIPLIER"])))
+        settings_dict["POLL_JITTER"] = min(0.5, max(0.0, float(settings_dict.get("POLL_JITTER", DEFAULT_SETTINGS["POLL_JITTER"]))))
+        settings_dict["BREAKER_FAILURE_THRESHOLD"] = max(1, int(settings_dict.get("BREAKER_FAILURE_THRESHOLD", DEFAULT_SETTINGS["BREAKER_FAILURE_THRESHOLD"])))
+        settings_dict["BREAKER_PROBE_TIMEOUT_SECONDS"] = max(0.1, float(settings_dict.get("BREAKER_PROBE_TIMEOUT_SECONDS", DEFAULT_SETTINGS["BREAKER_PROBE_TIMEOUT_SECONDS"])))
+        settings_dict["BREAKER_MAX_BACKOFF_SECONDS"] = max(1, int(settings_dict.get("BREAKER_MAX_BACKOFF_SECONDS", DEFAULT_SETTINGS["BREAKER_MAX_BACKOFF_SECONDS"])))
+        settings_dict["CYCLE_DEADLINE_SECONDS"] = max(1, int(settings_dict.get("CYCLE_DEADLINE_SECONDS", DEFAULT_SETTINGS["CYCLE_DEADLINE_SECONDS"])))
+        settings_dict["DISCOVERY_CONCURRENCY"] = max(1, int(settings_dict.get("DISCOVERY_CONCURRENCY", DEFAULT_SETTINGS["DISCOVERY_CONCURRENCY"])))
+        settings_dict["DISCOVERY_TIMEOUT_SECONDS"] = max(0.1, float(settings_dict.get("DISCOVERY_TIMEOUT_SECONDS", DEFAULT_SETTINGS["DISCOVERY_TIMEOUT_SECONDS"])))
+        if settings_dict.get("INGEST_MODE") not in INGEST_MODES:
+            settings_dict["INGEST_MODE"] = DEFAULT_SETTINGS["INGEST_MODE"]
+        settings_dict["STREAM_PATH"] = str(settings_dict.get("STREAM_PATH", DEFAULT_SETTINGS["STREAM_PATH"]))
+        settings_dict["STREAM_RESOLUTION_SECONDS"] = max(1, int(settings_dict.get("STREAM_RESOLUTION_SECONDS", DEFAULT_SETTINGS["STREAM_RESOLUTION_SECONDS"])))
+        settings_dict["STREAM_RETRY_SECONDS"] = max(60, int(settings_dict.get("STREAM_RETRY_SECONDS", DEFAULT_SETTINGS["STREAM_RETRY_SECONDS"])))
+        settings_dict["ROLLUP_RETENTION_DAYS"] = max(0, int(settings_dict.get("ROLLUP_RETENTION_DAYS", DEFAULT_SETTINGS["ROLLUP_RETENTION_DAYS"])))
+        if settings_dict.get("STORAGE_LAYOUT") not in STORAGE_LAYOUTS:
+            settings_dict["STORAGE_LAYOUT"] = DEFAULT_SETTINGS["STORAGE_LAYOUT"]
+        if settings_dict.get("ARCHIVE_FORMAT") not in ARCHIVE_FORMATS:
+            settings_dict["ARCHIVE_FORMAT"] = DEFAULT_SETTINGS["ARCHIVE_FORMAT"]
         
         # Log the converted values for debugging
         logger.info(f"Saving settings - POLL_INTERVAL_MINUTES: {settings_dict['POLL_INTERVAL_MINUTES']}, "
@@ -0,0 +1,253 @@
+"""
+Fake Bitaxe fleet for load testing.
+
+Serves /api/system/info (and an NDJSON /api/system/stream) for any number of
+virtual miners from a single local HTTP server, one miner per path prefix:
+http://127.0.0.1:<port>/m/<index>. Latency, failures, temperature drift and
+best diff jumps are configurable. A Discord-style webhook sink at /webhook
+counts the alerts it receives.
+
+Run standalone with:
+    python -m bitaxe_sentry.sentry.simulator --miners 500 --port 8900
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DEFAULT_PORT = 8900
+
+class FleetServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Many pollers connect at once; don't let the listen backlog refuse them
+    request_queue_size = 1024
+
+class Fleet:
+    """
+    State of the simulated miners.
+
+    Args:
+        miners: Number of virtual miners
+        latency: Base response time in seconds
+        latency_jitter: Extra random response time, up to this many seconds
+        failure_rate: Fraction of requests answered with HTTP 503
+        offline_rate: Fraction of miners that drop every connection without answering
+        temp_drift: Largest temperature change per request, in °C
+        hot_rate: Fraction of miners that drift towards overheating
+        diff_jump_rate: Chance per request that a miner finds a new best diff
+        seed: Random seed, for repeatable runs
+    """
+
+    def __init__(self, miners, latency=0.05, latency_jitter=0.0, failure_rate=0.0, offline_rate=0.0,
+                 temp_drift=0.5, hot_rate=0.0, diff_jump_rate=0.01, seed=None):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.failure_rate = failure_rate
+        self.temp_drift = temp_drift
+        self.diff_jump_rate = diff_jump_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.miners = [
+            {
+                "temp": self.random.uniform(45.0, 60.0),
+                "best_diff": self.random.randint(1_000_000, 5_000_000_000),
+                "hot": self.random.random() < hot_rate,
+                "offline": self.random.random() < offline_rate,
+                "requests": 0,
+            }
+            for _ in range(miners)
+        ]
+        self.webhooks = 0
+        self.requests = 0
+        self.failures = 0
+
+    def sample(self, index):
+        """Advance a miner's state by one step and return its system info payload."""
+        with self.lock:
+            miner = self.miners[index]
+            miner["requests"] += 1
+            self.requests += 1
+            drift = self.random.uniform(-self.temp_drift, self.temp_drift)
+            if miner["hot"]:
+                drift += self.temp_drift
+            miner["temp"] = min(95.0, max(25.0, miner["temp"] + drift))
+            if self.random.random() < self.diff_jump_rate:
+                miner["best_diff"] = int(miner["best_diff"] * self.random.uniform(1.1, 3.0))
+            return {
+                "hostname": f"sim-{index}",
+                "ASICModel": "BM1366",
+                "boardVersion": "sim",
+                "version": "v0.0-sim",
+                "macAddr": f"02:00:00:{index >> 16 & 0xff:02x}:{index >> 8 & 0xff:02x}:{index & 0xff:02x}",
+                "hashRate": round(self.random.gauss(500.0, 15.0), 2),
+                "temp": round(miner["temp"], 2),
+                "voltage": round(self.random.uniform(5050, 5200)),
+                "errorPercentage": round(self.random.uniform(0.0, 0.5), 3),
+                "bestDiff": str(miner["best_diff"]),
+            }
+
+    def should_fail(self):
+        with self.lock:
+            failed = self.random.random() < self.failure_rate
+            if failed:
+                self.failures += 1
+            return failed
+
+    def response_delay(self):
+        with self.lock:
+            return self.latency + self.random.uniform(0, self.latency_jitter)
+
+    def stats(self):
+        """Counts of miner requests, injected failures and webhook calls received."""
+        with self.lock:
+            return {"requests": self.requests, "failures": self.failures, "webhooks": self.webhooks}
+
+def _handler(fleet):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body=b"", content_type="application/json"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _miner_index(self):
+            parts = self.path.split("/")
+            # /m/<index>/api/...
+            if len(parts) < 4 or parts[1] != "m" or not parts[2].isdigit():
+                return None, None
+            index = int(parts[2])
+            if index >= len(fleet.miners):
+                return None, None
+            return index, "/" + "/".join(parts[3:])
+
+        def do_GET(self):
+            index, path = self._miner_index()
+            if index is None:
+                return self._send(404)
+            if fleet.miners[index]["offline"]:
+                # Drop the connection like an unplugged miner would
+                self.close_connection = True
+                return
+
+            time.sleep(fleet.response_delay())
+            if path == "/api/system/info":
+                if fleet.should_fail():
+                    return self._send(503)
+                return self._send(200, json.dumps(fleet.sample(index)).encode())
+            if path == "/api/system/stream":
+                return self._stream(index)
+            self._send(404)
+
+        def _stream(self, index):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                while True:
+                    line = json.dumps(fleet.sample(index)).encode() + b"\n"
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                    self.wfile.flush()
+                    time.sleep(max(fleet.latency, 0.1))
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            self.rfile.read(length)
+            if self.path != "/webhook":
+                return self._send(404)
+            with fleet.lock:
+                fleet.webhooks += 1
+            self._send(204)
+
+    return Handler
+
+def serve(fleet, host="127.0.0.1", port=DEFAULT_PORT):
+    """
+    Serve a fleet in a background thread.
+
+    Args:
+        fleet: The Fleet to serve
+        host: Address to listen on
+        port: Port to listen on (0 picks a free one)
+
+    Returns:
+        FleetServer: The running server; call shutdown() to stop it
+    """
+    server = FleetServer((host, port), _handler(fleet))
+    threading.Thread(target=server.serve_forever, name="simulator", daemon=True).start()
+    return server
+
+def endpoints(server, count):
+    """
+    Get the endpoint URLs of a served fleet.
+
+    Returns:
+        list: One base URL per virtual miner
+    """
+    host, port = server.server_address[:2]
+    return [f"http://{host}:{port}/m/{index}" for index in range(count)]
+
+def webhook_url(server):
+    """Get the URL of the server's webhook sink."""
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/webhook"
+
+def add_fleet_arguments(parser):
+    """Add the fleet options shared by the simulator and benchmark command lines."""
+    parser.add_argument("--miners", type=int, default=100, help="Number of virtual miners")
+    parser.add_argument("--latency", type=float, default=0.05, help="Base response time in seconds")
+    parser.add_argument("--latency-jitter", type=float, default=0.05, help="Extra random response time in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 503")
+    parser.add_argument("--offline-rate", type=float, default=0.0, help="Fraction of miners that never answer")
+    parser.add_argument("--temp-drift", type=float, default=0.5, help="Largest temperature change per request (°C)")
+    parser.add_argument("--hot-rate", type=float, default=0.0, help="Fraction of miners that drift towards overheating")
+    parser.add_argument("--diff-jump-rate", type=float, default=0.01, help="Chance per request of a new best diff")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+
+def fleet_from_args(args):
+    """Build a Fleet from parsed fleet options."""
+    return Fleet(
+        args.miners,
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        failure_rate=args.failure_rate,
+        offline_rate=args.offline_rate,
+        temp_drift=args.temp_drift,
+        hot_rate=args.hot_rate,
+        diff_jump_rate=args.diff_jump_rate,
+        seed=args.seed,
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a simulated Bitaxe fleet")
+    add_fleet_arguments(parser)
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    args = parser.parse_args()
+
+    fleet = fleet_from_args(args)
+    server = serve(fleet, args.host, args.port)
+    urls = endpoints(server, args.miners)
+    print(f"Serving {args.miners} miners at {urls[0]} ... {urls[-1]}")
+    print(f"Webhook sink: {webhook_url(server)}")
+    print("Endpoints (paste into BITAXE_ENDPOINTS):")
+    print(",".join(urls))
+    try:
+        while True:
+            time.sleep(60)
+            print(f"Stats: {fleet.stats()}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
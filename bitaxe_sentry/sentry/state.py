@@ -0,0 +1,94 @@
+import logging
+import threading
+from sqlmodel import select
+from .db import MinerLatest, Reading
+from . import latest, storage
+
+logger = logging.getLogger(__name__)
+
+# miner_id -> {"reading": last stored Reading, "best_diff": parsed int (or None if unparseable)}
+_last_readings = {}
+_lock = threading.Lock()
+_warmed = False
+
+# storage.high_water_mark() as of this process's last write. If it moves
+# without us (the web process polled, or readings were deleted) the cache is reloaded.
+_high_water_mark = None
+
+def _entry(reading):
+    return {"reading": reading, "best_diff": reading.best_diff_value}
+
+def warm(session):
+    """
+    Load the latest stored reading of every miner (from miner_latest) into the cache.
+
+    Args:
+        session: Open database session
+    """
+    global _warmed, _high_water_mark
+
+    readings = [
+        Reading(**{column: getattr(row, column) for column in ("miner_id",) + latest.COLUMNS})
+        for row in session.exec(select(MinerLatest)).all()
+    ]
+    high_water_mark = storage.high_water_mark(session)
+
+    with _lock:
+        _last_readings.clear()
+        for reading in readings:
+            _last_readings[reading.miner_id] = _entry(reading)
+        _high_water_mark = high_water_mark
+        _warmed = True
+
+    logger.info(f"Loaded last readings for {len(readings)} miners into state cache")
+
+def ensure_current(session):
+    """
+    Make sure the cache reflects the database, reloading it if needed.
+
+    Costs a couple of max(id) lookups when the cache is already current.
+
+    Args:
+        session: Open database session
+    """
+    if _warmed:
+        if storage.high_water_mark(session) == _high_water_mark:
+            return
+        logger.info("Readings changed outside this process, reloading state cache")
+    warm(session)
+
+def get_last(miner_id):
+    """
+    Get the cached last reading of a miner.
+
+    Args:
+        miner_id: ID of the miner
+
+    Returns:
+        dict: {"reading": Reading, "best_diff": int or None}, or None if the miner has no readings
+    """
+    with _lock:
+        return _last_readings.get(miner_id)
+
+def record(readings, high_water_mark):
+    """
+    Update the cache with newly stored readings.
+
+    Args:
+        readings: Readings that were just committed
+        high_water_mark: storage.high_water_mark() after the commit
+    """
+    global _high_water_mark
+    entries = [_entry(reading) for reading in readings]
+    with _lock:
+        for entry in entries:
+            _last_readings[entry["reading"].miner_id] = entry
+        _high_water_mark = high_water_mark
+
+def invalidate():
+    """Drop the cache so it is reloaded before the next poll cycle."""
+    global _warmed, _high_water_mark
+    with _lock:
+        _last_readings.clear()
+        _warmed = False
+        _high_water_mark = None
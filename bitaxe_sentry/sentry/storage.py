@@ -0,0 +1,524 @@
+"""
+Where readings live.
+
+With STORAGE_LAYOUT "single" every reading goes to the reading table. With
+"daily" each UTC day's readings go to their own table, reading_day_YYYYMMDD,
+with the same columns and indexes, so retention can drop a whole day at once
+and the day being written stays small enough to sit in the page cache.
+
+With "compact" readings go to reading_compact: a WITHOUT ROWID table keyed by
+(miner_id, epoch) that stores the time as integer seconds and drops the
+surrogate id and the best_diff string, so each row and the primary key index
+are a good deal smaller. best_diff is rebuilt from best_diff_value on read, and
+a second reading from the same miner in the same second is dropped, so only
+the first is stored (and counted in miner_latest and the rollups).
+
+Reads always cover every table that exists, so the layout can be switched at
+any time: rows already written stay where they are and age out through the
+cleaner as usual, or can be moved over with:
+
+    python -m bitaxe_sentry.sentry.storage migrate
+"""
+import argparse
+import calendar
+import datetime
+import logging
+import re
+import time
+from sqlalchemy import Table, Column, Integer, Float, String, DateTime, Index, MetaData, select, insert, delete, func, text, tuple_
+from .db import Miner, Reading
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = "reading_day_"
+_PARTITION_NAME = re.compile(r"^reading_day_(\d{8})$")
+
+_metadata = MetaData()
+_partitions = {}  # name -> Table
+
+COMPACT_TABLE = Table(
+    "reading_compact", _metadata,
+    Column("miner_id", Integer, primary_key=True),
+    Column("epoch", Integer, primary_key=True),  # Seconds since 1970-01-01 UTC
+    Column("hash_rate", Float, nullable=False),
+    Column("temperature", Float, nullable=False),
+    Column("best_diff_value", Integer, nullable=True),
+    Column("voltage", Float, nullable=False),
+    Column("error_percentage", Float, nullable=False),
+    # For time range queries across all miners and the retention cleanup
+    Index("ix_reading_compact_epoch", "epoch"),
+    sqlite_with_rowid=False,
+)
+
+# Readings moved per transaction by migrate()
+MIGRATE_BATCH_SIZE = 5000
+
+def partition_name(day):
+    """Get the name of the table holding a day's readings."""
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+def partition_table(name):
+    """
+    Get the Table object for a day table (whether or not it exists yet).
+
+    Args:
+        name: Table name from partition_name()
+
+    Returns:
+        Table: Same columns as reading, with its own copies of the indexes
+    """
+    table = _partitions.get(name)
+    if table is None:
+        table = Table(
+            name, _metadata,
+            Column("id", Integer, primary_key=True),
+            Column("miner_id", Integer, nullable=False),
+            Column("timestamp", DateTime, nullable=False),
+            Column("hash_rate", Float, nullable=False),
+            Column("temperature", Float, nullable=False),
+            Column("best_diff", String, nullable=False),
+            Column("best_diff_value", Integer, nullable=True),
+            Column("voltage", Float, nullable=False),
+            Column("error_percentage", Float, nullable=False),
+            Index(f"ix_{name}_miner_id_timestamp", "miner_id", "timestamp"),
+            Index(f"ix_{name}_timestamp", "timestamp"),
+        )
+        _partitions[name] = table
+    return table
+
+def is_compact(table):
+    """Check whether a table is reading_compact."""
+    return table is COMPACT_TABLE
+
+def to_epoch(timestamp):
+    """Convert a naive UTC datetime to whole epoch seconds."""
+    return calendar.timegm(timestamp.utctimetuple())
+
+def _time_column(table):
+    return table.c.epoch if is_compact(table) else table.c.timestamp
+
+def _time_value(table, timestamp):
+    return to_epoch(timestamp) if is_compact(table) else timestamp
+
+def _table_names(session):
+    return session.exec(text(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND (name = 'reading_compact' OR name LIKE 'reading_day_%')"
+    )).scalars().all()
+
+def list_partitions(session):
+    """
+    Get the day tables that exist, oldest first.
+
+    Returns:
+        list: (date, table name) pairs
+    """
+    partitions = []
+    for name in _table_names(session):
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions.append((datetime.datetime.strptime(match.group(1), "%Y%m%d").date(), name))
+    return sorted(partitions)
+
+def tables_for(session, start=None, end=None):
+    """
+    Get the tables that can hold readings in a time range.
+
+    Args:
+        session: Open database session
+        start: Range start (unbounded if None)
+        end: Range end (unbounded if None)
+
+    Returns:
+        list: The reading table, reading_compact if it exists, then the overlapping day tables, oldest first
+    """
+    tables = [Reading.__table__]
+    if COMPACT_TABLE.name in _table_names(session):
+        tables.append(COMPACT_TABLE)
+    for day, name in list_partitions(session):
+        if start is not None and day < start.date():
+            continue
+        if end is not None and day > end.date():
+            continue
+        tables.append(partition_table(name))
+    return tables
+
+def write_table(session, timestamp):
+    """
+    Get the table a new reading with this timestamp is written to, creating it if needed.
+
+    Returns:
+        Table: The reading table, reading_compact, or the reading's day table, depending on STORAGE_LAYOUT
+    """
+    from .config import STORAGE_LAYOUT
+
+    if STORAGE_LAYOUT == "compact":
+        table = COMPACT_TABLE
+    elif STORAGE_LAYOUT == "daily":
+        table = partition_table(partition_name(timestamp.date()))
+    else:
+        return Reading.__table__
+
+    # Checked every time rather than cached: the CREATE is part of the caller's
+    # transaction and disappears if that rolls back
+    table.create(session.connection(), checkfirst=True)
+    return table
+
+def _compact_row(row):
+    return {
+        "miner_id": row["miner_id"],
+        "epoch": to_epoch(row["timestamp"]),
+        "hash_rate": row["hash_rate"],
+        "temperature": row["temperature"],
+        "best_diff_value": row["best_diff_value"],
+        "voltage": row["voltage"],
+        "error_percentage": row["error_percentage"],
+    }
+
+def insert_rows(session, rows):
+    """
+    Insert reading rows, routing each to its table.
+
+    Args:
+        session: Open database session (the caller commits)
+        rows: Column dicts without an id
+
+    Returns:
+        list: The rows that were stored. In reading_compact a row whose miner
+        already has a reading in the same second is dropped, so callers only
+        fold the returned rows into miner_latest and the rollups.
+    """
+    tables = {}  # day -> Table
+    by_table = {}
+    for row in rows:
+        day = row["timestamp"].date()
+        if day not in tables:
+            tables[day] = write_table(session, row["timestamp"])
+        by_table.setdefault(tables[day], []).append(row)
+    stored = []
+    for table, table_rows in by_table.items():
+        if is_compact(table):
+            stored.extend(_insert_compact(session, table, table_rows))
+        else:
+            session.exec(insert(table), params=table_rows)
+            stored.extend(table_rows)
+    return stored
+
+def _insert_compact(session, table, rows):
+    """Insert into reading_compact, keeping the first reading per miner and second; returns the rows stored."""
+    params = [_compact_row(row) for row in rows]
+    statement = insert(table).prefix_with("OR IGNORE")
+    with session.begin_nested() as savepoint:
+        if session.exec(statement, params=params).rowcount == len(rows):
+            return rows
+        # Some were dropped: redo the batch with RETURNING (slower) to find out which
+        savepoint.rollback()
+
+    inserted = set(session.exec(statement.returning(table.c.miner_id, table.c.epoch), params=params).tuples())
+    stored = []
+    for row in rows:
+        key = (row["miner_id"], to_epoch(row["timestamp"]))
+        # A key is returned once, so a later row in the batch with the same key was the one dropped
+        if key in inserted:
+            inserted.discard(key)
+            stored.append(row)
+    return stored
+
+def select_readings(table, start=None, end=None, miner_id=None):
+    """
+    Build a query for one table's readings in a time range, oldest first.
+
+    Returns:
+        Select: The statement
+    """
+    time_column = _time_column(table)
+    query = select(table)
+    if start is not None:
+        query = query.where(time_column > _time_value(table, start))
+    if end is not None:
+        query = query.where(time_column <= _time_value(table, end))
+    if miner_id is not None:
+        query = query.where(table.c.miner_id == miner_id)
+    return query.order_by(time_column)
+
+def select_before(table, cutoff, since=None):
+    """
+    Build a query for one table's readings before the cutoff (and at or after since), oldest first.
+
+    Returns:
+        Select: The statement
+    """
+    time_column = _time_column(table)
+    query = select(table).where(time_column < _time_value(table, cutoff))
+    if since is not None:
+        query = query.where(time_column >= _time_value(table, since))
+    return query.order_by(time_column)
+
+def select_newest(table, miner_id=None):
+    """
+    Build a query for each miner's newest reading in one table.
+
+    Returns:
+        Select: The statement
+    """
+    time_column = _time_column(table)
+    # One max() per miner, each a single seek on the (miner_id, time) index,
+    # instead of a GROUP BY that reads every row
+    newest_time = select(func.max(time_column)).where(table.c.miner_id == Miner.id).scalar_subquery()
+    newest = select(Miner.id.label("miner_id"), newest_time.label("newest"))
+    if miner_id is not None:
+        newest = newest.where(Miner.id == miner_id)
+    newest = newest.subquery()
+    return select(table).join(
+        newest,
+        (table.c.miner_id == newest.c.miner_id) & (time_column == newest.c.newest),
+    )
+
+def to_row(row):
+    """
+    Convert a result row from any reading table to a dict of Reading columns.
+
+    Rows from reading_compact get their timestamp back from the epoch, no id,
+    and best_diff rebuilt from best_diff_value.
+    """
+    mapping = row._mapping
+    if "epoch" not in mapping:
+        return {column: mapping[column] for column in Reading.__table__.columns.keys()}
+    best_diff_value = mapping["best_diff_value"]
+    return {
+        "id": None,
+        "miner_id": mapping["miner_id"],
+        "timestamp": datetime.datetime.utcfromtimestamp(mapping["epoch"]),
+        "hash_rate": mapping["hash_rate"],
+        "temperature": mapping["temperature"],
+        "best_diff": str(best_diff_value) if best_diff_value is not None else "0",
+        "best_diff_value": best_diff_value,
+        "voltage": mapping["voltage"],
+        "error_percentage": mapping["error_percentage"],
+    }
+
+def _to_reading(row):
+    return Reading(**to_row(row))
+
+def fetch_readings(session, start=None, end=None, miner_id=None):
+    """
+    Load readings in a time range from every table that can hold them.
+
+    Args:
+        session: Open database session
+        start: Only readings after this time
+        end: Only readings up to this time
+        miner_id: Only this miner (all miners if None)
+
+    Returns:
+        list: Detached Reading objects, oldest first
+    """
+    readings = []
+    for table in tables_for(session, start, end):
+        readings.extend(_to_reading(row) for row in session.exec(select_readings(table, start, end, miner_id)))
+    readings.sort(key=lambda reading: reading.timestamp)
+    return readings
+
+def newest_readings(session, miner_id=None):
+    """
+    Find each miner's newest stored reading across all tables.
+
+    Returns:
+        list: Detached Reading objects, one per miner
+    """
+    newest = {}
+    for table in tables_for(session):
+        for row in session.exec(select_newest(table, miner_id)):
+            reading = _to_reading(row)
+            current = newest.get(reading.miner_id)
+            if current is None or reading.timestamp >= current.timestamp:
+                newest[reading.miner_id] = reading
+    return list(newest.values())
+
+def epoch_seconds(column):
+    """SQL expression for a DATETIME column as (fractional) epoch seconds."""
+    return (func.julianday(column) - 2440587.5) * 86400.0
+
+def select_series(table, metric, start=None, end=None, miner_id=None):
+    """
+    Build a query for one metric of one table's readings in a time range.
+
+    Only (miner_id, epoch seconds, value) comes back, with a missing value as
+    0.0, so charting a long range doesn't build a Reading object per row.
+
+    Returns:
+        Select: The statement
+    """
+    time_column = _time_column(table)
+    epoch = time_column if is_compact(table) else epoch_seconds(time_column)
+    query = select(table.c.miner_id, epoch, func.coalesce(table.c[metric], 0.0))
+    if start is not None:
+        query = query.where(time_column > _time_value(table, start))
+    if end is not None:
+        query = query.where(time_column <= _time_value(table, end))
+    if miner_id is not None:
+        query = query.where(table.c.miner_id == miner_id)
+    return query
+
+def fetch_series(session, metric, start=None, end=None, miner_id=None):
+    """
+    Load one metric's raw readings in a time range from every table that can hold them.
+
+    Args:
+        session: Open database session
+        metric: Reading column, e.g. "hash_rate"
+        start: Only readings after this time
+        end: Only readings up to this time
+        miner_id: Only this miner (all miners if None)
+
+    Returns:
+        dict: miner_id -> list of (epoch seconds, value), not sorted
+    """
+    series = {}
+    for table in tables_for(session, start, end):
+        for row_miner_id, epoch, value in session.exec(select_series(table, metric, start, end, miner_id)):
+            series.setdefault(row_miner_id, []).append((epoch, value))
+    return series
+
+def count_readings(session):
+    """Count stored readings across all tables."""
+    return sum(session.exec(select(func.count()).select_from(table)).scalar_one() for table in tables_for(session))
+
+def count_rows(session, name):
+    """Count the readings in one day table."""
+    return session.exec(select(func.count()).select_from(partition_table(name))).scalar_one()
+
+def high_water_mark(session):
+    """
+    Get a value that changes whenever readings are added.
+
+    Returns:
+        tuple: Highest id in the reading table, the newest day table with its
+        highest id, and the newest epoch in reading_compact
+    """
+    names = _table_names(session)
+    partitions = list_partitions(session)
+    reading_id = session.exec(select(func.max(Reading.id))).scalar()
+    compact_epoch = session.exec(select(func.max(COMPACT_TABLE.c.epoch))).scalar() if COMPACT_TABLE.name in names else None
+    if not partitions:
+        return (reading_id, None, None, compact_epoch)
+    name = partitions[-1][1]
+    table = partition_table(name)
+    return (reading_id, name, session.exec(select(func.max(table.c.id))).scalar(), compact_epoch)
+
+def delete_miner_readings(session, miner_id):
+    """
+    Delete all of a miner's readings (the caller commits).
+
+    Returns:
+        int: Rows deleted
+    """
+    return sum(
+        session.exec(delete(table).where(table.c.miner_id == miner_id)).rowcount
+        for table in tables_for(session)
+    )
+
+def _key(table):
+    return tuple_(table.c.miner_id, table.c.epoch) if is_compact(table) else table.c.id
+
+def delete_before(table, cutoff, limit):
+    """
+    Build a statement deleting up to limit of a table's oldest readings before the cutoff.
+
+    Returns:
+        Delete: The statement
+    """
+    time_column = _time_column(table)
+    keys = (table.c.miner_id, table.c.epoch) if is_compact(table) else (table.c.id,)
+    oldest = select(*keys).where(time_column < _time_value(table, cutoff)).order_by(time_column).limit(limit)
+    return delete(table).where(_key(table).in_(oldest))
+
+def expired_partitions(session, cutoff):
+    """
+    Get the day tables whose whole day is before the cutoff.
+
+    Returns:
+        list: Table names, oldest first
+    """
+    return [name for day, name in list_partitions(session) if day < cutoff.date()]
+
+def drop_partition(session, name):
+    """
+    Drop a day table and everything in it (the caller commits).
+
+    Args:
+        session: Open database session
+        name: Table name from expired_partitions()
+    """
+    partition_table(name).drop(session.connection(), checkfirst=True)
+    logger.info(f"Dropped reading partition {name}")
+
+def _in_layout(table, layout):
+    if layout == "compact":
+        return is_compact(table)
+    if layout == "daily":
+        return table.name.startswith(PARTITION_PREFIX)
+    return table is Reading.__table__
+
+def migrate(batch_size=MIGRATE_BATCH_SIZE, pause_seconds=0.05):
+    """
+    Move readings stored under other layouts into the current STORAGE_LAYOUT.
+
+    Oldest readings first, a batch at a time: each batch is written to its new
+    table and deleted from its old one in the same transaction, so the move can
+    be stopped and resumed, and can run while the sentry service is polling.
+
+    Args:
+        batch_size: Readings moved per transaction
+        pause_seconds: Pause between batches so other writers can get the lock
+
+    Returns:
+        dict: {"moved": readings moved, "seconds": time taken}
+    """
+    from sqlmodel import Session
+    from .config import STORAGE_LAYOUT
+    from .db import engine
+
+    start = time.monotonic()
+    moved = 0
+    with Session(engine) as session:
+        sources = [table for table in tables_for(session) if not _in_layout(table, STORAGE_LAYOUT)]
+
+    for table in sources:
+        while True:
+            with Session(engine) as session:
+                rows = session.exec(select_readings(table).limit(batch_size)).all()
+                if not rows:
+                    break
+                insert_rows(session, [{column: value for column, value in to_row(row).items() if column != "id"} for row in rows])
+                keys = [(row.miner_id, row.epoch) for row in rows] if is_compact(table) else [row.id for row in rows]
+                session.exec(delete(table).where(_key(table).in_(keys)))
+                session.commit()
+            moved += len(rows)
+            logger.info(f"Moved {moved} readings to the {STORAGE_LAYOUT} layout")
+            time.sleep(pause_seconds)
+
+        if table.name.startswith(PARTITION_PREFIX):
+            # Emptied day tables aren't needed any more
+            with Session(engine) as session:
+                drop_partition(session, table.name)
+                session.commit()
+
+    return {"moved": moved, "seconds": round(time.monotonic() - start, 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage where readings are stored")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="Move readings stored under other layouts into the current STORAGE_LAYOUT")
+    migrate_parser.add_argument("--batch-size", type=int, default=MIGRATE_BATCH_SIZE, help="Readings moved per transaction")
+    args = parser.parse_args()
+
+    from .db import init_db
+    from .config import STORAGE_LAYOUT
+    init_db()
+
+    if args.command == "migrate":
+        result = migrate(args.batch_size)
+        print(f"Moved {result['moved']} readings to the {STORAGE_LAYOUT} layout in {result['seconds']}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+import json
+import logging
+import threading
+import time
+import requests
+from sqlmodel import Session
+from .db import engine
+from .ingest import ingest_readings
+from .poller import build_reading, check_alerts
+from . import health, registry, state
+
+logger = logging.getLogger(__name__)
+
+# Responses with these content types are read as a stream of JSON samples,
+# one per line (NDJSON) or one per "data:" line (server-sent events)
+STREAM_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl", "application/json", "text/event-stream")
+
+# Status codes that mean the firmware has no stream endpoint
+UNSUPPORTED_STATUS_CODES = (404, 405, 501)
+
+# Wait between reconnect attempts after a stream drops, doubling up to the max
+RECONNECT_MIN_SECONDS = 5
+RECONNECT_MAX_SECONDS = 60
+
+# endpoint -> {"thread", "stop": Event, "response", "status", "window", "threshold_alert_at"}
+# status: "connecting" | "streaming" | "disconnected" | "unsupported"
+_streams = {}
+_lock = threading.Lock()
+_stop = threading.Event()
+_thread = None
+
+def _new_window():
+    return {
+        "samples": 0,
+        "hash_rate_sum": 0.0,
+        "temp_max": None,
+        "voltage_min": None,
+        "error_sum": 0.0,
+        "best_diff": None,
+        "last_sample_at": None,
+    }
+
+def add_sample(window, sample):
+    """
+    Fold one streamed sample into a decimation window.
+
+    Args:
+        window: Window to update in place
+        sample: Decoded sample, in the same shape as /api/system/info
+
+    Returns:
+        bool: False if the sample was ignored because it lacks a usable hashRate or temp
+    """
+    if not isinstance(sample, dict) or "hashRate" not in sample or "temp" not in sample:
+        return False
+
+    try:
+        hash_rate = float(sample["hashRate"])
+        temperature = float(sample["temp"])
+        voltage = float(sample.get("voltage") or 0.0)
+        error_percentage = float(sample.get("errorPercentage", 0.0))
+    except (TypeError, ValueError):
+        return False
+
+    window["samples"] += 1
+    window["hash_rate_sum"] += hash_rate
+    # Keep the extremes so short spikes and sags survive decimation
+    window["temp_max"] = temperature if window["temp_max"] is None else max(window["temp_max"], temperature)
+    if voltage:
+        window["voltage_min"] = voltage if window["voltage_min"] is None else min(window["voltage_min"], voltage)
+    window["error_sum"] += error_percentage
+    if sample.get("bestDiff") is not None:
+        window["best_diff"] = sample["bestDiff"]
+    window["last_sample_at"] = time.monotonic()
+    return True
+
+def decimate(window):
+    """
+    Collapse a window of samples into one system info payload.
+
+    Hash rate and error percentage are averaged, temperature is the maximum,
+    voltage the minimum and best diff the latest value seen.
+
+    Args:
+        window: Window with at least one sample
+
+    Returns:
+        dict: Payload in the shape of /api/system/info, ready for poller.build_reading
+    """
+    samples = window["samples"]
+    return {
+        "hashRate": window["hash_rate_sum"] / samples,
+        "temp": window["temp_max"],
+        "voltage": window["voltage_min"] or 0.0,
+        "errorPercentage": window["error_sum"] / samples,
+        "bestDiff": window["best_diff"] if window["best_diff"] is not None else "0",
+    }
+
+def _is_stream(response):
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    return content_type in STREAM_CONTENT_TYPES
+
+def _samples(response):
+    """Yield decoded samples from an NDJSON or server-sent events response."""
+    received = False
+    for raw_line in response.iter_lines():
+        line = raw_line.decode("utf-8", errors="replace").strip()
+        if not line:
+            continue
+        if line.startswith("data:"):
+            line = line[5:].strip()
+        elif line.startswith((":", "event:", "id:", "retry:")):
+            continue
+        try:
+            sample = json.loads(line)
+        except ValueError:
+            if not received:
+                # Whatever is answering on this path isn't a sample stream
+                raise
+            logger.debug(f"Skipping malformed stream line: {line[:80]}")
+            continue
+        received = True
+        yield sample
+
+def _set_status(entry, endpoint_url, status):
+    with _lock:
+        previous = entry["status"]
+        entry["status"] = status
+    if status != previous and status in ("streaming", "disconnected"):
+        logger.info(f"Stream from {endpoint_url} is {status}")
+
+def _stream_miner(endpoint_url, entry):
+    """Hold a streaming connection to one miner, reconnecting until stopped."""
+    reconnect_wait = RECONNECT_MIN_SECONDS
+    while not entry["stop"].is_set():
+        from .config import STREAM_PATH, STREAM_RESOLUTION_SECONDS, STREAM_RETRY_SECONDS
+
+        # One connection per stream, kept out of the shared polling pools
+        session = requests.Session()
+        read_timeout = max(30, STREAM_RESOLUTION_SECONDS * 3)
+        try:
+            response = session.get(f"{endpoint_url}{STREAM_PATH}", stream=True, timeout=(health.NORMAL_TIMEOUT[0], read_timeout))
+            with _lock:
+                entry["response"] = response
+            with response:
+                if response.status_code in UNSUPPORTED_STATUS_CODES or (response.ok and not _is_stream(response)):
+                    raise ValueError(f"HTTP {response.status_code} {response.headers.get('Content-Type', '')}")
+                response.raise_for_status()
+
+                for sample in _samples(response):
+                    if entry["stop"].is_set():
+                        break
+                    with _lock:
+                        accepted = add_sample(entry["window"], sample)
+                    if accepted and entry["status"] != "streaming":
+                        _set_status(entry, endpoint_url, "streaming")
+                        reconnect_wait = RECONNECT_MIN_SECONDS
+        except ValueError as e:
+            _set_status(entry, endpoint_url, "unsupported")
+            logger.info(f"Miner at {endpoint_url} doesn't support streaming ({e}), polling it instead; checking again in {STREAM_RETRY_SECONDS}s")
+            entry["stop"].wait(STREAM_RETRY_SECONDS)
+            continue
+        except requests.exceptions.RequestException as e:
+            if not entry["stop"].is_set():
+                logger.info(f"Stream from {endpoint_url} dropped: {e}")
+        except Exception as e:
+            # Closing the response from another thread to stop the stream lands here too
+            if not entry["stop"].is_set():
+                logger.exception(f"Error reading stream from {endpoint_url}: {e}")
+        finally:
+            with _lock:
+                entry["response"] = None
+            session.close()
+
+        if entry["stop"].is_set():
+            break
+        _set_status(entry, endpoint_url, "disconnected")
+        entry["stop"].wait(reconnect_wait)
+        reconnect_wait = min(reconnect_wait * 2, RECONNECT_MAX_SECONDS)
+
+def _start_stream(endpoint_url):
+    entry = {
+        "thread": None,
+        "stop": threading.Event(),
+        "response": None,
+        "status": "connecting",
+        "window": _new_window(),
+        "threshold_alert_at": None,
+    }
+    entry["thread"] = threading.Thread(target=_stream_miner, args=(endpoint_url, entry), name=f"stream-{endpoint_url}", daemon=True)
+    _streams[endpoint_url] = entry
+    entry["thread"].start()
+
+def _close(entry):
+    entry["stop"].set()
+    response = entry["response"]
+    if response is not None:
+        # Unblock the reader thread instead of waiting for its read timeout
+        try:
+            response.close()
+        except Exception:
+            pass
+
+def _stop_stream(endpoint_url):
+    _close(_streams.pop(endpoint_url))
+
+def sync():
+    """Open streams for configured miners and close streams for removed ones (or all of them in poll mode)."""
+    from .config import ENDPOINTS, INGEST_MODE
+
+    wanted = set(ENDPOINTS) if INGEST_MODE == "stream" else set()
+    with _lock:
+        for endpoint_url in [ep for ep in _streams if ep not in wanted]:
+            _stop_stream(endpoint_url)
+        new_endpoints = [ep for ep in ENDPOINTS if ep in wanted and ep not in _streams]
+        for endpoint_url in new_endpoints:
+            _start_stream(endpoint_url)
+    if new_endpoints:
+        logger.info(f"Opening streams to {len(new_endpoints)} miners")
+
+def is_streaming(endpoint_url):
+    """
+    Check whether a miner's readings currently come from its stream.
+
+    Returns:
+        bool: True while the stream is connected and delivering samples, so the miner needn't be polled
+    """
+    with _lock:
+        entry = _streams.get(endpoint_url)
+        return entry is not None and entry["status"] == "streaming"
+
+def flush():
+    """
+    Store one decimated reading per streaming miner and send alerts.
+
+    All miners' windows are written in a single transaction. Temperature and
+    voltage alerts are sent at most once per ALERT_POLL_INTERVAL_SECONDS per
+    miner, the same pace as an alerting miner in poll mode.
+
+    Returns:
+        dict: endpoint -> {"status": "ok" | "alert", "reading": Reading}
+    """
+    from .config import ALERT_POLL_INTERVAL_SECONDS
+
+    with _lock:
+        payloads = {}
+        for endpoint_url, entry in _streams.items():
+            if entry["window"]["samples"]:
+                payloads[endpoint_url] = (decimate(entry["window"]), entry["window"]["samples"])
+                entry["window"] = _new_window()
+    if not payloads:
+        return {}
+
+    # (endpoint, miner, reading, previous reading state) for each streaming miner
+    pending = []
+    with Session(engine, expire_on_commit=False) as session:
+        if registry.ensure_current(session):
+            # A deleted miner's id can be reused, so its cached last reading must go too
+            state.invalidate()
+        state.ensure_current(session)
+        for endpoint_url, (payload, samples) in payloads.items():
+            try:
+                miner = registry.get_or_create(session, endpoint_url)
+                pending.append((endpoint_url, miner, build_reading(miner, payload), state.get_last(miner.id)))
+                logger.debug(f"Decimated {samples} samples from {endpoint_url}")
+            except Exception as e:
+                logger.exception(f"Error processing stream from {endpoint_url}: {e}")
+        stored = ingest_readings(session, [reading for _, _, reading, _ in pending])
+
+    stored_ids = {id(reading) for reading in stored}
+    outcomes = {}
+    now = time.monotonic()
+    for endpoint_url, miner, reading, prev_state in pending:
+        if id(reading) not in stored_ids:
+            continue
+        health.record_success(endpoint_url)
+        with _lock:
+            entry = _streams.get(endpoint_url)
+            last_alert_at = entry["threshold_alert_at"] if entry else None
+        send_threshold_alerts = last_alert_at is None or now - last_alert_at >= ALERT_POLL_INTERVAL_SECONDS
+        try:
+            alerting = check_alerts(miner, reading, prev_state, send_threshold_alerts)
+        except Exception as e:
+            logger.exception(f"Error sending alerts for {miner.name}: {e}")
+            alerting = False
+        if entry is not None and alerting and send_threshold_alerts:
+            with _lock:
+                entry["threshold_alert_at"] = now
+        outcomes[endpoint_url] = {"status": "alert" if alerting else "ok", "reading": reading}
+    return outcomes
+
+def get_status():
+    """
+    Get the state of every open stream.
+
+    Published by the sentry service for the web UI's /api/status.
+
+    Returns:
+        dict: endpoint -> {"status": str, "pending_samples": int, "last_sample_age": seconds or None}
+    """
+    now = time.monotonic()
+    with _lock:
+        return {
+            endpoint_url: {
+                "status": entry["status"],
+                "pending_samples": entry["window"]["samples"],
+                "last_sample_age": round(now - entry["window"]["last_sample_at"], 1) if entry["window"]["last_sample_at"] else None,
+            }
+            for endpoint_url, entry in _streams.items()
+        }
+
+def _run():
+    while not _stop.is_set():
+        from .config import STREAM_RESOLUTION_SECONDS
+        try:
+            sync()
+            flush()
+        except Exception as e:
+            logger.exception(f"Error in stream ingestion: {e}")
+        _stop.wait(STREAM_RESOLUTION_SECONDS)
+
+def start():
+    """Start streaming ingestion in a background thread. Does nothing until INGEST_MODE is "stream"."""
+    global _thread
+    if _thread and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="stream-ingest", daemon=True)
+    _thread.start()
+
+def stop():
+    """Close every stream and store what they had collected."""
+    _stop.set()
+    if _thread:
+        _thread.join(timeout=30)
+    with _lock:
+        for entry in _streams.values():
+            _close(entry)
+    try:
+        flush()
+    except Exception as e:
+        logger.exception(f"Error storing final stream samples: {e}")
+    with _lock:
+        _streams.clear()
@@ -0,0 +1,144 @@
+import logging
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Number of per-host pools kept open. Pools are cheap, and evicting one closes
+# its keep-alive connections, so this comfortably exceeds any realistic fleet.
+MAX_HOST_POOLS = 1024
+
+_session = None
+_session_pool_size = None
+_lock = threading.Lock()
+
+# Per-host request counters, keyed by "host:port"
+_host_stats = {}
+
+def get_session():
+    """
+    Get the shared HTTP session, creating it on first use.
+
+    The session keeps one connection pool per host with keep-alive enabled.
+    Each pool holds at most HTTP_POOL_MAXSIZE connections and blocks instead of
+    opening extra ones, so a miner never sees more concurrent connections than
+    that. The session is rebuilt if the configured pool size changes.
+
+    Returns:
+        requests.Session: The shared session
+    """
+    global _session, _session_pool_size
+    from .config import HTTP_POOL_MAXSIZE
+
+    with _lock:
+        if _session is not None and _session_pool_size == HTTP_POOL_MAXSIZE:
+            return _session
+
+        if _session is not None:
+            logger.info(f"HTTP pool size changed from {_session_pool_size} to {HTTP_POOL_MAXSIZE}, rebuilding session")
+            _session.close()
+
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=MAX_HOST_POOLS,
+            pool_maxsize=HTTP_POOL_MAXSIZE,
+            pool_block=True,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        _session = session
+        _session_pool_size = HTTP_POOL_MAXSIZE
+        return _session
+
+def close_session():
+    """Close the shared session and all of its pooled connections."""
+    global _session, _session_pool_size
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _session_pool_size = None
+
+def _host_key(url):
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    return f"{parts.hostname}:{port}"
+
+def _record(url, error=False):
+    key = _host_key(url)
+    with _lock:
+        stats = _host_stats.setdefault(key, {"requests": 0, "errors": 0})
+        stats["requests"] += 1
+        if error:
+            stats["errors"] += 1
+
+def request(method, url, **kwargs):
+    """
+    Send a request through the shared pooled session.
+
+    Args:
+        method: HTTP method ("GET", "POST", ...)
+        url: Full request URL
+        **kwargs: Passed through to requests (timeout, json, ...)
+
+    Returns:
+        requests.Response: The response
+    """
+    try:
+        response = get_session().request(method, url, **kwargs)
+    except requests.exceptions.RequestException:
+        _record(url, error=True)
+        raise
+    _record(url, error=response.status_code >= 400)
+    return response
+
+def get(url, **kwargs):
+    """Send a GET request through the shared pooled session."""
+    return request("GET", url, **kwargs)
+
+def post(url, **kwargs):
+    """Send a POST request through the shared pooled session."""
+    return request("POST", url, **kwargs)
+
+def get_pool_stats():
+    """
+    Get connection pool health stats for debugging.
+
+    Returns:
+        dict: Pool settings plus one entry per host with request/error counts,
+        connections opened, idle connections and the connection reuse ratio
+    """
+    with _lock:
+        session = _session
+        pool_size = _session_pool_size
+        hosts = {key: dict(stats) for key, stats in _host_stats.items()}
+
+    if session is not None:
+        adapter = session.get_adapter("http://")
+        pools = adapter.poolmanager.pools
+        for pool_key in list(pools.keys()):
+            pool = pools.get(pool_key)
+            if pool is None:
+                continue
+            key = f"{pool.host}:{pool.port}"
+            # Idle connections sit in the pool queue; None entries are free slots
+            idle = sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool else 0
+            stats = hosts.setdefault(key, {"requests": 0, "errors": 0})
+            stats["connections_opened"] = stats.get("connections_opened", 0) + pool.num_connections
+            stats["idle_connections"] = stats.get("idle_connections", 0) + idle
+
+    for stats in hosts.values():
+        opened = stats.get("connections_opened", 0)
+        stats.setdefault("connections_opened", 0)
+        stats.setdefault("idle_connections", 0)
+        stats["reuse_ratio"] = round(1 - opened / stats["requests"], 3) if stats["requests"] else None
+
+    return {
+        "active": session is not None,
+        "pool_maxsize": pool_size,
+        "max_host_pools": MAX_HOST_POOLS,
+        "hosts": hosts,
+    }
@@ -2,6 +2,7 @@ from fastapi import FastAPI, Request, Depends, Query, HTTPException, Response, F
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, RedirectResponse
+from fastapi.concurrency import run_in_threadpool
 import pathlib
 import logging
 from sqlmodel import Session, select, func, delete
@@ -12,12 +13,13 @@ import subprocess
 from typing import Optional, Dict, Any, List
 import json
 from pydantic import BaseModel
-from .db import get_session, Miner, Reading
+from .db import get_session, get_read_session, get_read_pool_stats, warm_read_pool, Miner, MinerLatest, ReadingRollup
 from .config import ENDPOINTS, reload_config
 from .notifier import send_startup_notification, send_test_notification
 from .version import __version__
 from .settings_manager import load_settings, save_settings
 from .poller import poll_once
+from . import archive, coordinator, discovery, downsample, latest, registry, rollups, state, storage
 
 logger = logging.getLogger(__name__)
 
@@ -55,6 +57,12 @@ static_path = pathlib.Path(__file__).parent / "static"
 static_path.mkdir(exist_ok=True)  # Create directory if it doesn't exist
 app.mount("/static", StaticFiles(directory=str(static_path)), name="static")
 
+@app.on_event("startup")
+def open_read_pool():
+    # Open the page and API read connections before the first request needs them
+    opened = warm_read_pool()
+    logger.info(f"Opened {opened} read-only database connections")
+
 # Favicon routes
 @app.get("/favicon.ico", include_in_schema=False)
 async def favicon():
@@ -75,40 +83,30 @@ async def apple_touch_icon():
 
 # Stats for dashboard
 @app.get("/")
-def dashboard(request: Request, success: Optional[str] = None, error: Optional[str] = None, session: Session = Depends(get_session)):
-    # Get the latest reading for each miner
+def dashboard(request: Request, success: Optional[str] = None, error: Optional[str] = None, session: Session = Depends(get_read_session)):
+    # Get the latest reading for each miner in a single query
     latest_readings = []
-    miners = session.exec(select(Miner)).all()
     
     # Track the most recent reading timestamp
     most_recent_timestamp = None
-    
-    for miner in miners:
-        latest = session.exec(
-            select(Reading)
-            .where(Reading.miner_id == miner.id)
-            .order_by(Reading.timestamp.desc())
-            .limit(1)
-        ).first()
-        
-        if latest:
-            # Ensure voltage has a default value if it's None
-            if latest.voltage is None:
-                latest.voltage = 0.0
-            
-            # Ensure error_percentage has a default value if it's None
-            if not hasattr(latest, 'error_percentage') or latest.error_percentage is None:
-                latest.error_percentage = 0.0
-                
-            latest_readings.append({
-                "miner": miner,
-                "reading": latest,
-                "timestamp_ago": (datetime.datetime.utcnow() - latest.timestamp).total_seconds() // 60
-            })
+    now = datetime.datetime.utcnow()
+    
+    for miner, latest_reading in latest.fetch_all(session):
+        # Ensure voltage and error_percentage have a default value if they're None
+        if latest_reading.voltage is None:
+            latest_reading.voltage = 0.0
+        if latest_reading.error_percentage is None:
+            latest_reading.error_percentage = 0.0
             
-            # Update most recent timestamp if this reading is newer
-            if most_recent_timestamp is None or latest.timestamp > most_recent_timestamp:
-                most_recent_timestamp = latest.timestamp
+        latest_readings.append({
+            "miner": miner,
+            "reading": latest_reading,
+            "timestamp_ago": (now - latest_reading.timestamp).total_seconds() // 60
+        })
+        
+        # Update most recent timestamp if this reading is newer
+        if most_recent_timestamp is None or latest_reading.timestamp > most_recent_timestamp:
+            most_recent_timestamp = latest_reading.timestamp
     
     # Use the most recent reading timestamp if available, otherwise use current time
     last_updated = most_recent_timestamp.strftime("%Y-%m-%d %H:%M:%S") if most_recent_timestamp else "Never"
@@ -124,11 +122,15 @@ def dashboard(request: Request, success: Optional[str] = None, error: Optional[s
         })
     )
 
+# Points per series returned by /api/history by default, and at most
+DEFAULT_HISTORY_POINTS = 500
+MAX_HISTORY_POINTS = 5000
+
 @app.get("/history")
 def history(
     request: Request, 
     miner_id: Optional[str] = Query(None),
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ):
     from .settings_manager import load_settings
     
@@ -147,58 +149,16 @@ def history(
             logger.warning(f"Invalid miner_id parameter: {miner_id}")
             selected_miner = None
     
-    # Get historical data based on retention setting
-    query = select(Reading)
-    if selected_miner:
-        query = query.where(Reading.miner_id == selected_miner)
-    
-    # Use retention days setting to determine data cutoff
-    retention_hours = settings['RETENTION_DAYS'] * 24
-    cutoff = datetime.datetime.utcnow() - datetime.timedelta(hours=retention_hours)
-    query = query.where(Reading.timestamp > cutoff)
-    
-    # Order by timestamp
-    query = query.order_by(Reading.timestamp)
-    readings = session.exec(query).all()
-    
-    # Group readings by miner
-    readings_by_miner = {}
-    for reading in readings:
-        miner = next((m for m in miners if m.id == reading.miner_id), None)
-        if miner:
-            if miner.name not in readings_by_miner:
-                readings_by_miner[miner.name] = []
-            
-            # Ensure voltage has a default value if it's None
-            voltage = reading.voltage
-            if voltage is None:
-                voltage = 0.0
-            
-            # Ensure error_percentage has a default value if it's None
-            error_percentage = reading.error_percentage if hasattr(reading, 'error_percentage') else 0.0
-            if error_percentage is None:
-                error_percentage = 0.0
-                
-            readings_by_miner[miner.name].append({
-                "timestamp": reading.timestamp.strftime("%H:%M:%S"),
-                "full_timestamp": reading.timestamp.isoformat() + "Z",
-                "hash_rate": reading.hash_rate,
-                "temperature": reading.temperature,
-                "best_diff": format_large_number(reading.best_diff),
-                "voltage": voltage,
-                "error_percentage": error_percentage
-            })
-    
-    # Pre-slice the data for different time windows
-    # Create dynamic windows based on retention period
-    retention_hours = settings['RETENTION_DAYS'] * 24
-    logger.info(f"Retention period: {settings['RETENTION_DAYS']} days = {retention_hours} hours")
+    # Charts are served from the rollups, so the history can reach past the raw retention
+    history_days = max(settings['RETENTION_DAYS'], settings['ROLLUP_RETENTION_DAYS'])
+    retention_hours = history_days * 24
+    logger.info(f"History period: {history_days} days = {retention_hours} hours")
     windows = [1, 6]  # Always show 1h and 6h
     
     if retention_hours >= 24:
         windows.append(24)  # Add 24h if retention allows
     if retention_hours > 24:
-        # Add "all time" window (full retention period)
+        # Add "all time" window (full history period)
         if retention_hours not in windows:
             windows.append(retention_hours)
             logger.info(f"Added window: {retention_hours}h (all time)")
@@ -207,51 +167,22 @@ def history(
         if retention_hours not in windows and retention_hours > 6:
             windows.append(int(retention_hours))
     
-    windowed_data = {}
-    
-    # Find the latest timestamp across all miners
-    latest_timestamp = None
-    for miner_name, readings in readings_by_miner.items():
-        if readings:  # Make sure the miner has readings
-            # Sort readings by timestamp to ensure we get the latest one
-            sorted_readings = sorted(readings, key=lambda r: r["full_timestamp"], reverse=True)
-            miner_latest = datetime.datetime.fromisoformat(sorted_readings[0]["full_timestamp"])
-            if latest_timestamp is None or miner_latest > latest_timestamp:
-                latest_timestamp = miner_latest
-    
-    # If we don't have any readings, use current time
-    if latest_timestamp is None:
-        latest_timestamp = datetime.datetime.utcnow()
-    
-    logger.info(f"Using latest timestamp for windowing: {latest_timestamp}")
-    
-    for hours in windows:
-        window_cutoff = latest_timestamp - datetime.timedelta(hours=hours)
-        windowed_data[hours] = {}
-        
-        for miner_name, miner_readings in readings_by_miner.items():
-            windowed_data[hours][miner_name] = [
-                reading for reading in miner_readings
-                if datetime.datetime.fromisoformat(reading["full_timestamp"]) > window_cutoff
-            ]
-            
-            # Log the time range for debugging
-            if windowed_data[hours][miner_name]:
-                first = min(windowed_data[hours][miner_name], key=lambda r: r["full_timestamp"])
-                last = max(windowed_data[hours][miner_name], key=lambda r: r["full_timestamp"])
-                logger.info(f"Window {hours}h for {miner_name}: {first['timestamp']} to {last['timestamp']}")
-            else:
-                logger.info(f"Window {hours}h for {miner_name}: No data points")
+    # The charts fetch each window from /api/history when it's picked, so the
+    # page only needs to know whether there is anything to chart
+    latest_query = select(func.max(MinerLatest.timestamp))
+    if selected_miner:
+        latest_query = latest_query.where(MinerLatest.miner_id == selected_miner)
+    has_data = session.exec(latest_query).one() is not None
     
     return templates.TemplateResponse(
         "history.html", 
         get_template_context(request, {
             "miners": miners,
             "selected_miner": selected_miner,
-            "readings_by_miner": readings_by_miner,
-            "windowed_data": windowed_data,
+            "has_data": has_data,
             "settings": settings,
-            "windows": windows
+            "windows": windows,
+            "chart_points": DEFAULT_HISTORY_POINTS
         })
     )
 
@@ -269,7 +200,9 @@ def delete_miner(
         raise HTTPException(status_code=404, detail="Miner not found")
     
     # Delete all readings for this miner
-    session.exec(delete(Reading).where(Reading.miner_id == miner_id))
+    storage.delete_miner_readings(session, miner_id)
+    session.exec(delete(ReadingRollup).where(ReadingRollup.miner_id == miner_id))
+    session.exec(delete(MinerLatest).where(MinerLatest.miner_id == miner_id))
     
     # Delete the miner itself
     session.delete(miner)
@@ -277,6 +210,12 @@ def delete_miner(
     
     logger.info(f"Deleted miner ID {miner_id} ({miner.name}) and all associated readings")
     
+    # Drop cached miner lookups here; the sentry service notices the change to
+    # the miner table on its next cycle, SIGHUP just makes that immediate
+    registry.invalidate()
+    state.invalidate()
+    notify_sentry_service()
+    
     return {"success": True}
 
 class RenameRequest(BaseModel):
@@ -302,6 +241,11 @@ def rename_miner(miner_id: int, req: RenameRequest, session: Session = Depends(g
     session.commit()
 
     logger.info(f"Renamed miner ID {miner_id} from '{old_name}' to '{new_name}'")
+    
+    # Drop cached miner lookups here; the sentry service notices the change to
+    # the miner table on its next cycle, SIGHUP just makes that immediate
+    registry.invalidate()
+    notify_sentry_service()
     return {"success": True, "id": miner_id, "name": new_name}
 
 @app.get("/settings")
@@ -316,6 +260,7 @@ def settings_page(request: Request, success: Optional[str] = None, error: Option
     # Context for the template
     context = {
         "settings": current_settings,
+        "suggested_cidr": discovery.suggest_cidr() or "",
         "success_message": success,
         "error_message": error
     }
@@ -388,7 +333,9 @@ async def save_settings_handler(request: Request):
             # Only poll immediately if endpoints have changed
             poll_result = 0
             if endpoints_changed:
-                poll_result = poll_once()
+                # In a worker thread: the poll can wait on another process's cycle,
+                # which would otherwise stall every request on the event loop
+                poll_result = await run_in_threadpool(poll_once)
                 logger.info(f"Immediate poll completed, polled {poll_result} devices")
             
             # Provide appropriate feedback
@@ -432,6 +379,207 @@ def poll_now():
         logger.exception("Error triggering poll")
         return {"success": False, "error": str(e)}
 
+class DiscoverRequest(BaseModel):
+    cidr: Optional[str] = None
+    port: Optional[int] = None
+
+class AddEndpointsRequest(BaseModel):
+    endpoints: List[str]
+
+@app.post("/api/discover")
+def discover_miners(request: DiscoverRequest):
+    """Scan a network range for AxeOS miners and propose the ones not configured yet"""
+    cidr = request.cidr or discovery.suggest_cidr()
+    if not cidr:
+        return {"success": False, "error": "Enter a network range to scan, e.g. 192.168.1.0/24"}
+    try:
+        result = discovery.scan(cidr, port=request.port)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    except Exception as e:
+        logger.exception("Error scanning for miners")
+        return {"success": False, "error": str(e)}
+    return dict(result, success=True, proposed=discovery.propose(result["found"]))
+
+@app.post("/api/discover/add")
+def add_discovered_miners(request: AddEndpointsRequest):
+    """Add discovered endpoints to the settings and poll them right away"""
+    try:
+        added = discovery.add_endpoints(request.endpoints)
+        if added is None:
+            return {"success": False, "error": "Failed to save settings"}
+        if added:
+            reload_config()
+            notify_sentry_service()
+            poll_once()
+        return {"success": True, "added": added}
+    except Exception as e:
+        logger.exception("Error adding discovered miners")
+        return {"success": False, "error": str(e)}
+
+@app.get("/api/status")
+def fleet_status(session: Session = Depends(get_read_session)):
+    """Current state of every miner, from its latest reading, with its poll schedule, failure and stream state as last published by the sentry service"""
+    now = datetime.datetime.utcnow()
+    service_status = coordinator.get_service_status()
+    schedule = service_status.get("schedule", {})
+    failing = service_status.get("health", {})
+    streams = service_status.get("stream", {})
+    miners = []
+    for miner, latest_reading in latest.fetch_all(session):
+        miners.append({
+            "id": miner.id,
+            "name": miner.name,
+            "endpoint": miner.endpoint,
+            "timestamp": latest_reading.timestamp.isoformat() + "Z",
+            "age_seconds": round((now - latest_reading.timestamp).total_seconds()),
+            "hash_rate": latest_reading.hash_rate,
+            "temperature": latest_reading.temperature,
+            "voltage": latest_reading.voltage or 0.0,
+            "error_percentage": latest_reading.error_percentage or 0.0,
+            "best_diff": latest_reading.best_diff,
+            "best_diff_value": latest_reading.best_diff_value,
+            "schedule": schedule.get(miner.endpoint),
+            "health": failing.get(miner.endpoint),
+            "stream": streams.get(miner.endpoint),
+        })
+    return {"miners": miners, "service_updated_at": service_status.get("updated_at")}
+
+@app.get("/api/history")
+def history_series(
+    metric: str = "hash_rate",
+    miner_id: Optional[int] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    hours: float = 24,
+    points: int = DEFAULT_HISTORY_POINTS,
+    method: str = "lttb",
+    session: Session = Depends(get_read_session)
+):
+    """
+    One metric per miner over a time range, downsampled on the server.
+
+    start and end are ISO 8601 UTC times. end defaults to the newest reading
+    and start to `hours` before end. Each series has at most `points` points,
+    picked with Largest-Triangle-Three-Buckets ("lttb") or as every time
+    bucket's min and max ("minmax"). Short ranges are read from the raw
+    readings, longer ones from the coarsest rollup that still has enough
+    points, so the work and the payload don't grow with retention.
+    """
+    if metric not in rollups.METRICS:
+        raise HTTPException(status_code=400, detail=f"metric must be one of: {', '.join(rollups.METRICS)}")
+    if method not in downsample.METHODS:
+        raise HTTPException(status_code=400, detail=f"method must be one of: {', '.join(downsample.METHODS)}")
+    if not 2 <= points <= MAX_HISTORY_POINTS:
+        raise HTTPException(status_code=400, detail=f"points must be between 2 and {MAX_HISTORY_POINTS}")
+    if hours <= 0:
+        raise HTTPException(status_code=400, detail="hours must be positive")
+    try:
+        end_time = datetime.datetime.fromisoformat(end.rstrip("Z")) if end else None
+        start_time = datetime.datetime.fromisoformat(start.rstrip("Z")) if start else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start and end must be ISO 8601 times")
+
+    if end_time is None:
+        latest_query = select(func.max(MinerLatest.timestamp))
+        if miner_id is not None:
+            latest_query = latest_query.where(MinerLatest.miner_id == miner_id)
+        end_time = session.exec(latest_query).one() or datetime.datetime.utcnow()
+    if start_time is None:
+        start_time = end_time - datetime.timedelta(hours=hours)
+    if start_time >= end_time:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    resolution = rollups.series_resolution(start_time, end_time, points)
+    if resolution is None:
+        rows = storage.fetch_series(session, metric, start_time, end_time, miner_id)
+    else:
+        rows = rollups.fetch_envelope(session, resolution, metric, start_time, end_time, miner_id)
+
+    miner_names = dict(session.exec(select(Miner.id, Miner.name)).all())
+    series = []
+    for series_miner_id in sorted(rows):
+        if series_miner_id not in miner_names:
+            continue
+        timestamps, values = downsample.series(rows[series_miner_id], points, method)
+        series.append({
+            "miner_id": series_miner_id,
+            "name": miner_names[series_miner_id],
+            "timestamps": [round(t * 1000) for t in timestamps],  # epoch milliseconds
+            "values": values,
+        })
+
+    return {
+        "metric": metric,
+        "method": method,
+        "start": start_time.isoformat() + "Z",
+        "end": end_time.isoformat() + "Z",
+        "resolution": resolution,
+        "series": series,
+    }
+
+@app.get("/api/archive")
+def archive_status():
+    """Parquet archive of readings past retention: availability, coverage and size"""
+    return archive.get_status()
+
+# Largest number of archived readings returned by one request
+MAX_ARCHIVE_ROWS = 100000
+
+@app.get("/api/archive/readings")
+def archive_readings(
+    start: str,
+    end: Optional[str] = None,
+    miner_id: Optional[int] = None,
+    columns: Optional[str] = None
+):
+    """
+    Read archived readings between two ISO 8601 UTC times.
+
+    columns is a comma-separated list (default all); only those columns are
+    read from the archive files.
+    """
+    try:
+        start_time = datetime.datetime.fromisoformat(start.rstrip("Z"))
+        end_time = datetime.datetime.fromisoformat(end.rstrip("Z")) if end else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start and end must be ISO 8601 times")
+    
+    wanted = [c.strip() for c in columns.split(",") if c.strip()] if columns else None
+    unknown = [c for c in wanted or [] if c not in archive.COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}")
+    
+    try:
+        table = archive.read(start_time, end_time, miner_id, wanted)
+    except ImportError:
+        return {"success": False, "error": "Reading the archive needs the pyarrow package"}
+    
+    truncated = table.num_rows > MAX_ARCHIVE_ROWS
+    data = table.slice(0, MAX_ARCHIVE_ROWS).to_pydict()
+    data["timestamp"] = [t.isoformat() + "Z" for t in data["timestamp"]]
+    return {"success": True, "rows": min(table.num_rows, MAX_ARCHIVE_ROWS), "truncated": truncated, "data": data}
+
+@app.get("/api/poll-cycles")
+def poll_cycle_stats():
+    """Poll cycle stats for both processes: completed, coalesced and deadline-truncated cycles"""
+    return coordinator.get_stats()
+
+@app.get("/api/debug/transport")
+def transport_stats():
+    """Connection pool health stats for the sentry service's shared HTTP session, as last published"""
+    status = coordinator.get_service_status()
+    return {
+        "pid": status.get("pid"),
+        "updated_at": status.get("updated_at"),
+        **status.get("transport", {"active": False, "hosts": {}}),
+    }
+
+@app.get("/api/debug/db")
+def db_pool_stats():
+    """Read-only database connection pool stats for this process"""
+    return get_read_pool_stats()
+
 class MuteRequest(BaseModel):
     miner_id: int
     minutes: int
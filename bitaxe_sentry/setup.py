@@ -21,6 +21,7 @@ setup(
         "uvicorn",
         "python-dotenv",
         "jinja2",
+        "numpy",
     ],
     python_requires=">=3.7",
     entry_points={
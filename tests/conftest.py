@@ -0,0 +1,32 @@
+import os
+import pathlib
+import sys
+import tempfile
+
+# The database location is read when the package is imported, so point it at a
+# scratch directory before any test imports bitaxe_sentry
+_data_dir = pathlib.Path(tempfile.mkdtemp(prefix="bitaxe_sentry_test_"))
+os.environ["DB_DATA_DIR"] = str(_data_dir)
+os.environ["DB_PATH"] = str(_data_dir / "bitaxe_sentry.db")
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import pytest
+from sqlmodel import Session, delete
+from bitaxe_sentry.sentry.db import engine, init_db, Miner, MinerLatest, ReadingRollup
+from bitaxe_sentry.sentry import registry, state, storage
+
+init_db()
+
+@pytest.fixture
+def session():
+    """A session on an emptied database, with the in-process caches dropped."""
+    with Session(engine) as cleanup:
+        for table in storage.tables_for(cleanup):
+            cleanup.exec(delete(table))
+        for model in (MinerLatest, ReadingRollup, Miner):
+            cleanup.exec(delete(model))
+        cleanup.commit()
+    registry.invalidate()
+    state.invalidate()
+    with Session(engine) as session:
+        yield session
@@ -0,0 +1,86 @@
+import datetime
+import fcntl
+import json
+import threading
+import time
+import pytest
+from bitaxe_sentry.sentry import config, coordinator
+
+ENDPOINTS = ["http://10.0.0.1", "http://10.0.0.2"]
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(coordinator, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(coordinator, "LOCK_FILE", tmp_path / "poll_cycle.lock")
+    monkeypatch.setattr(coordinator, "STATUS_FILE", tmp_path / "poll_cycle_status.json")
+    monkeypatch.setattr(coordinator, "STATS_FILE", tmp_path / "poll_cycle_stats.json")
+    monkeypatch.setattr(coordinator, "_sweep", None)
+    return tmp_path
+
+def _runner(calls):
+    def run():
+        calls.append(1)
+        return {endpoint_url: {"status": "ok", "reading": None} for endpoint_url in ENDPOINTS}
+    return run
+
+def _hold_lock(seconds, status=None):
+    """Hold the cycle lock from another open file, as the other process would, optionally finishing a cycle."""
+    held = threading.Event()
+
+    def hold():
+        with open(coordinator.LOCK_FILE, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            held.set()
+            time.sleep(seconds)
+            if status is not None:
+                coordinator.STATUS_FILE.write_text(json.dumps(status()))
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    held.wait()
+    return thread
+
+def _finished_status(finished_at):
+    return {
+        "pid": 1,
+        "endpoints": ENDPOINTS,
+        "finished_at": finished_at.isoformat() + "Z",
+        "outcomes": {endpoint_url: "ok" for endpoint_url in ENDPOINTS},
+    }
+
+def test_scheduled_cycles_are_recorded_per_sweep(data_dir, monkeypatch):
+    calls = []
+    monkeypatch.setattr(config, "POLL_INTERVAL_SECONDS", 3600)
+    for _ in range(3):
+        coordinator.run_cycle(ENDPOINTS[:1], _runner(calls))
+    assert coordinator.get_stats()["recent"] == []
+
+    monkeypatch.setattr(config, "POLL_INTERVAL_SECONDS", 0)
+    coordinator.run_cycle(ENDPOINTS[:1], _runner(calls))
+
+    stats = coordinator.get_stats()
+    assert stats["cycles"] == 4
+    assert [(entry["trigger"], entry["cycles"]) for entry in stats["recent"]] == [("scheduled", 4)]
+
+def test_stale_status_is_not_reused(data_dir):
+    # A finished cycle covering the endpoints, but from before this trigger arrived
+    coordinator.STATUS_FILE.write_text(json.dumps(_finished_status(datetime.datetime.utcnow() - datetime.timedelta(minutes=5))))
+    holder = _hold_lock(0.3)
+
+    calls = []
+    outcomes = coordinator.run_cycle(ENDPOINTS, _runner(calls), trigger="manual")
+    holder.join()
+
+    assert calls == [1]
+    assert not any(outcome.get("coalesced") for outcome in outcomes.values())
+
+def test_cycle_finished_while_waiting_is_reused(data_dir):
+    holder = _hold_lock(0.3, lambda: _finished_status(datetime.datetime.utcnow()))
+
+    calls = []
+    outcomes = coordinator.run_cycle(ENDPOINTS, _runner(calls), trigger="manual")
+    holder.join()
+
+    assert calls == []
+    assert all(outcome["coalesced"] for outcome in outcomes.values())
@@ -0,0 +1,61 @@
+import datetime
+import io
+import json
+import pytest
+from sqlmodel import Session, select
+from bitaxe_sentry.sentry.db import engine, Miner
+from bitaxe_sentry.sentry import archive, cleaner, config, importer, storage
+
+def test_malformed_ndjson_line_is_skipped(session):
+    lines = [
+        '{"endpoint": "http://10.0.0.1", "timestamp": "2026-01-01T00:00:00Z", "hash_rate": 500, "temperature": 55}',
+        '{"endpoint": "http://10.0.0.1", "timestamp": ',
+        '{"endpoint": "http://10.0.0.1", "timestamp": "2026-01-01T00:01:00Z", "hash_rate": 510, "temperature": 56}',
+    ]
+
+    result = importer.import_readings(io.StringIO("\n".join(lines) + "\n"), "ndjson")
+
+    assert (result["imported"], result["skipped"]) == (2, 1)
+    with Session(engine) as check:
+        assert storage.count_readings(check) == 2
+        assert len(check.exec(select(Miner)).all()) == 1
+
+def _ndjson(*days_ago, now=None):
+    now = now or datetime.datetime.utcnow().replace(microsecond=0)
+    lines = [
+        json.dumps({"endpoint": "http://10.0.0.1", "timestamp": (now - datetime.timedelta(days=days)).isoformat(), "hash_rate": 500, "temperature": 55})
+        for days in days_ago
+    ]
+    return io.StringIO("\n".join(lines) + "\n")
+
+@pytest.mark.skipif(not archive.available(), reason="needs pyarrow")
+def test_import_after_archive_is_archived_before_cleanup(session, monkeypatch, tmp_path):
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", tmp_path / "archive")
+    monkeypatch.setattr(archive, "STATE_FILE", tmp_path / "archive" / "_state.json")
+    monkeypatch.setattr(cleaner, "reload_config", lambda: False)
+    monkeypatch.setattr(config, "ARCHIVE_FORMAT", "parquet")
+    monkeypatch.setattr(config, "RETENTION_DAYS", 30)
+
+    importer.import_readings(_ndjson(60), "ndjson")
+    assert cleaner.clean_old()["archived"] == 1
+
+    # Older than what the first cleanup archived through
+    importer.import_readings(_ndjson(50, 40), "ndjson")
+    assert archive.get_status()["backfill_since"] is not None
+
+    assert cleaner.clean_old()["archived"] == 2
+    with Session(engine) as check:
+        assert storage.count_readings(check) == 0
+    assert archive.read().num_rows == 3
+    assert archive.get_status()["backfill_since"] is None
+
+def test_compact_duplicate_is_counted_not_imported(session, monkeypatch):
+    monkeypatch.setattr(config, "STORAGE_LAYOUT", "compact")
+    now = datetime.datetime.utcnow().replace(microsecond=0)
+
+    importer.import_readings(_ndjson(1, now=now), "ndjson")
+    result = importer.import_readings(_ndjson(1, 2, now=now), "ndjson")
+
+    assert (result["imported"], result["duplicates"]) == (1, 1)
+    with Session(engine) as check:
+        assert storage.count_readings(check) == 2
@@ -0,0 +1,89 @@
+import datetime
+import pytest
+from sqlmodel import Session, select
+from bitaxe_sentry.sentry.db import engine, Miner, MinerLatest, Reading, ReadingRollup
+from bitaxe_sentry.sentry import config, ingest, registry, rollups, storage
+
+def _reading(miner_id):
+    return Reading(
+        miner_id=miner_id,
+        timestamp=datetime.datetime.utcnow(),
+        hash_rate=500.0,
+        temperature=55.0,
+        best_diff="1000",
+        best_diff_value=1000,
+        voltage=5.0,
+        error_percentage=0.1,
+    )
+
+def _stored():
+    with Session(engine) as session:
+        return storage.count_readings(session), len(session.exec(select(Miner)).all())
+
+def test_rollback_undoes_savepoint_insert(session):
+    miner = registry.get_or_create(session, "http://10.0.0.1")
+    with session.begin_nested():
+        storage.insert_rows(session, [ingest._reading_row(_reading(miner.id))])
+    session.rollback()
+
+    assert _stored() == (0, 0)
+
+def test_failure_after_insert_rolls_back_cycle(session, monkeypatch):
+    miner = registry.get_or_create(session, "http://10.0.0.1")
+
+    def fail(session):
+        raise RuntimeError("failed after the insert")
+    monkeypatch.setattr(ingest.storage, "high_water_mark", fail)
+
+    with pytest.raises(RuntimeError):
+        ingest.ingest_readings(session, [_reading(miner.id)])
+    session.close()
+
+    assert _stored() == (0, 0)
+
+def test_cycle_commits_readings(session):
+    miner = registry.get_or_create(session, "http://10.0.0.1")
+    stored = ingest.ingest_readings(session, [_reading(miner.id)])
+
+    assert len(stored) == 1
+    assert _stored() == (1, 1)
+
+@pytest.mark.parametrize("module", [ingest.latest, ingest.rollups], ids=["latest", "rollups"])
+def test_upsert_failure_rolls_back_readings(session, monkeypatch, module):
+    miner = registry.get_or_create(session, "http://10.0.0.1")
+
+    def fail(session, readings):
+        raise RuntimeError("upsert failed")
+    monkeypatch.setattr(module, "record", fail)
+
+    with pytest.raises(RuntimeError):
+        ingest.ingest_readings(session, [_reading(miner.id)])
+    session.close()
+
+    with Session(engine) as check:
+        assert storage.count_readings(check) == 0
+        assert check.exec(select(MinerLatest)).all() == []
+        assert check.exec(select(ReadingRollup)).all() == []
+
+def test_rollups_follow_stored_readings(session):
+    miner = registry.get_or_create(session, "http://10.0.0.1")
+    ingest.ingest_readings(session, [_reading(miner.id)])
+
+    with Session(engine) as check:
+        counts = {rollup.resolution: rollup.count for rollup in check.exec(select(ReadingRollup))}
+    assert counts == {resolution: 1 for resolution in rollups.RESOLUTIONS}
+
+def test_compact_same_second_duplicate_is_not_rolled_up(session, monkeypatch):
+    monkeypatch.setattr(config, "STORAGE_LAYOUT", "compact")
+    miner = registry.get_or_create(session, "http://10.0.0.1")
+    first, second = _reading(miner.id), _reading(miner.id)
+    second.timestamp = first.timestamp
+    second.hash_rate = 600.0
+
+    stored = ingest.ingest_readings(session, [first, second])
+
+    assert stored == [first]
+    with Session(engine) as check:
+        assert storage.count_readings(check) == 1
+        for rollup in check.exec(select(ReadingRollup)):
+            assert (rollup.count, rollup.hash_rate_sum) == (1, first.hash_rate)
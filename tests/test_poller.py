@@ -0,0 +1,16 @@
+from bitaxe_sentry.sentry import health, poller
+
+ENDPOINT = "http://10.0.0.2"
+
+def test_unusable_payload_is_not_a_successful_poll(session, monkeypatch):
+    async def fetch_all(endpoints, concurrency, deadline=None):
+        # No hashRate, so build_reading() raises KeyError
+        return [{"temp": 55.0} for _ in endpoints]
+    monkeypatch.setattr(poller, "fetch_all", fetch_all)
+    monkeypatch.setattr(health, "_endpoints", {})
+    health.record_failure(ENDPOINT)
+
+    outcome = poller._poll_endpoints([ENDPOINT])[ENDPOINT]
+
+    assert outcome["status"] == "error"
+    assert health.get_health()[ENDPOINT]["failures"] == 1
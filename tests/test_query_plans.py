@@ -0,0 +1,21 @@
+import datetime
+import pytest
+from sqlalchemy import text
+from sqlmodel import Session
+from bitaxe_sentry.sentry.db import engine
+from bitaxe_sentry.sentry import benchmark, config, storage
+
+@pytest.mark.parametrize("layout", benchmark.STORAGE_LAYOUTS)
+def test_hot_queries_use_their_indexes(session, monkeypatch, layout):
+    monkeypatch.setattr(config, "STORAGE_LAYOUT", layout)
+    benchmark.seed_readings(miners=5, rows=5000)
+    with engine.begin() as connection:
+        connection.execute(text("ANALYZE"))
+
+    with Session(engine) as write:
+        table = storage.write_table(write, datetime.datetime.utcnow())
+        write.commit()
+
+    for name, statement, index in benchmark.hot_queries(table):
+        plan = benchmark.explain(statement)
+        assert benchmark.plan_uses_index(plan, index), f"{name} doesn't use {index}: {plan}"
@@ -0,0 +1,52 @@
+from sqlmodel import Session, select, delete
+from bitaxe_sentry.sentry.db import engine, Miner, MinerLatest, ReadingRollup
+from bitaxe_sentry.sentry import poller, storage
+
+ENDPOINT = "http://10.0.0.1"
+
+PAYLOAD = {"hashRate": 500.0, "temp": 55.0, "bestDiff": "1000", "voltage": 5000, "errorPercentage": 0.1}
+
+def _poll(monkeypatch):
+    async def fetch_all(endpoints, concurrency, deadline=None):
+        return [PAYLOAD for _ in endpoints]
+    monkeypatch.setattr(poller, "fetch_all", fetch_all)
+    monkeypatch.setattr(poller, "check_alerts", lambda *args, **kwargs: False)
+    return poller._poll_endpoints([ENDPOINT])
+
+def _delete_miner(miner_id):
+    """Delete a miner the way the web process does, without touching this process's caches."""
+    with Session(engine) as session:
+        storage.delete_miner_readings(session, miner_id)
+        session.exec(delete(ReadingRollup).where(ReadingRollup.miner_id == miner_id))
+        session.exec(delete(MinerLatest).where(MinerLatest.miner_id == miner_id))
+        session.exec(delete(Miner).where(Miner.id == miner_id))
+        session.commit()
+
+def test_poll_after_external_delete_registers_miner_again(session, monkeypatch):
+    first = _poll(monkeypatch)[ENDPOINT]["reading"]
+    _delete_miner(first.miner_id)
+
+    outcome = _poll(monkeypatch)[ENDPOINT]
+    assert outcome["status"] == "ok"
+
+    with Session(engine) as check:
+        miner = check.exec(select(Miner).where(Miner.endpoint == ENDPOINT)).one()
+        assert outcome["reading"].miner_id == miner.id
+        assert storage.count_readings(check) == 1
+
+def test_poll_after_external_rename_uses_new_name(session, monkeypatch):
+    miner_id = _poll(monkeypatch)[ENDPOINT]["reading"].miner_id
+    with Session(engine) as rename:
+        miner = rename.get(Miner, miner_id)
+        miner.name = "garage"
+        rename.add(miner)
+        rename.commit()
+
+    seen = []
+    async def fetch_all(endpoints, concurrency, deadline=None):
+        return [PAYLOAD for _ in endpoints]
+    monkeypatch.setattr(poller, "fetch_all", fetch_all)
+    monkeypatch.setattr(poller, "check_alerts", lambda miner, *args, **kwargs: seen.append(miner.name))
+    poller._poll_endpoints([ENDPOINT])
+
+    assert seen == ["garage"]